@@ -0,0 +1,994 @@
+"""Scan-to-scan analysis for follow-up visits.
+
+register_scans aligns a follow-up (post-op) scan to the reference (pre-op)
+scan: a coarse PCA alignment picks the right orientation out of the four
+proper axis flips, then point-to-plane ICP refines it. Correspondences come
+from a KD-tree over the reference vertices and every step is solved for all
+sampled points at once with NumPy. The four coarse hypotheses are refined in
+parallel on a process pool and only the best one is polished on the full
+sample.
+
+surface_deviation measures how far one surface lies from another for a
+batch of points at once: candidate triangles come from a KD-tree over
+triangle centroids and the exact closest point on each candidate is
+computed for the whole batch with NumPy. region_volume_change integrates
+such a field over a loop drawn on the scan. enclosed_volume measures a
+single scan instead: the volume between the skin inside a loop and the
+loop's fitted plane, as one signed-tetrahedron sum over the triangles a
+centroid KD-tree finds inside the loop.
+
+fit_symmetry_plane finds the mid-sagittal plane by mirroring the scan and
+registering the mirror image back onto it (same ICP as above, one coarse
+hypothesis per principal axis); asymmetry_field then measures every vertex
+against the mirrored contralateral surface.
+
+curvature_fields computes discrete mean (cotangent Laplacian) and Gaussian
+(angle deficit) curvature for every vertex with sparse matrix products, and
+landmark_candidates picks curvature extrema from them: named facial
+landmarks in windows around the nose tip, plus the strongest unnamed peaks
+and pits, for the viewer to snap measurement points to.
+
+flap_parameterization flattens the skin around a picked site with least
+squares conformal maps (LSCM): one sparse least-squares solve gives every
+patch vertex 2D coordinates in scan units, oriented so +v points up the
+face. The viewer lays flap templates out in that plane and maps them back
+onto the skin. flap_transposition previews moving a flap onto its defect:
+an as-rigid-as-possible (ARAP) solve over the patch, with the sparse system
+factorized once per flap region so every new flap position costs only a few
+back-substitutions.
+
+SliceIndex cuts cross-section profiles: edges are bucketed once per scan in
+a uniform grid, so a slicing plane only tests the edges of the cells it
+passes through, and crossing faces chain the cut points into a polyline.
+
+anthropometry evaluates the standard facial distances, angles and ratios
+of a placed landmark set at once, from one pairwise distance matrix.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import spsolve, splu
+from scipy.spatial import cKDTree
+from scipy.spatial.transform import Rotation
+
+ICP_SAMPLES = 20000          # source points used by the final ICP
+ICP_ITERATIONS = 40
+ICP_COARSE_SAMPLES = 4000    # source points per coarse hypothesis
+ICP_COARSE_ITERATIONS = 12
+ICP_TOLERANCE = 1e-7         # stop when the step's rotation + translation is this small (relative)
+ICP_REJECT = 3.0             # pairs further than this × the median distance are outliers
+DEVIATION_CANDIDATES = 4     # nearest triangles (by centroid) tested exactly per point
+DEVIATION_CHUNK = 1 << 17    # points per vectorized batch
+CURVATURE_SMOOTHING = 8      # neighbour-averaging passes over the curvature fields (scan noise)
+LANDMARK_POOL = 0.05         # fraction of vertices with the strongest curvature kept as extremum candidates
+LANDMARK_RADIUS = 0.03       # extrema are the strongest within this × the scan diagonal
+LANDMARK_EXTREMA = 32        # unnamed peaks and pits returned for snapping
+ARAP_ITERATIONS = 4          # local/global rounds per flap preview
+SLICE_GRID = 64              # edge-index cells along the scan's longest side
+
+# Facial landmarks located by landmark_candidates, id → name
+LANDMARK_NAMES = {
+    "prn": "Pronasale",
+    "n": "Nasion",
+    "sn": "Subnasale",
+    "al_r": "Alar base (R)",
+    "al_l": "Alar base (L)",
+    "ch_r": "Cheilion (R)",
+    "ch_l": "Cheilion (L)",
+}
+# Landmarks the surgeon can place for anthropometry (Farkas); the detected
+# LANDMARK_NAMES are a subset and can be accepted as they are
+ANTHROPOMETRIC_LANDMARKS = dict(
+    LANDMARK_NAMES,
+    g="Glabella",
+    en_r="Endocanthion (R)",
+    en_l="Endocanthion (L)",
+    ex_r="Exocanthion (R)",
+    ex_l="Exocanthion (L)",
+    ls="Labiale superius",
+    sto="Stomion",
+    li="Labiale inferius",
+    pg="Pogonion",
+    gn="Gnathion",
+)
+# (name, landmark, landmark)
+ANTHROPOMETRIC_DISTANCES = (
+    ("Nasal height", "n", "sn"),
+    ("Nasal bridge length", "n", "prn"),
+    ("Nasal tip protrusion", "sn", "prn"),
+    ("Nose width", "al_r", "al_l"),
+    ("Intercanthal width", "en_r", "en_l"),
+    ("Biocular width", "ex_r", "ex_l"),
+    ("Eye fissure length (R)", "en_r", "ex_r"),
+    ("Eye fissure length (L)", "en_l", "ex_l"),
+    ("Mouth width", "ch_r", "ch_l"),
+    ("Upper lip height", "sn", "sto"),
+    ("Lower lip and chin height", "sto", "gn"),
+    ("Upper face height", "n", "sto"),
+    ("Lower face height", "sn", "gn"),
+    ("Face height", "n", "gn"),
+)
+# (name, end, vertex, end)
+ANTHROPOMETRIC_ANGLES = (
+    ("Nasofrontal angle", "g", "n", "prn"),
+    ("Nasolabial angle", "prn", "sn", "ls"),
+    ("Nasomental angle", "n", "prn", "pg"),
+    ("Facial convexity", "g", "sn", "pg"),
+)
+# (name, numerator distance, denominator distance)
+ANTHROPOMETRIC_RATIOS = (
+    ("Intercanthal / nose width", "Intercanthal width", "Nose width"),
+    ("Mouth / nose width", "Mouth width", "Nose width"),
+    ("Intercanthal width / eye fissure (R)", "Intercanthal width", "Eye fissure length (R)"),
+    ("Intercanthal width / eye fissure (L)", "Intercanthal width", "Eye fissure length (L)"),
+    ("Nasal tip protrusion / bridge length", "Nasal tip protrusion", "Nasal bridge length"),
+    ("Upper lip / lower face height", "Upper lip height", "Lower face height"),
+    ("Nasal height / face height", "Nasal height", "Face height"),
+)
+# Search windows relative to the pronasale, in fractions of the scan height:
+# (lateral min, lateral max, up min, up max); lateral is signed, + = patient's left
+_LANDMARK_WINDOWS = {
+    "n": (-0.04, 0.04, 0.10, 0.40),
+    "sn": (-0.04, 0.04, -0.15, -0.02),
+    "al_r": (-0.15, -0.03, -0.12, 0.02),
+    "al_l": (0.03, 0.15, -0.12, 0.02),
+    "ch_r": (-0.20, -0.06, -0.35, -0.10),
+    "ch_l": (0.06, 0.20, -0.35, -0.10),
+}
+
+
+def vertex_normals(vertices, faces):
+    """Area-weighted unit vertex normals."""
+    tri = vertices[faces]
+    face_normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals = np.column_stack([
+        np.bincount(faces.ravel(), np.repeat(face_normals[:, k], 3), len(vertices)) for k in range(3)
+    ])
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(length > 0, length, 1)
+
+
+def _sample(points, count, seed=0):
+    if len(points) <= count:
+        return points
+    return points[np.random.default_rng(seed).choice(len(points), count, replace=False)]
+
+
+def _transform(matrix, points):
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def _pca_frame(points):
+    center = points.mean(axis=0)
+    _, vectors = np.linalg.eigh(np.cov((points - center).T))
+    axes = vectors[:, ::-1]
+    if np.linalg.det(axes) < 0:
+        axes[:, 2] *= -1
+    return center, axes
+
+
+def _coarse_candidates(source, target):
+    # Principal axes are only defined up to sign: try the four rotations
+    source_center, source_axes = _pca_frame(source)
+    target_center, target_axes = _pca_frame(target)
+    candidates = []
+    for flip in ([1, 1, 1], [1, -1, -1], [-1, 1, -1], [-1, -1, 1]):
+        rotation = target_axes @ np.diag(flip) @ source_axes.T
+        matrix = np.eye(4)
+        matrix[:3, :3] = rotation
+        matrix[:3, 3] = target_center - rotation @ source_center
+        candidates.append(matrix)
+    return candidates
+
+
+def _icp(source, target, target_normals, init, iterations, tree=None):
+    # Point-to-plane ICP; returns (matrix, rms of inlier distances, inlier fraction)
+    tree = tree or cKDTree(target)
+    matrix = init.copy()
+    scale = np.linalg.norm(target.max(axis=0) - target.min(axis=0))
+    for _ in range(iterations):
+        moved = _transform(matrix, source)
+        distance, index = tree.query(moved, workers=-1)
+        keep = distance <= max(ICP_REJECT * np.median(distance), 1e-9 * scale)
+        p, q, n = moved[keep], target[index[keep]], target_normals[index[keep]]
+        # Linearised rotation: minimise Σ ((R p + t - q) · n)² for small R
+        a = np.column_stack([np.cross(p, n), n])
+        b = np.einsum("ij,ij->i", q - p, n)
+        x = np.linalg.lstsq(a.T @ a, a.T @ b, rcond=None)[0]
+        step = np.eye(4)
+        step[:3, :3] = Rotation.from_rotvec(x[:3]).as_matrix()
+        step[:3, 3] = x[3:]
+        matrix = step @ matrix
+        if np.linalg.norm(x[:3]) + np.linalg.norm(x[3:]) / scale < ICP_TOLERANCE:
+            break
+
+    distance, _ = tree.query(_transform(matrix, source), workers=-1)
+    keep = distance <= max(ICP_REJECT * np.median(distance), 1e-9 * scale)
+    return matrix, float(np.sqrt(np.mean(distance[keep] ** 2))), float(keep.mean())
+
+
+def _coarse_trial(args):
+    # Top-level so the process pool can pickle it
+    source, target, target_normals, init = args
+    return _icp(source, target, target_normals, init, ICP_COARSE_ITERATIONS)
+
+
+def register_scans(source_vertices, source_faces, target_vertices, target_faces, workers=4):
+    """Rigid 4×4 transform that maps the source scan onto the target scan.
+
+    Returns (matrix, stats) with the inlier RMS distance (scan units) and
+    the inlier fraction of the final ICP.
+    """
+    source_vertices = np.asarray(source_vertices, dtype=np.float64)
+    target_vertices = np.asarray(target_vertices, dtype=np.float64)
+    target_normals = vertex_normals(target_vertices, np.asarray(target_faces, dtype=np.int64))
+
+    coarse_source = _sample(source_vertices, ICP_COARSE_SAMPLES)
+    coarse_target = _sample(target_vertices, ICP_COARSE_SAMPLES * 4, seed=1)
+    coarse_index = _sample(np.arange(len(target_vertices)), ICP_COARSE_SAMPLES * 4, seed=1)
+    trials = [(coarse_source, coarse_target, target_normals[coarse_index], init)
+              for init in _coarse_candidates(source_vertices, target_vertices)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_coarse_trial, trials))
+    # Best fit = lowest RMS over the most inliers
+    best = min(results, key=lambda r: r[1] / max(r[2], 1e-9))[0]
+
+    matrix, rms, inliers = _icp(_sample(source_vertices, ICP_SAMPLES), target_vertices, target_normals,
+                                best, ICP_ITERATIONS, tree=cKDTree(target_vertices))
+    return matrix, {"rms": rms, "inliers": inliers}
+
+
+def _reflect(points, point, normal):
+    return points - 2 * ((points - point) @ normal)[:, None] * normal
+
+
+def _mirror_matrix(point, normal):
+    matrix = np.eye(4)
+    matrix[:3, :3] -= 2 * np.outer(normal, normal)
+    matrix[:3, 3] = 2 * np.dot(point, normal) * normal
+    return matrix
+
+
+def _plane_from_map(matrix, points):
+    # A registered mirror maps x to y across the plane: y - x is along the
+    # normal and (x + y) / 2 lies on the plane
+    mapped = _transform(matrix, points)
+    _, _, vt = np.linalg.svd(mapped - points, full_matrices=False)
+    normal = vt[0] / np.linalg.norm(vt[0])
+    return ((points + mapped) / 2).mean(axis=0), normal
+
+
+def fit_symmetry_plane(vertices, faces, workers=4):
+    """Mid-sagittal plane of a scan as (point, unit normal, stats).
+
+    stats holds the RMS distance (scan units) and inlier fraction between
+    the registered mirror image and the scan.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    normals = vertex_normals(vertices, np.asarray(faces, dtype=np.int64))
+    center, axes = _pca_frame(vertices)
+
+    coarse_index = _sample(np.arange(len(vertices)), ICP_COARSE_SAMPLES * 4, seed=1)
+    coarse_source = _sample(vertices, ICP_COARSE_SAMPLES)
+    mirrors = [_mirror_matrix(center, axes[:, k]) for k in range(3)]
+    trials = [(_transform(mirror, coarse_source), vertices[coarse_index], normals[coarse_index], np.eye(4))
+              for mirror in mirrors]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_coarse_trial, trials))
+    best = min(range(3), key=lambda k: results[k][1] / max(results[k][2], 1e-9))
+
+    source = _sample(vertices, ICP_SAMPLES)
+    matrix, rms, inliers = _icp(_transform(mirrors[best], source), vertices, normals,
+                                results[best][0], ICP_ITERATIONS, tree=cKDTree(vertices))
+    point, normal = _plane_from_map(matrix @ mirrors[best], source)
+    return point, normal, {"rms": rms, "inliers": inliers}
+
+
+def asymmetry_field(vertices, faces, point, normal):
+    """Signed distance from each vertex to the mirrored scan.
+
+    Positive where this side is fuller than the other side's mirror image,
+    negative where it is deficient.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    mirrored = _reflect(vertices, np.asarray(point), np.asarray(normal))
+    return -surface_deviation(vertices, vertex_normals(vertices, faces), mirrored, faces)
+
+
+def transform_points(matrix, points):
+    return _transform(np.asarray(matrix, dtype=np.float64), np.asarray(points, dtype=np.float64))
+
+
+def _closest_on_triangles(p, a, b, c):
+    # Closest point on triangle abc to p, row by row (Ericson, Real-Time
+    # Collision Detection 5.1.5). Interior first, then edges, then corners.
+    ab, ac = b - a, c - a
+    d1 = np.einsum("ij,ij->i", ab, p - a)
+    d2 = np.einsum("ij,ij->i", ac, p - a)
+    d3 = np.einsum("ij,ij->i", ab, p - b)
+    d4 = np.einsum("ij,ij->i", ac, p - b)
+    d5 = np.einsum("ij,ij->i", ab, p - c)
+    d6 = np.einsum("ij,ij->i", ac, p - c)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+    denom = va + vb + vc
+    denom = np.where(denom == 0, 1, denom)
+    closest = a + ab * (vb / denom)[:, None] + ac * (vc / denom)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        edge = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        t = d1 / (d1 - d3)
+        closest[edge] = a[edge] + ab[edge] * t[edge, None]
+        edge = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        t = d2 / (d2 - d6)
+        closest[edge] = a[edge] + ac[edge] * t[edge, None]
+        edge = (va <= 0) & (d4 >= d3) & (d5 >= d6)
+        t = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        closest[edge] = b[edge] + (c[edge] - b[edge]) * t[edge, None]
+    corner = (d1 <= 0) & (d2 <= 0)
+    closest[corner] = a[corner]
+    corner = (d3 >= 0) & (d4 <= d3)
+    closest[corner] = b[corner]
+    corner = (d6 >= 0) & (d5 <= d6)
+    closest[corner] = c[corner]
+    return closest
+
+
+def surface_deviation(points, normals, vertices, faces):
+    """Signed distance from each point to the surface (vertices, faces).
+
+    Positive where the surface lies on the side the point's normal points
+    to (swelling, for a follow-up scan measured from the reference scan).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces, dtype=np.int64)]
+    tree = cKDTree(triangles.mean(axis=1))
+    k = min(DEVIATION_CANDIDATES, len(triangles))
+    deviation = np.empty(len(points))
+    for start in range(0, len(points), DEVIATION_CHUNK):
+        p = points[start:start + DEVIATION_CHUNK]
+        _, index = tree.query(p, k=k, workers=-1)
+        index = index.reshape(len(p), k)
+        repeated = np.repeat(p, k, axis=0)
+        candidates = triangles[index.ravel()]
+        closest = _closest_on_triangles(repeated, candidates[:, 0], candidates[:, 1], candidates[:, 2])
+        distance = np.linalg.norm(closest - repeated, axis=1).reshape(len(p), k)
+        best = distance.argmin(axis=1)
+        offset = closest.reshape(len(p), k, 3)[np.arange(len(p)), best] - p
+        sign = np.where(np.einsum("ij,ij->i", offset, normals[start:start + len(p)]) < 0, -1.0, 1.0)
+        deviation[start:start + len(p)] = sign * distance[np.arange(len(p)), best]
+    return deviation
+
+
+def _loop_plane(loop):
+    # Newell normal and centroid, like the viewer's area calculation
+    nxt = np.roll(loop, -1, axis=0)
+    normal = np.array([
+        ((loop[:, 1] - nxt[:, 1]) * (loop[:, 2] + nxt[:, 2])).sum(),
+        ((loop[:, 2] - nxt[:, 2]) * (loop[:, 0] + nxt[:, 0])).sum(),
+        ((loop[:, 0] - nxt[:, 0]) * (loop[:, 1] + nxt[:, 1])).sum(),
+    ])
+    return loop.mean(axis=0), normal / np.linalg.norm(normal)
+
+
+def _inside_polygon(points, polygon):
+    # Crossing-number test of 2D points against one polygon, all points at once
+    inside = np.zeros(len(points), dtype=bool)
+    x, y = points[:, 0], points[:, 1]
+    for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        crosses = (y0 > y) != (y1 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inside ^= crosses & (x < x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+    return inside
+
+
+def region_volume_change(vertices, faces, deviation, loop):
+    """Volume between the two scans inside a closed loop on the reference scan.
+
+    Faces whose centroid projects inside the loop (onto its best-fit plane)
+    and lies within the loop's radius of that plane are integrated:
+    Σ face area × mean vertex deviation. Returns volume (scan units³),
+    area and the mean/peak deviation inside the loop.
+    """
+    loop = np.asarray(loop, dtype=np.float64)
+    center, normal = _loop_plane(loop)
+    u = np.cross(normal, [1.0, 0.0, 0.0] if abs(normal[0]) < 0.9 else [0.0, 1.0, 0.0])
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+    basis = np.column_stack([u, v])
+
+    triangles = vertices[faces]
+    centroids = triangles.mean(axis=1) - center
+    radius = np.linalg.norm(loop - center, axis=1).max()
+    # The far side of the head also projects into the loop; keep the near surface
+    near = np.abs(centroids @ normal) <= radius
+    near[near] = _inside_polygon(centroids[near] @ basis, (loop - center) @ basis)
+
+    area = np.linalg.norm(np.cross(triangles[near, 1] - triangles[near, 0],
+                                   triangles[near, 2] - triangles[near, 0]), axis=1) / 2
+    face_deviation = deviation[faces[near]].mean(axis=1)
+    if len(area) == 0:
+        return {"volume": 0.0, "area": 0.0, "mean": 0.0, "peak": 0.0}
+    return {
+        "volume": float((area * face_deviation).sum()),
+        "area": float(area.sum()),
+        "mean": float((area * face_deviation).sum() / area.sum()),
+        "peak": float(face_deviation[np.abs(face_deviation).argmax()]),
+    }
+
+
+def face_tree(vertices, faces):
+    """KD-tree over triangle centroids, for enclosed_volume's region queries."""
+    return cKDTree(vertices[faces].mean(axis=1))
+
+
+def enclosed_volume(vertices, faces, loop, tree):
+    """Volume between the skin inside a closed loop and the loop's plane.
+
+    The cap is the loop's best-fit plane. Only triangles the centroid tree
+    returns near the loop are tested, as in region_volume_change. With the
+    apex on the cap, the signed tetrahedra of the skin triangles sum to the
+    closed volume: positive where the skin rises above the plane (a
+    projection), negative where it sinks below (a defect). The gap between
+    a non-planar loop and its fitted cap is not counted. Returns volume
+    (scan units³), skin area and the peak height from the plane; all zero
+    for a degenerate loop (fewer than three distinct points, or no area
+    in its plane).
+    """
+    empty = {"volume": 0.0, "area": 0.0, "peak": 0.0}
+    loop = np.asarray(loop, dtype=np.float64)
+    if len(np.unique(loop, axis=0)) < 3:
+        return empty
+    with np.errstate(invalid="ignore", divide="ignore"):
+        center, normal = _loop_plane(loop)
+    radius = np.linalg.norm(loop - center, axis=1).max()
+    if not np.isfinite(normal).all() or radius == 0:
+        return empty
+    u = np.cross(normal, [1.0, 0.0, 0.0] if abs(normal[0]) < 0.9 else [0.0, 1.0, 0.0])
+    u /= np.linalg.norm(u)
+    basis = np.column_stack([u, np.cross(normal, u)])
+    # A near-collinear loop has a noisy plane and encloses (almost) nothing
+    flat = (loop - center) @ basis
+    following = np.roll(flat, -1, axis=0)
+    if abs((flat[:, 0] * following[:, 1] - flat[:, 1] * following[:, 0]).sum()) / 2 < 1e-6 * radius ** 2:
+        return empty
+
+    # Centroids inside the loop lie within its radius in the plane and, like
+    # region_volume_change, within its radius off the plane
+    candidates = np.asarray(tree.query_ball_point(center, radius * np.sqrt(2)), dtype=np.int64)
+    triangles = vertices[faces[candidates]] - center
+    centroids = triangles.mean(axis=1)
+    near = np.abs(centroids @ normal) <= radius
+    near[near] = _inside_polygon(centroids[near] @ basis, flat)
+    triangles = triangles[near]
+    if len(triangles) == 0:
+        return empty
+
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    cross = np.cross(b - a, c - a)
+    # Heights are measured towards the side the skin faces
+    if cross.sum(axis=0) @ normal < 0:
+        normal = -normal
+    heights = triangles.reshape(-1, 3) @ normal
+    return {
+        "volume": float(np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6),
+        "area": float(np.linalg.norm(cross, axis=1).sum() / 2),
+        "peak": float(heights[np.abs(heights).argmax()]),
+    }
+
+
+def _smooth(field, faces, count, passes):
+    # Average each value with its one-ring, `passes` times, as sparse products
+    i = faces.ravel()
+    j = np.roll(faces, -1, axis=1).ravel()
+    adjacency = sparse.coo_matrix((np.ones(len(i) * 2), (np.r_[i, j], np.r_[j, i])), shape=(count, count)).tocsr()
+    adjacency.data[:] = 1
+    adjacency = adjacency + sparse.identity(count, format="csr")
+    average = sparse.diags(1 / np.asarray(adjacency.sum(axis=1)).ravel()) @ adjacency
+    for _ in range(passes):
+        field = average @ field
+    return field
+
+
+def _cotangent_weights(vertices, faces):
+    # Symmetric sparse matrix of cotangent edge weights: half the cotangent
+    # of each corner weighs the edge opposite it
+    count = len(vertices)
+    tri = vertices[faces]
+    double_area = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+    safe_area = np.where(double_area > 0, double_area, np.inf)
+    rows, cols, weights = [], [], []
+    for k in range(3):
+        a, b = (k + 1) % 3, (k + 2) % 3
+        dot = np.einsum("ij,ij->i", tri[:, a] - tri[:, k], tri[:, b] - tri[:, k])
+        rows += [faces[:, a], faces[:, b]]
+        cols += [faces[:, b], faces[:, a]]
+        weights += [0.5 * dot / safe_area] * 2
+    return sparse.coo_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(count, count)).tocsr()
+
+
+def _boundary_vertices(faces, count):
+    # Edges used by a single face lie on the boundary
+    edges = np.sort(np.column_stack([faces, np.roll(faces, -1, axis=1)]).reshape(-1, 2), axis=1)
+    _, index, uses = np.unique(edges[:, 0] * count + edges[:, 1], return_index=True, return_counts=True)
+    boundary = np.zeros(count, dtype=bool)
+    boundary[edges[index[uses == 1]].ravel()] = True
+    return boundary
+
+
+def curvature_fields(vertices, faces, smoothing=CURVATURE_SMOOTHING):
+    """Discrete mean and Gaussian curvature per vertex as (mean, gaussian).
+
+    Mean curvature is positive on convex skin (nose tip, chin) and negative
+    in folds; it has units 1/scan unit, Gaussian curvature 1/scan unit².
+    Open-boundary vertices are set to zero.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    count = len(vertices)
+    tri = vertices[faces]
+    double_area = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+    angle_sum = np.zeros(count)
+    for k in range(3):
+        a, b = (k + 1) % 3, (k + 2) % 3
+        dot = np.einsum("ij,ij->i", tri[:, a] - tri[:, k], tri[:, b] - tri[:, k])
+        angle_sum += np.bincount(faces[:, k], np.arctan2(double_area, dot), count)
+    weights = _cotangent_weights(vertices, faces)
+    laplacian = weights - sparse.diags(np.asarray(weights.sum(axis=1)).ravel())
+    area = np.bincount(faces.ravel(), np.repeat(double_area / 6, 3), count)
+    area = np.where(area > 0, area, np.inf)
+
+    # Σ w (xj - xi) = -2 A H n
+    mean = -np.einsum("ij,ij->i", laplacian @ vertices, vertex_normals(vertices, faces)) / (2 * area)
+    gaussian = (2 * np.pi - angle_sum) / area
+
+    boundary = _boundary_vertices(faces, count)
+    mean[boundary] = 0
+    gaussian[boundary] = 0
+    return _smooth(mean, faces, count, smoothing), _smooth(gaussian, faces, count, smoothing)
+
+
+def _extrema(vertices, score, radius, limit):
+    # Vertices whose score is the highest within `radius`, strongest first
+    pool = np.flatnonzero(score >= np.quantile(score, 1 - LANDMARK_POOL))
+    pool = pool[score[pool] > 0]
+    pairs = cKDTree(vertices[pool]).query_pairs(radius, output_type="ndarray")
+    beaten = np.zeros(len(pool), dtype=bool)
+    weaker = score[pool[pairs[:, 0]]] < score[pool[pairs[:, 1]]]
+    beaten[pairs[weaker, 0]] = True
+    beaten[pairs[~weaker, 1]] = True
+    peaks = pool[~beaten]
+    return peaks[np.argsort(-score[peaks])[:limit]]
+
+
+def landmark_candidates(vertices, faces, mean, point, normal, up=(0.0, 1.0, 0.0)):
+    """Candidate facial landmarks from the mean curvature field.
+
+    The pronasale is the most anterior convex extremum near the mid-sagittal
+    plane (point, normal); the other LANDMARK_NAMES are the deepest folds in
+    windows around it. Anterior is the mean skin direction and `up` the
+    scanner's vertical axis. Returns ({id: point}, extrema) where extrema
+    holds the strongest unnamed peaks and pits.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    point, normal = np.asarray(point, dtype=np.float64), np.asarray(normal, dtype=np.float64)
+    diagonal = np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0))
+    radius = diagonal * LANDMARK_RADIUS
+    peaks = _extrema(vertices, mean, radius, LANDMARK_EXTREMA)
+    pits = _extrema(vertices, -mean, radius, LANDMARK_EXTREMA)
+
+    # Face frame: anterior and up lie in the mid-sagittal plane
+    up = np.asarray(up, dtype=np.float64) - normal * np.dot(up, normal)
+    up /= np.linalg.norm(up)
+    anterior = np.cross(normal, up)
+    # A face scan's skin normals point forward on average
+    if vertex_normals(vertices, np.asarray(faces, dtype=np.int64)).sum(axis=0) @ anterior < 0:
+        anterior = -anterior
+    lateral = np.cross(up, anterior)  # patient's left
+
+    midline = np.abs((vertices - point) @ normal) < radius
+    tips = peaks[midline[peaks]]
+    if len(tips) == 0:
+        tips = np.flatnonzero(midline)
+    if len(tips) == 0:
+        return {}, vertices[np.r_[peaks, pits]]
+    tip = vertices[tips[np.argmax(vertices[tips] @ anterior)]]
+
+    relative = vertices - tip
+    height = np.ptp(vertices @ up)
+    side, rise, depth = relative @ lateral / height, relative @ up / height, relative @ anterior / height
+    landmarks = {"prn": tip}
+    for key, (side_lo, side_hi, rise_lo, rise_hi) in _LANDMARK_WINDOWS.items():
+        window = np.flatnonzero((side >= side_lo) & (side <= side_hi) & (rise >= rise_lo) & (rise <= rise_hi)
+                                & (depth > -0.25))
+        if len(window):
+            landmarks[key] = vertices[window[np.argmin(mean[window])]]
+    return landmarks, vertices[np.r_[peaks, pits]]
+
+
+def _surface_patch(vertices, faces, center, radius):
+    # Faces within radius of center and connected to the vertex nearest it
+    tree = cKDTree(vertices)
+    inside = np.zeros(len(vertices), dtype=bool)
+    inside[tree.query_ball_point(center, radius, workers=-1)] = True
+    patch_faces = faces[inside[faces].all(axis=1)]
+    if len(patch_faces) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.int64)
+    ids, local = np.unique(patch_faces, return_inverse=True)
+    local = local.reshape(-1, 3)
+    count = len(ids)
+    edges = np.column_stack([local, np.roll(local, -1, axis=1)]).reshape(-1, 2)
+    graph = sparse.coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(count, count))
+    _, labels = connected_components(graph, directed=False)
+    seed = labels[np.argmin(np.linalg.norm(vertices[ids] - center, axis=1))]
+    keep = labels[local[:, 0]] == seed
+    ids, local = np.unique(ids[local[keep]], return_inverse=True)
+    return ids, local.reshape(-1, 3)
+
+
+def _lscm(vertices, faces):
+    # Least squares conformal map: every triangle in its own plane, the
+    # complex gradient of u + iv must vanish; two pinned vertices fix the
+    # similarity left free.
+    count = len(vertices)
+    tri = vertices[faces]
+    e1, e2 = tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]
+    x1 = np.linalg.norm(e1, axis=1)
+    axis = e1 / np.where(x1 > 0, x1, 1)[:, None]
+    x2 = np.einsum("ij,ij->i", e2, axis)
+    y2 = np.linalg.norm(e2 - axis * x2[:, None], axis=1)
+    scale = 1 / np.sqrt(np.maximum(x1 * y2, 1e-30))
+    # W_j = (x_k - x_i) + i (y_k - y_i) around each corner j, local corners (0,0), (x1,0), (x2,y2)
+    real = np.column_stack([x2 - x1, -x2, x1]) * scale[:, None]
+    imag = np.column_stack([y2, -y2, np.zeros_like(y2)]) * scale[:, None]
+    rows = np.repeat(np.arange(len(faces)), 3)
+    cols = faces.ravel()
+    shape = (len(faces), count)
+    mr = sparse.csr_matrix((real.ravel(), (rows, cols)), shape=shape)
+    mi = sparse.csr_matrix((imag.ravel(), (rows, cols)), shape=shape)
+    system = sparse.bmat([[mr, -mi], [mi, mr]], format="csc")
+
+    first = np.argmax(np.linalg.norm(vertices - vertices.mean(axis=0), axis=1))
+    second = np.argmax(np.linalg.norm(vertices - vertices[first], axis=1))
+    pinned = np.array([first, second, first + count, second + count])
+    values = np.array([0.0, np.linalg.norm(vertices[second] - vertices[first]), 0.0, 0.0])
+    free = np.setdiff1d(np.arange(2 * count), pinned)
+    a_free = system[:, free]
+    solution = np.empty(2 * count)
+    solution[pinned] = values
+    solution[free] = spsolve((a_free.T @ a_free).tocsc(), -a_free.T @ (system[:, pinned] @ values))
+    return solution.reshape(2, count).T
+
+
+def flap_parameterization(vertices, faces, center, radius, up=(0.0, 1.0, 0.0)):
+    """Flatten the skin within radius of center for flap templates.
+
+    Returns (vertex ids, uv, patch faces): the patch's analysis vertex ids,
+    their 2D coordinates in scan units (conformal, with the flattened area
+    equal to the skin area, center at the origin, +v along `up` and +u to
+    the right seen from outside the skin) and faces into the patch.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    center = np.asarray(center, dtype=np.float64)
+    ids, patch_faces = _surface_patch(vertices, np.asarray(faces, dtype=np.int64), center, radius)
+    if len(patch_faces) == 0:
+        return ids, np.zeros((0, 2)), patch_faces
+    points = vertices[ids]
+    uv = _lscm(points, patch_faces)
+
+    tri, tri_uv = points[patch_faces], uv[patch_faces]
+    area = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum()
+    d1, d2 = tri_uv[:, 1] - tri_uv[:, 0], tri_uv[:, 2] - tri_uv[:, 0]
+    flat = np.abs(d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]).sum()
+    uv *= np.sqrt(area / flat) if flat > 0 else 1.0
+
+    # Linear map from the skin near the centre to the plane, to orient and centre it
+    nearest = np.argsort(np.linalg.norm(points - center, axis=1))[:64]
+    offsets = np.column_stack([points[nearest] - center, np.ones(len(nearest))])
+    jacobian = np.linalg.lstsq(offsets, uv[nearest], rcond=None)[0]
+    normal = vertex_normals(points, patch_faces)[nearest].sum(axis=0)
+    normal /= np.linalg.norm(normal)
+    up = np.asarray(up, dtype=np.float64) - normal * np.dot(up, normal)
+    up /= np.linalg.norm(up)
+    up_uv = up @ jacobian[:3]
+    angle = np.arctan2(up_uv[0], up_uv[1])
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    uv = (uv - jacobian[3]) @ rotation.T
+    if np.cross(up, normal) @ jacobian[:3] @ rotation.T @ [1.0, 0.0] < 0:
+        uv[:, 0] = -uv[:, 0]
+    return ids, uv, patch_faces
+
+
+class ArapDeformer:
+    """As-rigid-as-possible deformation of a mesh moved by handle vertices.
+
+    Handles are placed by each solve(), fixed vertices stay at rest. The
+    cotangent Laplacian restricted to the remaining vertices is factorized
+    once, so a solve only back-substitutes (Sorkine & Alexa 2007, with the
+    local rotations fitted by batched SVD).
+    """
+
+    def __init__(self, vertices, faces, handles, fixed):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64)
+        count = len(self.vertices)
+        weights = _cotangent_weights(self.vertices, faces).tocoo()
+        self.rows, self.cols, self.weights = weights.row, weights.col, weights.data
+        self.rest_edges = self.vertices[self.rows] - self.vertices[self.cols]
+        # Sums per-edge terms into their first vertex
+        self.gather = sparse.csr_matrix((np.ones(len(self.rows)), (self.rows, np.arange(len(self.rows)))),
+                                        shape=(count, len(self.rows)))
+
+        self.handles = np.asarray(handles, dtype=np.int64)
+        self.constrained = np.r_[self.handles, np.asarray(fixed, dtype=np.int64)]
+        self.free = np.setdiff1d(np.arange(count), self.constrained)
+        laplacian = (sparse.diags(np.asarray(weights.tocsr().sum(axis=1)).ravel()) - weights).tocsr()
+        # A tiny pull towards the rest shape keeps isolated or zero-weight vertices solvable
+        self.regularize = 1e-8 * np.abs(laplacian.diagonal()).mean()
+        free_block = laplacian[self.free][:, self.free] + sparse.identity(len(self.free)) * self.regularize
+        self.factor = splu(free_block.tocsc())
+        self.coupling = laplacian[self.free][:, self.constrained]
+
+    def solve(self, targets, iterations=ARAP_ITERATIONS):
+        """Positions of all vertices with the handles at targets."""
+        positions = self.vertices.copy()
+        positions[self.handles] = targets
+        rotations = np.broadcast_to(np.eye(3), (len(positions), 3, 3))
+        known = self.coupling @ positions[self.constrained] - self.regularize * self.vertices[self.free]
+        for step in range(iterations + 1):
+            if step:
+                # Local: best rotation per vertex for its one-ring
+                deformed = positions[self.rows] - positions[self.cols]
+                outer = self.weights[:, None, None] * self.rest_edges[:, :, None] * deformed[:, None, :]
+                covariance = (self.gather @ outer.reshape(-1, 9)).reshape(-1, 3, 3)
+                u, _, vt = np.linalg.svd(covariance)
+                rotations = np.transpose(vt, (0, 2, 1)) @ np.transpose(u, (0, 2, 1))
+                flip = np.linalg.det(rotations) < 0
+                u[flip, :, 2] *= -1
+                rotations[flip] = np.transpose(vt[flip], (0, 2, 1)) @ np.transpose(u[flip], (0, 2, 1))
+            # Global: L p' = Σ w/2 (R_i + R_j)(p_i - p_j), back-substitution only
+            edge_terms = 0.5 * self.weights[:, None] * np.einsum(
+                "eab,eb->ea", rotations[self.rows] + rotations[self.cols], self.rest_edges)
+            rhs = self.gather @ edge_terms
+            positions[self.free] = self.factor.solve(rhs[self.free] - known)
+        return positions
+
+
+def _locate_flat(uv, faces, points, candidates=8):
+    # Triangle (or -1) and barycentric weights of 2D points in a flat mesh
+    tri = uv[faces]
+    _, index = cKDTree(tri.mean(axis=1)).query(points, k=min(candidates, len(faces)), workers=-1)
+    index = index.reshape(len(points), -1)
+    found = np.full(len(points), -1)
+    weights = np.zeros((len(points), 3))
+    for column in range(index.shape[1]):
+        t = index[:, column]
+        a, b, c = tri[t, 0], tri[t, 1], tri[t, 2]
+        e1, e2, p = b - a, c - a, points - a
+        det = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        det = np.where(det == 0, np.inf, det)
+        w1 = (p[:, 0] * e2[:, 1] - p[:, 1] * e2[:, 0]) / det
+        w2 = (e1[:, 0] * p[:, 1] - e1[:, 1] * p[:, 0]) / det
+        hit = (found < 0) & (w1 >= -1e-9) & (w2 >= -1e-9) & (w1 + w2 <= 1 + 1e-9)
+        found[hit] = t[hit]
+        weights[hit] = np.column_stack([1 - w1 - w2, w1, w2])[hit]
+    return found, weights
+
+
+def flap_transposition(vertices, uv, faces, flaps, defect):
+    """Set up the transposition preview of flaps drawn on a flattened patch.
+
+    vertices, uv, faces: the patch from flap_parameterization; flaps and
+    defect: polygons in its flat coordinates. Faces inside the defect are
+    excised, vertices inside a flap are moved with it and the patch border
+    stays put. Returns (deformer, handles, kept faces); pass the handles to
+    flap_targets.
+    """
+    uv = np.asarray(uv, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    kept = faces[~_inside_polygon(uv[faces].mean(axis=1), np.asarray(defect, dtype=np.float64))]
+    handles = np.zeros(len(uv), dtype=bool)
+    for flap in flaps:
+        handles |= _inside_polygon(uv, np.asarray(flap, dtype=np.float64))
+    used = np.zeros(len(uv), dtype=bool)
+    used[kept] = True
+    handles = np.flatnonzero(handles & used)
+    fixed = np.flatnonzero(_boundary_vertices(faces, len(uv)) & used)
+    fixed = np.setdiff1d(fixed, handles)
+    # Vertices outside the kept faces are left out of the solve, at rest
+    unused = np.flatnonzero(~used)
+    deformer = ArapDeformer(vertices, kept, handles, np.r_[fixed, unused])
+    return deformer, handles, kept
+
+
+def flap_targets(vertices, uv, faces, handles, pivot, angle, shift=(0.0, 0.0)):
+    """Skin positions of the handle vertices after the flap rotates by angle
+    (radians, counter-clockwise) about pivot and shifts, both in flat
+    coordinates. Handles that leave the patch follow the others' mean move.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    flat = np.asarray(uv, dtype=np.float64)[handles] - pivot
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    flat = flat @ rotation.T + np.asarray(pivot) + np.asarray(shift)
+    found, weights = _locate_flat(np.asarray(uv, dtype=np.float64), np.asarray(faces, dtype=np.int64), flat)
+    targets = vertices[handles].copy()
+    inside = found >= 0
+    targets[inside] = np.einsum("ij,ijk->ik", weights[inside], vertices[np.asarray(faces)[found[inside]]])
+    if inside.any() and not inside.all():
+        targets[~inside] += (targets[inside] - vertices[handles][inside]).mean(axis=0)
+    return targets
+
+
+class SliceIndex:
+    """Edge/face index of a mesh for repeated plane cuts.
+
+    Unique edges are bucketed by midpoint in a uniform grid (CSR layout) and
+    each edge knows its one or two faces. profile() only visits the edges in
+    cells the plane passes through.
+    """
+
+    def __init__(self, vertices, faces, grid=SLICE_GRID):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64)
+        count = len(self.vertices)
+        sides = np.sort(np.column_stack([faces, np.roll(faces, -1, axis=1)]).reshape(-1, 2), axis=1)
+        keys, side_edge = np.unique(sides[:, 0] * count + sides[:, 1], return_inverse=True)
+        self.edges = np.column_stack([keys // count, keys % count])
+        # Faces on each side of an edge (-1 on the boundary)
+        side_face = np.repeat(np.arange(len(faces)), 3)
+        order = np.argsort(side_edge, kind="stable")
+        first = np.r_[True, side_edge[order][1:] != side_edge[order][:-1]]
+        self.edge_faces = np.full((len(self.edges), 2), -1)
+        self.edge_faces[side_edge[order][first], 0] = side_face[order][first]
+        self.edge_faces[side_edge[order][~first], 1] = side_face[order][~first]
+
+        ends = self.vertices[self.edges]
+        midpoints = ends.mean(axis=1)
+        lo, hi = midpoints.min(axis=0), midpoints.max(axis=0)
+        self.cell = max((hi - lo).max() / grid, 1e-12)
+        cells = np.floor((midpoints - lo) / self.cell).astype(np.int64)
+        shape = cells.max(axis=0) + 1
+        cell_id = np.ravel_multi_index(cells.T, shape)
+        self.order = np.argsort(cell_id, kind="stable")
+        self.occupied, self.start, counts = np.unique(cell_id[self.order], return_index=True, return_counts=True)
+        self.stop = self.start + counts
+        self.centers = lo + (np.column_stack(np.unravel_index(self.occupied, shape)) + 0.5) * self.cell
+        # Reach of a cell's edges: half its diagonal plus the longest half edge
+        self.reach = self.cell * np.sqrt(3) / 2 + np.linalg.norm(ends[:, 1] - ends[:, 0], axis=1).max() / 2
+
+    def cut(self, point, normal):
+        """Cut points of the plane as (points, links): links pairs point rows
+        that share a face."""
+        normal = np.asarray(normal, dtype=np.float64)
+        near = np.abs((self.centers - point) @ normal) <= self.reach
+        start, stop = self.start[near], self.stop[near]
+        lengths = stop - start
+        candidates = self.order[np.repeat(start - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+                                + np.arange(lengths.sum())]
+        d = (self.vertices[self.edges[candidates]] - point) @ normal
+        crossing = (d[:, 0] >= 0) != (d[:, 1] >= 0)
+        edges, d = candidates[crossing], d[crossing]
+        t = d[:, 0] / (d[:, 0] - d[:, 1])
+        ends = self.vertices[self.edges[edges]]
+        points = ends[:, 0] + (ends[:, 1] - ends[:, 0]) * t[:, None]
+
+        # A face crossed by the plane has exactly two crossing edges: link them
+        faces = self.edge_faces[edges].ravel()
+        rows = np.repeat(np.arange(len(edges)), 2)
+        valid = faces >= 0
+        faces, rows = faces[valid], rows[valid]
+        order = np.argsort(faces, kind="stable")
+        faces, rows = faces[order], rows[order]
+        pair = np.flatnonzero(faces[1:] == faces[:-1])
+        return points, np.column_stack([rows[pair], rows[pair + 1]])
+
+    def profile(self, a, b, direction, offset=0.0):
+        """Surface profile from near a to near b.
+
+        The cutting plane contains a, b and the viewing direction, shifted
+        by offset along its normal. Returns the polyline (n, 3) along the
+        shorter way between the cut points nearest a and b on their curve.
+        """
+        a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+        normal = np.cross(b - a, np.asarray(direction, dtype=np.float64))
+        if np.linalg.norm(normal) == 0:
+            return np.zeros((0, 3))
+        normal /= np.linalg.norm(normal)
+        a, b = a + normal * offset, b + normal * offset
+        points, links = self.cut(a, normal)
+        if len(points) < 2:
+            return np.zeros((0, 3))
+        graph = sparse.coo_matrix((np.ones(len(links)), (links[:, 0], links[:, 1])),
+                                  shape=(len(points), len(points))).tocsr()
+        graph = (graph + graph.T).tocsr()
+        _, labels = connected_components(graph, directed=False)
+        tree = cKDTree(points)
+        start = tree.query(a)[1]
+        same = labels == labels[start]
+        end = np.flatnonzero(same)[np.argmin(np.linalg.norm(points[same] - b, axis=1))]
+
+        # Walk the curve (every point has at most two neighbours) from one end
+        neighbours = np.split(graph.indices, graph.indptr[1:-1])
+        component = np.flatnonzero(same)
+        ends = [i for i in component if len(neighbours[i]) < 2]
+        walk, previous = [ends[0] if ends else start], -1
+        while len(walk) <= len(component):
+            following = [i for i in neighbours[walk[-1]] if i != previous]
+            if not following or following[0] == walk[0]:
+                break
+            previous = walk[-1]
+            walk.append(following[0])
+        walk = np.array(walk)
+        i, j = sorted([int(np.flatnonzero(walk == start)[0]), int(np.flatnonzero(walk == end)[0])])
+        inner = walk[i:j + 1]
+        closed = not ends and len(walk) > 2
+        if closed and 2 * (j - i) > len(walk):
+            inner = np.r_[walk[j:], walk[:i + 1]]
+        path = points[inner]
+        return path if np.linalg.norm(path[0] - a) <= np.linalg.norm(path[0] - b) else path[::-1]
+
+
+def profile_metrics(points):
+    """Arc length, chord, depth and end angles of a profile polyline.
+
+    depth is the largest distance from the chord (at `depth_at`, a fraction
+    of the arc); the end angles (degrees) are between the chord and the
+    profile over its first and last tenth.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return {"arc": 0.0, "chord": 0.0, "depth": 0.0, "depth_at": 0.0, "start_angle": 0.0, "end_angle": 0.0}
+    steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    arc = np.r_[0, np.cumsum(steps)]
+    chord = points[-1] - points[0]
+    length = np.linalg.norm(chord)
+    axis = chord / length if length > 0 else chord
+    offsets = points - points[0]
+    distance = np.linalg.norm(offsets - np.outer(offsets @ axis, axis), axis=1)
+    deepest = int(np.argmax(distance))
+
+    def angle(tangent):
+        norm = np.linalg.norm(tangent) * length
+        return float(np.degrees(np.arccos(np.clip(tangent @ chord / norm, -1, 1)))) if norm > 0 else 0.0
+
+    tenth = arc[-1] / 10
+    head = points[max(np.searchsorted(arc, tenth), 1)] - points[0]
+    tail = points[-1] - points[min(np.searchsorted(arc, arc[-1] - tenth, side="right") - 1, len(points) - 2)]
+    return {"arc": float(arc[-1]), "chord": float(length), "depth": float(distance[deepest]),
+            "depth_at": float(arc[deepest] / arc[-1]) if arc[-1] > 0 else 0.0,
+            "start_angle": angle(head), "end_angle": angle(tail)}
+
+
+def anthropometry(points):
+    """Every standard measure of a landmark set in one pass.
+
+    points maps ANTHROPOMETRIC_LANDMARKS ids to positions. Returns arrays
+    in the order of ANTHROPOMETRIC_DISTANCES (scan units), _ANGLES (degrees)
+    and _RATIOS; measures that need an unplaced landmark are NaN.
+    """
+    ids = {k: i for i, k in enumerate(ANTHROPOMETRIC_LANDMARKS)}
+    positions = np.full((len(ids), 3), np.nan)
+    for k, p in points.items():
+        if k in ids:
+            positions[ids[k]] = p
+    pairwise = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+
+    pairs = np.array([[ids[a], ids[b]] for _, a, b in ANTHROPOMETRIC_DISTANCES])
+    distances = pairwise[pairs[:, 0], pairs[:, 1]]
+
+    triples = np.array([[ids[a], ids[v], ids[c]] for _, a, v, c in ANTHROPOMETRIC_ANGLES])
+    u = positions[triples[:, 0]] - positions[triples[:, 1]]
+    w = positions[triples[:, 2]] - positions[triples[:, 1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos = np.einsum("ij,ij->i", u, w) / (np.linalg.norm(u, axis=1) * np.linalg.norm(w, axis=1))
+        angles = np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+        names = {name: i for i, (name, _, _) in enumerate(ANTHROPOMETRIC_DISTANCES)}
+        quotients = np.array([[names[a], names[b]] for _, a, b in ANTHROPOMETRIC_RATIOS])
+        ratios = distances[quotients[:, 0]] / distances[quotients[:, 1]]
+    return {"distances": distances, "angles": angles, "ratios": ratios}
@@ -0,0 +1,332 @@
+"""Server-side mesh processing for the studio viewer.
+
+Scans are split into an octree of tiles. Leaves hold the full-resolution
+faces of their cell; every inner tile holds a vertex-clustered version of its
+whole subtree, coarser the higher it sits, together with its geometric error.
+The viewer draws the coarsest tiles whose projected error is small enough
+and only loads finer tiles where the camera needs them.
+
+Tiles are stored compactly and stay indexed: positions are 16-bit integers
+on a per-tile grid (the viewer puts the grid's offset and uniform step in the
+tile's mesh matrix, so the GPU dequantizes for free and CPU raycasts still
+work), UVs are normalized 16-bit, and indices are 16-bit whenever a tile has
+at most 65536 vertices. Normals are not stored at all: the viewer renders
+unlit and derives face normals from positions.
+
+Per-vertex scalar fields computed later (deviation between scans, ...) are
+written as layers: one int8 per tile vertex, in manifest tile order, scaled
+by the layer's range, so a whole field costs about a byte per vertex.
+
+The top levels are also packed coarse-first into stream.bin, which the viewer
+reads as a stream and renders tile by tile while it downloads, so the root
+shows up after a few hundred KB instead of after the whole scan.
+
+Before tiling, clean_scan drops the debris phone scans pick up (the chair,
+hair wisps, bits of floor) so it is neither shipped nor framed by the camera,
+and focus_region can keep full density only around the surgical site.
+
+Flap sites are shipped as a flattened surface patch (write_patch) and their
+transposition previews as sparse int16 position deltas on that patch
+(write_deltas), so a new preview costs a few bytes per moved vertex.
+"""
+import struct
+import json
+import os
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+TILE_MAX_FACES = 20000   # leaf size; inner tiles are simplified to roughly the same
+TILE_MAX_DEPTH = 8
+LOD_GRID = 32            # clustering cells along an inner tile's edge
+STREAM_MAX_BYTES = 8 * 1024 * 1024  # coarse levels packed into stream.bin; the rest loads on demand
+CLEANUP_MIN_FRACTION = 0.02  # components with fewer faces than this share of the main one are debris
+CLEANUP_MAX_GAP = 0.05       # components further than this × the main one's diagonal are debris
+FOCUS_PERIPHERY_GRID = 48    # clustering cells along the scan's diagonal outside a focus region
+
+
+def _compact(vertices, uv, faces):
+    # Keep only the vertices the faces use and renumber them from 0
+    used, inverse = np.unique(faces.ravel(), return_inverse=True)
+    return vertices[used], (uv[used] if uv is not None else None), inverse.reshape(-1, 3)
+
+
+def _cluster_simplify(vertices, uv, faces, cell, uv_cell, pinned=None):
+    # Vertex clustering: merge everything in the same grid cell. UVs are part
+    # of the key so the two sides of a texture seam never collapse together.
+    # Pinned vertices get a key of their own and are kept exactly.
+    keys = np.floor(vertices / cell).astype(np.int64)
+    if uv is not None:
+        keys = np.column_stack([keys, np.floor(uv / uv_cell).astype(np.int64)])
+    if pinned is not None:
+        keys = np.column_stack([keys, np.where(pinned, np.arange(1, len(vertices) + 1), 0)])
+    _, cluster, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.ravel()
+
+    n = len(counts)
+    positions = np.column_stack([np.bincount(cluster, vertices[:, k], n) for k in range(3)]) / counts[:, None]
+    uvs = None
+    if uv is not None:
+        uvs = np.column_stack([np.bincount(cluster, uv[:, k], n) for k in range(2)]) / counts[:, None]
+
+    new_faces = cluster[faces]
+    keep = ((new_faces[:, 0] != new_faces[:, 1]) &
+            (new_faces[:, 1] != new_faces[:, 2]) &
+            (new_faces[:, 0] != new_faces[:, 2]))
+    new_faces = new_faces[keep]
+    # Collapsed neighbourhoods produce the same triangle several times
+    _, first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    return _compact(positions, uvs, new_faces[np.sort(first)])
+
+
+def _box_gap(lo, hi, box_lo, box_hi):
+    # Distance from each box (rows of lo/hi) to one box, 0 where they overlap
+    return np.linalg.norm(np.maximum(0, np.maximum(lo - box_hi, box_lo - hi)), axis=1)
+
+
+def clean_scan(vertices, faces, uv=None, min_fraction=CLEANUP_MIN_FRACTION,
+               max_gap=CLEANUP_MAX_GAP, trim_margin=None):
+    """Keep the main connected component and whatever sits close to it and is big enough.
+
+    The main component is the one with the most faces (scanners mesh the
+    subject far more densely than the background). Others are dropped when
+    they have fewer than min_fraction of its faces or their bounding box
+    is more than max_gap × its diagonal away. With trim_margin, faces whose
+    centroid lies outside the main component's box grown by trim_margin ×
+    its diagonal are trimmed as well. Returns (vertices, faces, uv, stats).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    uv = np.asarray(uv, dtype=np.float64) if uv is not None else None
+
+    # Textured OBJs split vertices along UV seams; weld by position so a
+    # seam does not cut the surface into separate components
+    welded, weld = np.unique(vertices, axis=0, return_inverse=True)
+    weld = weld.ravel()
+    wf = weld[faces]
+    edges = np.concatenate([wf[:, [0, 1]], wf[:, [1, 2]]])
+    graph = coo_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+                       shape=(len(welded), len(welded)))
+    count, labels = connected_components(graph, directed=False)
+    face_label = labels[wf[:, 0]]
+
+    comp_faces = np.bincount(face_label, minlength=count)
+    main = int(np.argmax(comp_faces))
+
+    # Per-component bounding boxes over the vertices that faces use
+    used = np.zeros(len(welded), dtype=bool)
+    used[wf.ravel()] = True
+    lo = np.full((count, 3), np.inf)
+    hi = np.full((count, 3), -np.inf)
+    np.minimum.at(lo, labels[used], welded[used])
+    np.maximum.at(hi, labels[used], welded[used])
+    diagonal = np.linalg.norm(hi[main] - lo[main])
+
+    keep_comp = ((comp_faces >= min_fraction * comp_faces[main]) &
+                 (_box_gap(lo, hi, lo[main], hi[main]) <= max_gap * diagonal))
+    keep_comp[main] = True
+    keep = keep_comp[face_label]
+    if trim_margin is not None:
+        centroids = vertices[faces].mean(axis=1)
+        margin = trim_margin * diagonal
+        keep &= np.all((centroids >= lo[main] - margin) & (centroids <= hi[main] + margin), axis=1)
+
+    stats = {
+        "faces_before": int(len(faces)),
+        "faces_after": int(keep.sum()),
+        "components_removed": int(count - keep_comp[np.unique(face_label)].sum()),
+    }
+    vertices, uv, faces = _compact(vertices, uv, faces[keep])
+    return vertices, faces, uv, stats
+
+
+def focus_region(vertices, faces, uv, center, radius, periphery_grid=FOCUS_PERIPHERY_GRID):
+    """Keep full density within radius of center and decimate everything else.
+
+    Faces with a vertex inside the sphere are kept as they are. The rest of
+    the scan is vertex-clustered on a grid of periphery_grid cells along its
+    diagonal; the vertices of kept faces are pinned, so the border between the
+    two has no cracks. Returns (vertices, faces, uv, stats).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    uv = np.asarray(uv, dtype=np.float64) if uv is not None else None
+
+    near = np.linalg.norm(vertices - np.asarray(center, dtype=np.float64), axis=1) <= radius
+    inside = near[faces].any(axis=1)
+    pinned = np.zeros(len(vertices), dtype=bool)
+    pinned[faces[inside].ravel()] = True
+
+    cell = np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0)) / periphery_grid
+    uv_cell = cell * _uv_density(vertices, uv, faces) * 2 if uv is not None else None
+    vertices, uv, new_faces = _cluster_simplify(vertices, uv, faces, cell, uv_cell, pinned=pinned)
+    stats = {
+        "faces_before": int(len(faces)),
+        "faces_after": int(len(new_faces)),
+        "faces_inside": int(inside.sum()),
+    }
+    return vertices, new_faces, uv, stats
+
+
+def _uv_density(vertices, uv, faces):
+    # UV units per model unit, from total UV area vs total surface area
+    tri = vertices[faces]
+    area = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum()
+    t = uv[faces]
+    e1, e2 = t[:, 1] - t[:, 0], t[:, 2] - t[:, 0]
+    uv_area = np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]).sum()
+    return np.sqrt(uv_area / area) if area > 0 and uv_area > 0 else 1.0
+
+
+def _write_tile(path, positions, uvs, faces):
+    # Layout: uint16 positions (padded to 4 bytes), uint16 UVs, uint16/uint32 indices
+    offset = positions.min(axis=0)
+    step = (positions.max(axis=0) - offset).max() / 65535 or 1.0
+    quantized = np.round((positions - offset) / step).astype("<u2")
+    index16 = len(positions) <= 65536
+    with open(path, "wb") as f:
+        f.write(quantized.tobytes())
+        if quantized.nbytes % 4:
+            f.write(b"\0\0")
+        if uvs is not None:
+            # Scan texture atlases live in [0, 1]
+            f.write(np.round(np.clip(uvs, 0, 1) * 65535).astype("<u2").tobytes())
+        f.write(faces.astype("<u2" if index16 else "<u4").tobytes())
+    return {"offset": offset.tolist(), "step": float(step), "index16": index16}
+
+
+def read_tile_positions(out_dir, tile):
+    """Dequantized vertex positions of a written tile, in scan space."""
+    quantized = np.fromfile(os.path.join(out_dir, tile["url"]), dtype="<u2", count=tile["vertices"] * 3)
+    return quantized.reshape(-1, 3) * tile["step"] + np.asarray(tile["offset"])
+
+
+def write_scalar_layer(out_dir, manifest, name, sample, value_range):
+    """Write <name>.bin with sample(positions) for every tile's vertices.
+
+    Values are clipped to ±value_range and stored as int8; the viewer maps
+    them back with the range returned in the layer description.
+    """
+    with open(os.path.join(out_dir, f"{name}.bin"), "wb") as f:
+        for tile in manifest["tiles"]:
+            values = np.asarray(sample(read_tile_positions(out_dir, tile)), dtype=np.float64)
+            f.write(np.round(np.clip(values / value_range, -1, 1) * 127).astype(np.int8).tobytes())
+    return {"url": f"{name}.bin", "range": float(value_range)}
+
+
+def write_patch(out_dir, name, vertices, uv, faces):
+    """Write <name>.bin with a surface patch and its 2D parameterization.
+
+    Layout: uint32 vertex count, uint32 face count, float32 positions (xyz),
+    float32 uv, uint32 indices.
+    """
+    with open(os.path.join(out_dir, f"{name}.bin"), "wb") as f:
+        f.write(struct.pack("<II", len(vertices), len(faces)))
+        f.write(np.asarray(vertices, dtype=np.float32).tobytes())
+        f.write(np.asarray(uv, dtype=np.float32).tobytes())
+        f.write(np.asarray(faces, dtype=np.uint32).tobytes())
+    return {"url": f"{name}.bin", "vertices": len(vertices), "faces": len(faces)}
+
+
+def write_deltas(out_dir, name, deltas, tolerance):
+    """Write <name>.bin with the vertices of a patch that moved.
+
+    Layout: uint32 moved count, float32 scale, uint32 vertex indices, int16
+    xyz deltas (delta = value × scale). Vertices that moved less than
+    tolerance are left out.
+    """
+    deltas = np.asarray(deltas, dtype=np.float64)
+    moved = np.flatnonzero(np.abs(deltas).max(axis=1) > tolerance)
+    scale = np.abs(deltas[moved]).max() / 32767 if len(moved) else 1.0
+    with open(os.path.join(out_dir, f"{name}.bin"), "wb") as f:
+        f.write(struct.pack("<If", len(moved), scale))
+        f.write(moved.astype(np.uint32).tobytes())
+        f.write(np.round(deltas[moved] / scale).astype(np.int16).tobytes())
+    return {"url": f"{name}.bin", "moved": len(moved)}
+
+
+def _write_stream(out_dir, tiles):
+    # Records: uint32 tile index, uint32 byte length, tile bytes. Whole levels
+    # go in coarse-first until the byte budget is reached.
+    streamed = []
+    size = 0
+    with open(os.path.join(out_dir, "stream.bin"), "wb") as stream:
+        for level in sorted({t["level"] for t in tiles}):
+            level_tiles = [(i, t) for i, t in enumerate(tiles) if t["level"] == level]
+            level_size = sum(os.path.getsize(os.path.join(out_dir, t["url"])) + 8 for _, t in level_tiles)
+            if streamed and size + level_size > STREAM_MAX_BYTES:
+                break
+            for index, tile in level_tiles:
+                with open(os.path.join(out_dir, tile["url"]), "rb") as f:
+                    data = f.read()
+                stream.write(struct.pack("<II", index, len(data)))
+                stream.write(data)
+                streamed.append(tile["id"])
+            size += level_size
+    return {"url": "stream.bin", "tiles": streamed, "bytes": size}
+
+
+def write_tileset(out_dir, vertices, faces, uv=None, texture=None, meta=None):
+    """Write tiles/<id>.bin, stream.bin and tiles.json into out_dir and return the manifest.
+
+    meta is stored in the manifest as-is (processing options and stats).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    uv = np.asarray(uv, dtype=np.float64) if uv is not None else None
+    os.makedirs(os.path.join(out_dir, "tiles"), exist_ok=True)
+
+    centroids = vertices[faces].mean(axis=1)
+    lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    uv_density = _uv_density(vertices, uv, faces) if uv is not None else 1.0
+    octant_bits = np.array([1, 2, 4])
+    tiles = []
+
+    def visit(tile_id, face_idx, center, half, level):
+        tile = {"id": tile_id, "level": level, "children": []}
+        local = _compact(vertices, uv, faces[face_idx])
+
+        if len(face_idx) <= TILE_MAX_FACES or level >= TILE_MAX_DEPTH:
+            positions, uvs, tile_faces = local
+            tile["error"] = 0.0
+        else:
+            octant = ((centroids[face_idx] > center) * octant_bits).sum(axis=1)
+            order = np.argsort(octant, kind="stable")
+            splits = np.searchsorted(octant[order], np.arange(9))
+            for o in range(8):
+                child_idx = face_idx[order[splits[o]:splits[o + 1]]]
+                if len(child_idx) == 0:
+                    continue
+                offset = (np.array([o & 1, (o >> 1) & 1, (o >> 2) & 1]) - 0.5) * half
+                tile["children"].append(visit(tile_id + str(o), child_idx, center + offset, half / 2, level + 1))
+
+            cell = 2 * half / LOD_GRID
+            positions, uvs, tile_faces = _cluster_simplify(*local, cell, cell * uv_density * 2)
+            tile["error"] = float(cell * np.sqrt(3))
+
+        tile["url"] = f"tiles/{tile_id}.bin"
+        tile["vertices"] = int(len(positions))
+        tile["faces"] = int(len(tile_faces))
+        tile["bounds"] = [positions.min(axis=0).tolist(), positions.max(axis=0).tolist()]
+        tile.update(_write_tile(os.path.join(out_dir, tile["url"]), positions, uvs, tile_faces))
+        tiles.append(tile)
+        return tile_id
+
+    root = visit("r", np.arange(len(faces)), (lo + hi) / 2, (hi - lo).max() / 2, 0)
+    tiles.sort(key=lambda t: (t["level"], t["id"]))
+
+    manifest = {
+        "version": 2,
+        "root": root,
+        "bounds": [lo.tolist(), hi.tolist()],
+        "faces": int(len(faces)),
+        "has_uv": uv is not None,
+        "texture": texture if uv is not None else None,
+        "tiles": tiles,
+        "stream": _write_stream(out_dir, tiles),
+        "meta": meta or {},
+    }
+    with open(os.path.join(out_dir, "tiles.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
@@ -1,2550 +1,864 @@
-import streamlit as st
-import streamlit.components.v1 as components
-import trimesh
-import os
-import zipfile
-import tempfile
-import base64
-import shutil
-
-# --- CONFIGURATION ---
-st.set_page_config(layout="wide", page_title="HIDU - Surgical Planning Studio")
-
-st.markdown("""
-<style>
-    .stApp { background-color: #0a0e27; color: #e8eaf6; }
-    h1 { color: #ffffff !important; font-weight: 300 !important; letter-spacing: 2px; }
-    .stFileUploader { 
-        border: 2px dashed #3949ab; 
-        border-radius: 12px; 
-        background: rgba(57, 73, 171, 0.05);
-        padding: 20px;
-    }
-    section[data-testid="stSidebar"] { 
-        background: linear-gradient(180deg, #1a237e 0%, #0d47a1 100%);
-        color: white;
-    }
-    .stButton>button {
-        background: linear-gradient(135deg, #1976d2 0%, #2196f3 100%);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 10px 24px;
-        font-weight: 500;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(33, 150, 243, 0.4);
-    }
-</style>
-""", unsafe_allow_html=True)
-
-st.title("⚕️ HIDU: Medical Surgical Planning Studio")
-
-if 'scale_factor' not in st.session_state:
-    st.session_state['scale_factor'] = 1.0
-
-# --- BACKEND ---
-@st.cache_data(show_spinner=False)
-def process_file_high_quality(uploaded_file):
-    temp_dir = tempfile.mkdtemp()
-    extract_path = os.path.join(temp_dir, "extracted")
-    os.makedirs(extract_path, exist_ok=True)
-    
-    with zipfile.ZipFile(uploaded_file, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
-    
-    obj_file = None
-    mtl_file = None
-    tex_file = None
-    
-    for root, dirs, files in os.walk(extract_path):
-        for file in files:
-            if file.lower().endswith('.obj'):
-                obj_file = os.path.join(root, file)
-            elif file.lower().endswith('.mtl'):
-                mtl_file = os.path.join(root, file)
-            elif file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                tex_file = os.path.join(root, file)
-
-    if not obj_file:
-        return None, None, "❌ No .obj file found"
-    
-    mesh = trimesh.load(obj_file, force='mesh')
-    mesh.apply_translation(-mesh.centroid) 
-    obj_str = mesh.export(file_type='obj')
-    
-    mtl_content = ""
-    if mtl_file and tex_file:
-        try:
-            with open(tex_file, "rb") as f:
-                b64_img = base64.b64encode(f.read()).decode()
-            mime = "image/png" if tex_file.lower().endswith('.png') else "image/jpeg"
-            data_uri = f"data:{mime};base64,{b64_img}"
-            with open(mtl_file, "r", encoding='utf-8', errors='ignore') as f:
-                raw_mtl = f.read()
-            lines = []
-            for line in raw_mtl.splitlines():
-                if line.strip().startswith("map_Kd"):
-                    lines.append(f"map_Kd {data_uri}")
-                else:
-                    lines.append(line)
-            mtl_content = "\n".join(lines)
-        except:
-            mtl_content = ""
-            
-    shutil.rmtree(temp_dir)
-    return obj_str, mtl_content, None
-
-# --- FRONTEND: MEDICAL GRADE 3D VIEWER ---
-def render_studio_viewer(obj_text, mtl_text, scale_factor, height=750):
-    if isinstance(obj_text, bytes): obj_text = obj_text.decode('utf-8')
-    b64_obj = base64.b64encode(obj_text.encode('utf-8')).decode('utf-8')
-    b64_mtl = base64.b64encode(mtl_text.encode('utf-8')).decode('utf-8')
-    
-    html_code = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-        <link href="https://fonts.googleapis.com/icon?family=Material+Icons" rel="stylesheet">
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{ 
-                overflow: hidden; 
-                background: linear-gradient(135deg, #0a0e27 0%, #1a237e 100%);
-                font-family: 'Segoe UI', 'Roboto', sans-serif; 
-                user-select: none;
-                -webkit-user-select: none;
-                -webkit-touch-callout: none;
-                touch-action: none;
-            }}
-            canvas {{ 
-                width: 100%; 
-                height: 100%; 
-                display: block; 
-                outline: none;
-                touch-action: none;
-            }}
-            
-            /* PROFESSIONAL MEDICAL TOOLBAR */
-            .toolbar {{
-                position: absolute; top: 20px; left: 20px;
-                background: linear-gradient(135deg, rgba(13, 71, 161, 0.95), rgba(25, 118, 210, 0.95));
-                backdrop-filter: blur(15px);
-                border-radius: 16px;
-                padding: 12px;
-                border: 2px solid rgba(255,255,255,0.15);
-                display: flex; flex-direction: column; gap: 10px;
-                box-shadow: 0 8px 32px rgba(0,0,0,0.4);
-                width: 60px;
-                z-index: 100;
-                touch-action: none;
-            }}
-            
-            .tool-btn {{
-                width: 48px; height: 48px;
-                border-radius: 12px; border: none;
-                background: rgba(255,255,255,0.1); 
-                color: #e3f2fd;
-                cursor: pointer; 
-                transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-                display: flex; align-items: center; justify-content: center;
-                touch-action: none;
-            }}
-            .tool-btn:hover {{ 
-                background: rgba(255,255,255,0.2); 
-                transform: translateY(-2px);
-                box-shadow: 0 4px 12px rgba(33,150,243,0.4);
-            }}
-            .tool-btn.active {{ 
-                background: linear-gradient(135deg, #2196f3, #1976d2);
-                box-shadow: 0 4px 20px rgba(33,150,243,0.6);
-                transform: scale(1.05);
-            }}
-            .tool-btn i {{ font-size: 24px; }}
-            
-            .divider {{ height: 2px; background: rgba(255,255,255,0.2); margin: 5px 0; border-radius: 1px; }}
-
-            /* SETTINGS PANEL */
-            .settings-panel {{
-                position: absolute; top: 20px; left: 95px;
-                background: linear-gradient(135deg, rgba(13, 71, 161, 0.95), rgba(25, 118, 210, 0.95));
-                backdrop-filter: blur(15px);
-                border-radius: 16px;
-                padding: 20px;
-                border: 2px solid rgba(255,255,255,0.15);
-                color: white; 
-                width: 280px;
-                display: none;
-                flex-direction: column; 
-                gap: 16px;
-                z-index: 99;
-                box-shadow: 0 8px 32px rgba(0,0,0,0.4);
-                touch-action: none;
-            }}
-            
-            .panel-header {{
-                font-weight: 600;
-                font-size: 14px;
-                color: #e3f2fd;
-                letter-spacing: 1px;
-                text-transform: uppercase;
-                border-bottom: 2px solid rgba(255,255,255,0.2);
-                padding-bottom: 10px;
-                margin-bottom: 5px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            
-            .close-panel-btn {{
-                width: 24px;
-                height: 24px;
-                border-radius: 50%;
-                background: rgba(255,255,255,0.2);
-                border: none;
-                color: white;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: all 0.2s;
-                font-size: 18px;
-                line-height: 1;
-                padding: 0;
-            }}
-            
-            .close-panel-btn:hover {{
-                background: rgba(244,67,54,0.8);
-                transform: scale(1.1);
-            }}
-            
-            .setting-row {{ 
-                display: flex; 
-                align-items: center; 
-                justify-content: space-between; 
-                font-size: 13px;
-                padding: 8px 0;
-            }}
-            
-            .setting-label {{
-                color: #e3f2fd;
-                font-weight: 500;
-            }}
-            
-            /* Medical Color Presets */
-            .color-presets {{
-                display: grid;
-                grid-template-columns: repeat(5, 1fr);
-                gap: 8px;
-                margin: 10px 0;
-            }}
-            
-            .color-preset {{
-                width: 36px;
-                height: 36px;
-                border-radius: 8px;
-                cursor: pointer;
-                border: 2px solid transparent;
-                transition: all 0.2s;
-                touch-action: none;
-            }}
-            
-            .color-preset:hover {{
-                transform: scale(1.1);
-                border-color: white;
-            }}
-            
-            .color-preset.active {{
-                border-color: white;
-                box-shadow: 0 0 12px currentColor;
-            }}
-            
-            .slider {{ 
-                width: 140px; 
-                height: 6px;
-                border-radius: 3px;
-                background: rgba(255,255,255,0.2);
-                outline: none;
-                -webkit-appearance: none;
-            }}
-            
-            .slider::-webkit-slider-thumb {{
-                -webkit-appearance: none;
-                width: 16px;
-                height: 16px;
-                border-radius: 50%;
-                background: #2196f3;
-                cursor: pointer;
-                box-shadow: 0 2px 8px rgba(33,150,243,0.5);
-            }}
-            
-            .value-display {{
-                min-width: 45px;
-                text-align: right;
-                font-weight: 600;
-                color: #64b5f6;
-            }}
-            
-            /* MEASUREMENT DISPLAY */
-            .measurement-box {{
-                background: rgba(0,0,0,0.7);
-                border: 2px solid #4caf50;
-                border-radius: 12px;
-                padding: 16px;
-                margin-top: 10px;
-                text-align: center;
-            }}
-            
-            .measurement-label {{
-                font-size: 11px;
-                color: #a5d6a7;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 5px;
-            }}
-            
-            .measurement-value {{
-                font-size: 24px;
-                font-weight: 700;
-                color: #4caf50;
-                text-shadow: 0 0 10px rgba(76,175,80,0.5);
-            }}
-
-            /* HUD INFO */
-            .info-hud {{
-                position: absolute; 
-                bottom: 30px; 
-                left: 50%; 
-                transform: translateX(-50%);
-                background: rgba(0,0,0,0.8); 
-                color: white;
-                padding: 12px 24px; 
-                border-radius: 24px; 
-                font-size: 13px;
-                pointer-events: none; 
-                opacity: 0; 
-                transition: opacity 0.3s;
-                border: 1px solid rgba(255,255,255,0.2);
-            }}
-            .info-hud.visible {{ opacity: 1; }}
-
-            /* ANNOTATION LABEL - CẬP NHẬT MỚI */
-            .annotation-label {{
-                position: absolute;
-                color: white;
-                border-radius: 8px;
-                font-size: 12px;
-                font-weight: 600;
-                pointer-events: all;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.3);
-                border: 1px solid rgba(255,255,255,0.4);
-                min-width: 140px;
-                touch-action: none;
-                user-select: none;
-                display: flex;
-                flex-direction: column;
-                overflow: hidden;
-                transition: transform 0.1s;
-                z-index: 1000;
-            }}
-            
-            .annotation-header {{
-                padding: 6px 10px;
-                cursor: grab;
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-                background: rgba(0,0,0,0.2);
-            }}
-
-            .annotation-header:active {{
-                cursor: grabbing;
-            }}
-            
-            .annotation-body {{
-                padding: 8px;
-                background: inherit;
-            }}
-            
-            .annotation-number {{
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                width: 20px;
-                height: 20px;
-                background: white;
-                color: #333;
-                border-radius: 50%;
-                font-size: 11px;
-                font-weight: bold;
-                margin-right: 8px;
-            }}
-            
-            .annotation-input {{
-                background: rgba(255,255,255,0.2);
-                border: 1px solid rgba(255,255,255,0.3);
-                color: inherit;
-                padding: 4px 8px;
-                border-radius: 4px;
-                width: 100%;
-                font-size: 11px;
-                outline: none;
-            }}
-            
-            .annotation-input::placeholder {{
-                color: rgba(255,255,255,0.6);
-            }}
-            
-            /* FLOATING MEASUREMENT LABELS */
-            .floating-label {{
-                position: absolute;
-                background: rgba(76, 175, 80, 0.95);
-                color: white;
-                padding: 8px 14px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: 700;
-                pointer-events: all;
-                z-index: 1000;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.5);
-                border: 2px solid rgba(255,255,255,0.5);
-                white-space: nowrap;
-                cursor: grab;
-                user-select: none;
-                display: flex;
-                align-items: center;
-                gap: 8px;
-            }}
-            
-            .floating-label:active {{
-                cursor: grabbing;
-            }}
-            
-            .floating-label.distance {{
-                background: rgba(33, 150, 243, 0.95);
-            }}
-            
-            .floating-label.angle {{
-                background: rgba(255, 152, 0, 0.95);
-            }}
-            
-            .floating-label.area {{
-                background: rgba(156, 39, 176, 0.95);
-                font-size: 15px;
-            }}
-            
-            .label-close-btn {{
-                width: 18px;
-                height: 18px;
-                border-radius: 50%;
-                background: rgba(244, 67, 54, 0.9);
-                border: none;
-                color: white;
-                font-size: 12px;
-                font-weight: bold;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: all 0.2s;
-                padding: 0;
-                line-height: 1;
-            }}
-            
-            .label-close-btn:hover {{
-                background: rgba(244, 67, 54, 1);
-                transform: scale(1.1);
-            }}
-            
-            /* EXPORT BUTTONS */
-            .export-panel {{
-                position: absolute;
-                bottom: 20px;
-                right: 20px;
-                display: flex;
-                flex-direction: column;
-                gap: 10px;
-                z-index: 100;
-            }}
-            
-            .export-btn {{
-                background: linear-gradient(135deg, rgba(76, 175, 80, 0.95), rgba(56, 142, 60, 0.95));
-                backdrop-filter: blur(15px);
-                color: white;
-                border: 2px solid rgba(255,255,255,0.3);
-                border-radius: 12px;
-                padding: 12px 20px;
-                cursor: pointer;
-                font-weight: 600;
-                font-size: 13px;
-                transition: all 0.3s;
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.3);
-            }}
-            
-            .export-btn:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 6px 20px rgba(76,175,80,0.5);
-            }}
-            
-            .export-btn i {{
-                font-size: 18px;
-            }}
-            
-            .export-btn.save {{
-                background: linear-gradient(135deg, rgba(33, 150, 243, 0.95), rgba(25, 118, 210, 0.95));
-            }}
-            
-            .export-btn.load {{
-                background: linear-gradient(135deg, rgba(156, 39, 176, 0.95), rgba(123, 31, 162, 0.95));
-            }}
-            
-            .export-btn:hover.save {{
-                box-shadow: 0 6px 20px rgba(33,150,243,0.5);
-            }}
-            
-            .export-btn:hover.load {{
-                box-shadow: 0 6px 20px rgba(156,39,176,0.5);
-            }}
-
-            #file-input {{
-                display: none;
-            }}
-
-            /* VIEW NAVIGATION - WITH TOGGLE */
-            .nav-panel {{
-                position: absolute; top: 20px; right: 20px;
-                background: linear-gradient(135deg, rgba(13, 71, 161, 0.95), rgba(25, 118, 210, 0.95));
-                backdrop-filter: blur(15px);
-                border-radius: 16px;
-                padding: 15px;
-                border: 2px solid rgba(255,255,255,0.15);
-                box-shadow: 0 8px 32px rgba(0,0,0,0.4);
-                touch-action: none;
-                transition: all 0.3s;
-            }}
-            
-            .nav-panel.collapsed {{
-                padding: 8px;
-                width: 50px;
-            }}
-            
-            .nav-toggle-btn {{
-                position: absolute;
-                top: -10px;
-                right: -10px;
-                width: 30px;
-                height: 30px;
-                border-radius: 50%;
-                background: linear-gradient(135deg, #2196f3, #1976d2);
-                border: 2px solid rgba(255,255,255,0.3);
-                color: white;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                font-size: 18px;
-                z-index: 10;
-                transition: all 0.3s;
-            }}
-            
-            .nav-toggle-btn:hover {{
-                transform: scale(1.1);
-                box-shadow: 0 4px 12px rgba(33,150,243,0.6);
-            }}
-            
-            .nav-content {{
-                transition: all 0.3s;
-            }}
-            
-            .nav-content.hidden {{
-                display: none;
-            }}
-            
-            .nav-grid {{
-                display: grid;
-                grid-template-columns: repeat(3, 50px);
-                grid-template-rows: repeat(3, 50px);
-                gap: 8px;
-                margin-bottom: 12px;
-            }}
-            
-            .nav-btn {{
-                background: rgba(255,255,255,0.1);
-                color: #fff; 
-                border: 2px solid rgba(255,255,255,0.2);
-                border-radius: 10px; 
-                font-size: 11px; 
-                font-weight: 600;
-                cursor: pointer;
-                text-align: center;
-                transition: all 0.3s;
-                backdrop-filter: blur(10px);
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                touch-action: none;
-            }}
-            
-            .nav-btn:hover {{ 
-                background: linear-gradient(135deg, #2196f3, #1976d2);
-                transform: scale(1.05);
-                box-shadow: 0 4px 12px rgba(33,150,243,0.4);
-            }}
-            
-            .nav-btn.center {{
-                background: rgba(255,255,255,0.15);
-                cursor: default;
-                pointer-events: none;
-            }}
-            
-            .rotate-controls {{
-                display: grid;
-                grid-template-columns: repeat(3, 50px);
-                grid-template-rows: repeat(3, 50px);
-                gap: 8px;
-            }}
-            
-            .rotate-btn {{
-                background: rgba(255,255,255,0.1);
-                color: #fff;
-                border: 2px solid rgba(255,255,255,0.2);
-                border-radius: 10px;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: all 0.3s;
-                touch-action: none;
-            }}
-            
-            .rotate-btn:hover {{
-                background: rgba(255,255,255,0.2);
-                transform: scale(1.05);
-            }}
-            
-            .rotate-btn i {{
-                font-size: 20px;
-            }}
-        
-            /* TOGGLE SWITCH CSS (FIXED FOR PYTHON F-STRING & LAYOUT) */
-            .switch {{
-              position: relative;
-              display: inline-block;
-              width: 40px;
-              height: 20px;
-            }}
-            .switch input {{ 
-              opacity: 0; 
-              width: 0; 
-              height: 0; 
-            }}
-            /* Đã đổi tên class từ .slider -> .toggle-slider để không trùng */
-            .toggle-slider {{
-              position: absolute;
-              cursor: pointer;
-              top: 0; left: 0; right: 0; bottom: 0;
-              background-color: rgba(255,255,255,0.2);
-              transition: .4s;
-              border-radius: 34px;
-            }}
-            .toggle-slider:before {{
-              position: absolute;
-              content: "";
-              height: 14px;
-              width: 14px;
-              left: 3px;
-              bottom: 3px;
-              background-color: white;
-              transition: .4s;
-              border-radius: 50%;
-            }}
-            input:checked + .toggle-slider {{
-              background-color: #2196F3;
-            }}
-            input:checked + .toggle-slider:before {{
-              transform: translateX(20px);
-            }}
-
-        </style>
-        
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/OBJLoader.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/loaders/MTLLoader.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js"></script>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/tween.js/18.6.4/tween.umd.js"></script>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
-    </head>
-    <body>
-        
-        <!-- TOOLBAR -->
-        <div class="toolbar">
-            <button class="tool-btn active" id="t-view" onclick="selectTool('view')" title="Rotate View">
-                <i class="material-icons">3d_rotation</i>
-            </button>
-            <div class="divider"></div>
-            <button class="tool-btn" id="t-brush" onclick="selectTool('brush')" title="Surface Brush">
-                <i class="material-icons">brush</i>
-            </button>
-            <button class="tool-btn" id="t-eraser" onclick="selectTool('eraser')" title="Eraser">
-                <i class="material-icons">auto_fix_high</i>
-            </button>
-            <button class="tool-btn" id="t-line" onclick="selectTool('line')" title="Measurement Line">
-                <i class="material-icons">timeline</i>
-            </button>
-            <button class="tool-btn" id="t-annotation" onclick="selectTool('annotation')" title="Annotation">
-                <i class="material-icons">pin_drop</i>
-            </button>
-            <div class="divider"></div>
-            <button class="tool-btn" id="t-distance" onclick="selectTool('distance')" title="Distance Tool">
-                <i class="material-icons">straighten</i>
-            </button>
-            <button class="tool-btn" id="t-angle" onclick="selectTool('angle')" title="Angle Measurement">
-                <i class="material-icons">architecture</i>
-            </button>
-            <div class="divider"></div>
-            <button class="tool-btn" id="t-undo" onclick="undo()" title="Undo">
-                <i class="material-icons">undo</i>
-            </button>
-            <button class="tool-btn" id="t-clear" onclick="clearAll()" title="Clear All">
-                <i class="material-icons">delete_outline</i>
-            </button>
-        </div>
-
-        <!-- SETTINGS PANEL -->
-       <div class="settings-panel" id="settings">
-            <div class="panel-header">
-                <span id="tool-name">TOOL SETTINGS</span>
-                <button class="close-panel-btn" onclick="toggleSettingsPanel()" title="Hide Settings">×</button>
-            </div>
-            
-            <div>
-                <div class="setting-label" style="margin-bottom: 8px;">Surgical Marker Color</div>
-                <div class="color-presets">
-                    <div class="color-preset active" style="background: #9C27B0;" data-color="#9C27B0" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #E91E63;" data-color="#E91E63" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #2196F3;" data-color="#2196F3" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #4CAF50;" data-color="#4CAF50" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #FF9800;" data-color="#FF9800" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #F44336;" data-color="#F44336" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #00BCD4;" data-color="#00BCD4" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #FFEB3B;" data-color="#FFEB3B" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #FFFFFF;" data-color="#FFFFFF" onclick="setColor(this)"></div>
-                    <div class="color-preset" style="background: #000000;" data-color="#000000" onclick="setColor(this)"></div>
-                </div>
-            </div>
-            
-            <div class="setting-row">
-                <span class="setting-label">Line Width</span>
-                <input type="range" id="p-width" class="slider" min="0.001" max="0.008" step="0.0005" value="0.002" oninput="updateSettings()">
-                <span class="value-display" id="width-val">2</span>
-            </div>
-            
-            <div class="setting-row" id="eraser-size-row" style="display:none;">
-                <span class="setting-label">Eraser Size</span>
-                <input type="range" id="p-eraser" class="slider" min="0.02" max="0.15" step="0.01" value="0.05" oninput="updateSettings()">
-                <span class="value-display" id="eraser-val">5</span>
-            </div>
-            
-            <div class="setting-row">
-                <span class="setting-label">Opacity</span>
-                <input type="range" id="p-opacity" class="slider" min="0.3" max="1" step="0.1" value="0.95" oninput="updateSettings()">
-                <span class="value-display" id="opacity-val">0.95</span>
-            </div>
-            
-            <div class="setting-row">
-                <span class="setting-label">Surface Offset</span>
-                <input type="range" id="p-offset" class="slider" min="0.00001" max="0.001" step="0.00001" value="0.0001" oninput="updateSettings()">
-                <span class="value-display" id="offset-val">0.0001</span>
-            </div>
-            
-            <div class="setting-row">
-                <span class="setting-label">Auto-Calc Area</span>
-                <label class="switch">
-                    <input type="checkbox" id="p-auto-area" checked onchange="updateSettings()">
-                    <span class="toggle-slider"></span>
-                </label>
-            </div>
-            
-            <div id="measure-box" style="display:none;">
-                <div class="measurement-box">
-                    <div class="measurement-label" id="measure-label">MEASUREMENT</div>
-                    <div class="measurement-value" id="measure-value">0.0 mm</div>
-                </div>
-            </div>
-        </div> <div id="info-hud" class="info-hud">Select a tool to start</div>
-
-        <!-- EXPORT PANEL -->
-        <div class="export-panel">
-            <button class="export-btn" onclick="exportPDFReport()" title="Export PDF Report">
-                <i class="material-icons">picture_as_pdf</i>
-                <span>Export PDF</span>
-            </button>
-            <button class="export-btn save" onclick="saveProject()" title="Save Project">
-                <i class="material-icons">save</i>
-                <span>Save Project</span>
-            </button>
-            <button class="export-btn load" onclick="document.getElementById('file-input').click()" title="Load Project">
-                <i class="material-icons">folder_open</i>
-                <span>Load Project</span>
-            </button>
-        </div>
-        
-        <input type="file" id="file-input" accept=".json" onchange="loadProject(event)">
-
-        <!-- VIEW NAVIGATION WITH TOGGLE -->
-        <div class="nav-panel" id="nav-panel">
-            <div class="nav-toggle-btn" onclick="toggleNavPanel()" title="Toggle Navigation Panel">
-                <i class="material-icons" id="nav-toggle-icon">remove</i>
-            </div>
-            
-            <div class="nav-content" id="nav-content">
-                <div class="nav-grid">
-                    <div class="nav-btn" onclick="setView('top')">TOP</div>
-                    <div></div>
-                    <div></div>
-                    
-                    <div class="nav-btn" onclick="setView('left')">LEFT</div>
-                    <div class="nav-btn center">VIEW</div>
-                    <div class="nav-btn" onclick="setView('right')">RIGHT</div>
-                    
-                    <div></div>
-                    <div class="nav-btn" onclick="setView('front')">FRONT</div>
-                    <div class="nav-btn" onclick="setView('bottom')">BOT</div>
-                </div>
-                
-                <div style="height: 2px; background: rgba(255,255,255,0.2); margin: 10px 0;"></div>
-                
-                <div class="rotate-controls">
-                    <div></div>
-                    <div class="rotate-btn" onclick="rotateCamera('up')">
-                        <i class="material-icons">arrow_upward</i>
-                    </div>
-                    <div></div>
-                    
-                    <div class="rotate-btn" onclick="rotateCamera('left')">
-                        <i class="material-icons">arrow_back</i>
-                    </div>
-                    <div></div>
-                    <div class="rotate-btn" onclick="rotateCamera('right')">
-                        <i class="material-icons">arrow_forward</i>
-                    </div>
-                    
-                    <div></div>
-                    <div class="rotate-btn" onclick="rotateCamera('down')">
-                        <i class="material-icons">arrow_downward</i>
-                    </div>
-                    <div></div>
-                </div>
-            </div>
-        </div>
-
-        <script>
-            let camera, controls, scene, renderer, raycaster, mouse;
-            let currentZoom = 300; 
-            let targetObject = null;
-            let currentTool = 'view';
-            const SCALE_FACTOR = {scale_factor};
-            
-            // Drawing State
-            let isDrawing = false;
-            let drawPoints = [];
-            let tempMeshes = [];
-            let drawnObjects = [];
-            let lastDrawTime = 0;
-            
-            // Eraser State
-            let isErasing = false;
-            let eraserRadius = 0.05;
-            let eraserCursor = null;
-            
-            // Annotation State
-            let annotationCounter = 1;
-            let annotations = [];
-            let draggedAnnotation = null;
-            let dragOffset = {{ x: 0, y: 0 }};
-            let isDraggingAnnotation = false;
-            
-            // Measurement State
-            let measurePoints = [];
-            let measureMarkers = [];
-            let floatingLabels = []; // Floating measurement labels
-            let measurements = []; // Store all measurements for export
-            let draggedLabel = null;
-            let labelDragOffset = {{ x: 0, y: 0 }};
-            
-            // iPad touch handling
-            let touchStartTime = 0;
-            let longPressTimer = null;
-            let lastClickTime = 0; // Prevent double-tap
-            
-            // UI State
-            let settingsPanelVisible = false;
-            let navPanelExpanded = true;
-            
-            // Settings
-            let settings = {{
-                color: 0x9C27B0,
-                colorHex: '#9C27B0',
-                lineWidth: 0.002,
-                opacity: 0.95,
-                offsetFactor: 0.0001,
-                autoArea: true
-            }};
-
-            function init() {{
-                scene = new THREE.Scene();
-                scene.background = new THREE.Color(0x1a1a1a);
-
-                camera = new THREE.PerspectiveCamera(45, window.innerWidth / window.innerHeight, 0.1, 2000);
-                renderer = new THREE.WebGLRenderer({{ antialias: true, preserveDrawingBuffer: true }});
-                renderer.setSize(window.innerWidth, {height});
-                renderer.setPixelRatio(window.devicePixelRatio);
-                renderer.outputEncoding = THREE.sRGBEncoding;
-                document.body.appendChild(renderer.domElement);
-
-                controls = new THREE.OrbitControls(camera, renderer.domElement);
-                controls.enableDamping = true;
-                controls.dampingFactor = 0.05;
-
-                raycaster = new THREE.Raycaster();
-                raycaster.params.Line.threshold = 0.5;
-                mouse = new THREE.Vector2();
-
-                // LOAD MODEL
-                const mtlLoader = new THREE.MTLLoader();
-                const materials = mtlLoader.parse(atob("{b64_mtl}"));
-                materials.preload();
-                
-                for (const key in materials.materials) {{
-                    const mat = materials.materials[key];
-                    const basicMat = new THREE.MeshBasicMaterial({{ 
-                        map: mat.map, 
-                        side: THREE.DoubleSide 
-                    }});
-                    if(basicMat.map) basicMat.map.encoding = THREE.sRGBEncoding;
-                    materials.materials[key] = basicMat;
-                }}
-
-                const objLoader = new THREE.OBJLoader();
-                objLoader.setMaterials(materials);
-                const object = objLoader.parse(atob("{b64_obj}"));
-
-                const box = new THREE.Box3().setFromObject(object);
-                const center = box.getCenter(new THREE.Vector3());
-                object.position.sub(center);
-                const size = box.getSize(new THREE.Vector3());
-                const maxDim = Math.max(size.x, size.y, size.z);
-                
-                if(maxDim > 0) {{
-                     currentZoom = maxDim * 2.0; 
-                     camera.position.set(0, 0, currentZoom);
-                }} else {{ 
-                    camera.position.set(0, 0, 300); 
-                }}
-                controls.target.set(0, 0, 0);
-                
-                scene.add(object);
-                targetObject = object;
-
-                // Event Listeners - iPad optimized
-                const canvas = renderer.domElement;
-                
-                canvas.addEventListener('contextmenu', (e) => e.preventDefault());
-                document.addEventListener('contextmenu', (e) => e.preventDefault());
-                
-                canvas.addEventListener('touchstart', onTouchStart, {{ passive: false }});
-                canvas.addEventListener('touchmove', onTouchMove, {{ passive: false }});
-                canvas.addEventListener('touchend', onTouchEnd, {{ passive: false }});
-                
-                canvas.addEventListener('pointerdown', onDown);
-                canvas.addEventListener('pointermove', onMove);
-                canvas.addEventListener('pointerup', onUp);
-                
-                window.addEventListener('resize', () => {{
-                    camera.aspect = window.innerWidth / window.innerHeight;
-                    camera.updateProjectionMatrix();
-                    renderer.setSize(window.innerWidth, {height});
-                }});
-                
-                animate();
-                selectTool('view');
-            }}
-
-            function animate() {{
-                requestAnimationFrame(animate);
-                TWEEN.update();
-                controls.update();
-                renderer.render(scene, camera);
-            }}
-
-            // --- iPad TOUCH HANDLING ---
-            function onTouchStart(event) {{
-                event.preventDefault();
-                event.stopPropagation();
-                
-                touchStartTime = Date.now();
-                
-                if(longPressTimer) {{
-                    clearTimeout(longPressTimer);
-                    longPressTimer = null;
-                }}
-                
-                if(event.touches.length === 1 && currentTool !== 'view') {{
-                    const touch = event.touches[0];
-                    const fakeEvent = {{
-                        clientX: touch.clientX,
-                        clientY: touch.clientY,
-                        button: 0
-                    }};
-                    onDown(fakeEvent);
-                }}
-            }}
-
-            function onTouchMove(event) {{
-                event.preventDefault();
-                event.stopPropagation();
-                
-                if(longPressTimer) {{
-                    clearTimeout(longPressTimer);
-                    longPressTimer = null;
-                }}
-                
-                if(event.touches.length === 1 && currentTool !== 'view') {{
-                    const touch = event.touches[0];
-                    const fakeEvent = {{
-                        clientX: touch.clientX,
-                        clientY: touch.clientY
-                    }};
-                    onMove(fakeEvent);
-                }}
-            }}
-
-            function onTouchEnd(event) {{
-                event.preventDefault();
-                event.stopPropagation();
-                
-                if(longPressTimer) {{
-                    clearTimeout(longPressTimer);
-                    longPressTimer = null;
-                }}
-                
-                const touchDuration = Date.now() - touchStartTime;
-                
-                if(touchDuration < 500 && currentTool !== 'view') {{
-                    const fakeEvent = {{ button: 0 }};
-                    onUp(fakeEvent);
-                }}
-            }}
-
-            // --- TOOL SYSTEM ---
-            window.selectTool = function(tool) {{
-                if(currentTool === tool && tool !== 'view') {{
-                    toggleSettingsPanel();
-                    return;
-                }}
-                
-                currentTool = tool;
-                resetTemp();
-                
-                document.querySelectorAll('.tool-btn').forEach(b => b.classList.remove('active'));
-                const btn = document.getElementById('t-' + tool);
-                if(btn) btn.classList.add('active');
-                
-                const sPanel = document.getElementById('settings');
-                const tName = document.getElementById('tool-name');
-                const hud = document.getElementById('info-hud');
-                const measureBox = document.getElementById('measure-box');
-                
-                measureBox.style.display = 'none';
-                
-                if (tool === 'view') {{
-                    document.body.style.cursor = 'default';
-                    controls.enabled = true;
-                    sPanel.style.display = 'none';
-                    settingsPanelVisible = false;
-                    hud.classList.remove('visible');
-                }} else {{
-                    document.body.style.cursor = 'crosshair';
-                    controls.enabled = false;
-                    sPanel.style.display = 'flex';
-                    settingsPanelVisible = true;
-                    hud.classList.add('visible');
-                    
-                    if(tool === 'brush') {{ 
-                        tName.innerText = "SURFACE BRUSH"; 
-                        hud.innerText = "Draw closed loop for area measurement"; 
-                    }}
-                    else if(tool === 'eraser') {{
-                        tName.innerText = "ERASER TOOL";
-                        hud.innerText = "Click and drag to erase";
-                        createEraserCursor();
-                    }}
-                    else if(tool === 'line') {{ 
-                        tName.innerText = "SURGICAL MARKING LINE"; 
-                        hud.innerText = "Click two points to draw line"; 
-                    }}
-                    else if(tool === 'annotation') {{
-                        tName.innerText = "ANNOTATION TOOL";
-                        hud.innerText = "Click to place numbered marker";
-                    }}
-                    else if(tool === 'distance') {{ 
-                        tName.innerText = "DISTANCE MEASUREMENT"; 
-                        hud.innerText = "Click two points to measure";
-                        measureBox.style.display = 'block';
-                        document.getElementById('measure-label').innerText = "DISTANCE";
-                    }}
-                    else if(tool === 'angle') {{ 
-                        tName.innerText = "ANGLE MEASUREMENT"; 
-                        hud.innerText = "Click: A (green) → B (red vertex) → C (blue)";
-                        measureBox.style.display = 'block';
-                        document.getElementById('measure-label').innerText = "ANGLE";
-                    }}
-                }}
-            }}
-            
-            window.toggleSettingsPanel = function() {{
-                const sPanel = document.getElementById('settings');
-                settingsPanelVisible = !settingsPanelVisible;
-                sPanel.style.display = settingsPanelVisible ? 'flex' : 'none';
-            }}
-            
-            window.toggleNavPanel = function() {{
-                const panel = document.getElementById('nav-panel');
-                const content = document.getElementById('nav-content');
-                const icon = document.getElementById('nav-toggle-icon');
-                
-                navPanelExpanded = !navPanelExpanded;
-                
-                if(navPanelExpanded) {{
-                    panel.classList.remove('collapsed');
-                    content.classList.remove('hidden');
-                    icon.innerText = 'remove';
-                }} else {{
-                    panel.classList.add('collapsed');
-                    content.classList.add('hidden');
-                    icon.innerText = 'add';
-                }}
-            }}
-
-            window.setColor = function(element) {{
-                document.querySelectorAll('.color-preset').forEach(e => e.classList.remove('active'));
-                element.classList.add('active');
-                settings.colorHex = element.dataset.color;
-                settings.color = parseInt(element.dataset.color.replace('#', '0x'));
-            }}
-
-            window.updateSettings = function() {{
-                settings.lineWidth = parseFloat(document.getElementById('p-width').value);
-                settings.opacity = parseFloat(document.getElementById('p-opacity').value);
-                settings.offsetFactor = parseFloat(document.getElementById('p-offset').value);
-                if(document.getElementById('p-auto-area')) {{
-                    settings.autoArea = document.getElementById('p-auto-area').checked;
-                }}
-                
-                document.getElementById('width-val').innerText = (settings.lineWidth * 1000).toFixed(1);
-                document.getElementById('opacity-val').innerText = settings.opacity.toFixed(2);
-                document.getElementById('offset-val').innerText = settings.offsetFactor.toFixed(5);
-                
-                if(document.getElementById('p-eraser')) {{
-                    eraserRadius = parseFloat(document.getElementById('p-eraser').value);
-                    document.getElementById('eraser-val').innerText = (eraserRadius * 100).toFixed(0);
-                    if(eraserCursor) {{
-                        eraserCursor.scale.setScalar(eraserRadius * currentZoom);
-                    }}
-                }}
-            }}
-
-            // --- RAYCASTING ---
-            function getIntersects(event) {{
-                const rect = renderer.domElement.getBoundingClientRect();
-                mouse.x = ((event.clientX - rect.left) / rect.width) * 2 - 1;
-                mouse.y = -((event.clientY - rect.top) / rect.height) * 2 + 1;
-                raycaster.setFromCamera(mouse, camera);
-                return raycaster.intersectObject(targetObject, true);
-            }}
-
-            function getOffsetPoint(hit) {{
-                const offset = currentZoom * settings.offsetFactor;
-                return hit.point.clone().add(hit.face.normal.clone().multiplyScalar(offset));
-            }}
-
-            // --- SURFACE PROJECTION ---
-            function projectPointsOnSurface(p1, p2, steps = 20) {{
-                const points = [];
-                for(let i = 0; i <= steps; i++) {{
-                    const t = i / steps;
-                    const interpPoint = new THREE.Vector3().lerpVectors(p1, p2, t);
-                    
-                    const dir = interpPoint.clone().sub(camera.position).normalize();
-                    raycaster.set(camera.position, dir);
-                    const hits = raycaster.intersectObject(targetObject, true);
-                    
-                    if(hits.length > 0) {{
-                        points.push(getOffsetPoint(hits[0]));
-                    }} else {{
-                        points.push(interpPoint);
-                    }}
-                }}
-                return points;
-            }}
-
-            // --- INTERACTION ---
-            function onDown(event) {{
-                // Prevent double-tap
-                const now = Date.now();
-                if (now - lastClickTime < 300) return;
-                lastClickTime = now;
-                
-                if (currentTool === 'view' || event.button !== 0) return;
-
-                const hits = getIntersects(event);
-                if (hits.length > 0) {{
-                    const point = getOffsetPoint(hits[0]);
-                    
-                    if (currentTool === 'brush') {{
-                        isDrawing = true;
-                        drawPoints = [point];
-                        lastDrawTime = Date.now();
-                    }}
-                    else if (currentTool === 'eraser') {{
-                        isErasing = true;
-                        eraseAtPoint(point);
-                    }}
-                    else if (currentTool === 'annotation') {{
-                        createAnnotation(point, event);
-                    }}
-                    else if (currentTool === 'line' || currentTool === 'distance') {{
-                        if(measurePoints.length === 0) {{
-                            measurePoints.push(point);
-                            addMarker(point, 0xff0000, false);
-                        }} else {{
-                            measurePoints.push(point);
-                            addMarker(point, 0xff0000, false);
-                            
-                            if(currentTool === 'line') {{
-                                drawSurfaceLine(measurePoints[0], measurePoints[1]);
-                            }} else {{
-                                measureDistance(measurePoints[0], measurePoints[1]);
-                            }}
-                            
-                            measurePoints = [];
-                        }}
-                    }}
-                    else if (currentTool === 'angle') {{
-                        handleAngleMeasurement(point);
-                    }}
-                }}
-            }}
-
-            function onMove(event) {{
-                if(currentTool === 'eraser' && eraserCursor) {{
-                    const hits = getIntersects(event);
-                    if(hits.length > 0) {{
-                        eraserCursor.position.copy(getOffsetPoint(hits[0]));
-                        eraserCursor.visible = true;
-                    }} else {{
-                        eraserCursor.visible = false;
-                    }}
-                }}
-                
-                if (!isDrawing && !isErasing) return;
-
-                const now = Date.now();
-                if(now - lastDrawTime < 16) return;
-                lastDrawTime = now;
-
-                const hits = getIntersects(event);
-                if (hits.length > 0) {{
-                    const point = getOffsetPoint(hits[0]);
-
-                    if (currentTool === 'brush') {{
-                        const lastPoint = drawPoints[drawPoints.length - 1];
-                        
-                        if(point.distanceTo(lastPoint) > currentZoom * 0.001) {{
-                            const projected = projectPointsOnSurface(lastPoint, point, 2);
-                            drawPoints.push(...projected);
-                            updateBrushStroke();
-                        }}
-                    }}
-                    else if (currentTool === 'eraser' && isErasing) {{
-                        eraseAtPoint(point);
-                    }}
-                }}
-            }}
-
-            function onUp(event) {{
-                if (isDrawing && currentTool === 'brush') {{
-                    isDrawing = false;
-                    if (drawPoints.length > 10) {{ 
-                        const firstPoint = drawPoints[0];
-                        const lastPoint = drawPoints[drawPoints.length - 1];
-                        const distance = firstPoint.distanceTo(lastPoint);
-                        
-                        // Ngưỡng khép kín (5% zoom)
-                        const closeThreshold = currentZoom * 0.05;
-
-                        if (distance < closeThreshold && settings.autoArea) {{
-                            // 1. Nối kín vòng dây
-                            drawPoints.push(firstPoint);
-                            updateBrushStroke(); 
-
-                            // 2. Tính toán diện tích
-                            const areaResult = calculateArea(drawPoints);
-                            
-                            // 3. Tô màu vùng kín
-                            fillClosedLoop(drawPoints, areaResult);
-                            
-                            // 4. Hiển thị số đo (mm2)
-                            const areaText = areaResult.value.toFixed(1) + ' mm²';
-                            const labelData = createFloatingLabel(areaResult.center, areaText, 'area');
-                            
-                            // 5. Lưu vào danh sách (Dùng {{ }} cho object JS)
-                            measurements.push({{
-                                type: 'area',
-                                value: areaResult.value,
-                                unit: 'mm²',
-                                points: [areaResult.center],
-                                labelData: labelData
-                            }});
-                        }}
-                    }}
-                    if (tempMeshes.length > 0) {{
-                        tempMeshes.forEach(m => drawnObjects.push(m));
-                        tempMeshes = [];
-                    }}
-                    drawPoints = [];
-                }}
-                
-                if (isErasing) {{
-                    isErasing = false;
-                }}
-            }}
-
-            // --- DRAWING TOOLS ---
-            function updateBrushStroke() {{
-                tempMeshes.forEach(m => scene.remove(m));
-                tempMeshes = [];
-                
-                if(drawPoints.length < 2) return;
-                
-                const path = new THREE.CatmullRomCurve3(drawPoints);
-                const tubeGeo = new THREE.TubeGeometry(path, drawPoints.length * 2, settings.lineWidth * currentZoom, 8, false);
-                const tubeMat = new THREE.MeshBasicMaterial({{
-                    color: settings.color,
-                    transparent: true,
-                    opacity: settings.opacity,
-                    depthTest: false
-                }});
-                const tube = new THREE.Mesh(tubeGeo, tubeMat);
-                tube.renderOrder = 999;
-                scene.add(tube);
-                tempMeshes.push(tube);
-            }}
-
-            function drawSurfaceLine(p1, p2) {{
-                const projected = projectPointsOnSurface(p1, p2, 30);
-                
-                const path = new THREE.CatmullRomCurve3(projected);
-                const tubeGeo = new THREE.TubeGeometry(path, projected.length * 2, settings.lineWidth * currentZoom, 8, false);
-                const tubeMat = new THREE.MeshBasicMaterial({{
-                    color: settings.color,
-                    transparent: true,
-                    opacity: settings.opacity,
-                    depthTest: false
-                }});
-                const tube = new THREE.Mesh(tubeGeo, tubeMat);
-                tube.renderOrder = 999;
-                scene.add(tube);
-                drawnObjects.push(tube);
-                return tube; // Return for linking to label
-            }}
-
-            function addMarker(point, color, isVertex = false) {{
-                // Vertex marker lớn hơn để nổi bật
-                const size = isVertex ? currentZoom * 0.0010 : currentZoom * 0.0008;
-                const geo = new THREE.SphereGeometry(size, 16, 16);
-                const mat = new THREE.MeshBasicMaterial({{ color: color, depthTest: false }});
-                const marker = new THREE.Mesh(geo, mat);
-                marker.position.copy(point);
-                marker.renderOrder = 1000;
-                scene.add(marker);
-                measureMarkers.push(marker);
-            }}
-
-            // --- ANNOTATION TOOL (FIXED: iPad Touch Support) ---
-            function createAnnotation(point3D, event) {{
-                // 1. Tạo marker 3D với màu hiện tại
-                const markerGeo = new THREE.SphereGeometry(currentZoom * 0.003, 16, 16);
-                const markerMat = new THREE.MeshBasicMaterial({{ color: settings.color, depthTest: false }});
-                const marker = new THREE.Mesh(markerGeo, markerMat);
-                marker.position.copy(point3D);
-                marker.renderOrder = 1001;
-                scene.add(marker);
-                
-                // 2. Tạo HTML label
-                const label = document.createElement('div');
-                label.className = 'annotation-label';
-                label.style.background = settings.colorHex;
-                
-                // Đổi màu chữ nếu nền quá sáng
-                if(settings.colorHex === '#FFFFFF' || settings.colorHex === '#FFEB3B') {{
-                    label.style.color = '#333';
-                }}
-                
-                const annotId = annotationCounter;
-                
-                label.innerHTML = `
-                    <div class="annotation-header" data-annot-id="${{annotId}}">
-                        <div style="display:flex; align-items:center;">
-                            <span class="annotation-number" style="background:${{settings.colorHex}}; color:#fff;">${{annotId}}</span>
-                            <span style="font-size:11px;">Note #${{annotId}}</span>
-                        </div>
-                        <i class="material-icons" style="font-size:14px; opacity:0.7;">open_with</i>
-                    </div>
-                    <div class="annotation-body">
-                        <input type="text" 
-                               class="annotation-input" 
-                               placeholder="Enter note..."
-                               onkeydown="event.stopPropagation()"
-                               onmousedown="event.stopPropagation()"
-                               ontouchstart="event.stopPropagation()">
-                    </div>
-                `;
-                
-                document.body.appendChild(label);
-                
-                const annotation = {{
-                    id: annotId,
-                    point3D: point3D,
-                    marker: marker,
-                    label: label,
-                    offsetX: 20,
-                    offsetY: -40
-                }};
-                
-                annotations.push(annotation);
-                drawnObjects.push(marker);
-                
-                // Setup drag handlers
-                setupAnnotationDrag(annotation);
-                
-                annotationCounter++;
-                
-                function updateLabelPosition() {{
-                    if(!label.parentElement) return;
-                    
-                    const pos = toScreenPosition(point3D);
-                    const finalX = pos.x + annotation.offsetX;
-                    const finalY = pos.y + annotation.offsetY;
-                    
-                    label.style.left = finalX + 'px';
-                    label.style.top = finalY + 'px';
-                    
-                    requestAnimationFrame(updateLabelPosition);
-                }}
-                updateLabelPosition();
-            }}
-            
-            // --- ANNOTATION DRAGGING (iPad Compatible) ---
-            function setupAnnotationDrag(annotation) {{
-                const header = annotation.label.querySelector('.annotation-header');
-                let dragStartTime = 0;
-                
-                // Mouse events
-                header.addEventListener('mousedown', (e) => {{
-                    if(e.target.tagName === 'INPUT') return;
-                    e.preventDefault();
-                    e.stopPropagation();
-                    startAnnotationDrag(annotation, e.clientX, e.clientY);
-                }});
-                
-                // Touch events - iPad optimized
-                header.addEventListener('touchstart', (e) => {{
-                    dragStartTime = Date.now();
-                    e.preventDefault();
-                    e.stopPropagation();
-                    const touch = e.touches[0];
-                    startAnnotationDrag(annotation, touch.clientX, touch.clientY);
-                }}, {{ passive: false }});
-                
-                header.addEventListener('touchend', (e) => {{
-                    const dragDuration = Date.now() - dragStartTime;
-                    // If very short touch, might be a tap not drag
-                    if(dragDuration < 100) {{
-                        endAnnotationDrag();
-                    }}
-                }});
-            }}
-            
-            function startAnnotationDrag(annotation, clientX, clientY) {{
-                draggedAnnotation = annotation;
-                isDraggingAnnotation = true;
-                dragOffset.x = clientX;
-                dragOffset.y = clientY;
-                annotation.label.style.zIndex = 10000;
-                
-                // Disable orbit controls when dragging
-                if(controls) controls.enabled = false;
-            }}
-            
-            // Global drag handlers
-            document.addEventListener('mousemove', (event) => {{
-                if (isDraggingAnnotation && draggedAnnotation) {{
-                    event.preventDefault();
-                    updateAnnotationDrag(event.clientX, event.clientY);
-                }}
-            }});
-            
-            document.addEventListener('touchmove', (event) => {{
-                if (isDraggingAnnotation && draggedAnnotation) {{
-                    event.preventDefault();
-                    event.stopPropagation();
-                    const touch = event.touches[0];
-                    updateAnnotationDrag(touch.clientX, touch.clientY);
-                }}
-            }}, {{ passive: false }});
-            
-            document.addEventListener('mouseup', () => {{
-                if (isDraggingAnnotation) {{
-                    endAnnotationDrag();
-                }}
-            }});
-            
-            document.addEventListener('touchend', () => {{
-                if (isDraggingAnnotation) {{
-                    endAnnotationDrag();
-                }}
-            }});
-            
-            function updateAnnotationDrag(clientX, clientY) {{
-                const deltaX = clientX - dragOffset.x;
-                const deltaY = clientY - dragOffset.y;
-                
-                draggedAnnotation.offsetX += deltaX;
-                draggedAnnotation.offsetY += deltaY;
-                
-                dragOffset.x = clientX;
-                dragOffset.y = clientY;
-            }}
-            
-            function endAnnotationDrag() {{
-                isDraggingAnnotation = false;
-                if(draggedAnnotation) {{
-                    draggedAnnotation.label.style.zIndex = 1000;
-                    draggedAnnotation = null;
-                }}
-                // Re-enable orbit controls if in view mode
-                if(controls && currentTool === 'view') {{
-                    controls.enabled = true;
-                }}
-            }}
-
-            // --- ERASER TOOL ---
-            function createEraserCursor() {{
-                if(eraserCursor) {{
-                    scene.remove(eraserCursor);
-                }}
-                
-                const geo = new THREE.SphereGeometry(1, 32, 32);
-                const mat = new THREE.MeshBasicMaterial({{
-                    color: 0xff5252,
-                    transparent: true,
-                    opacity: 0.3,
-                    depthTest: false,
-                    wireframe: true
-                }});
-                eraserCursor = new THREE.Mesh(geo, mat);
-                eraserCursor.scale.setScalar(eraserRadius * currentZoom);
-                eraserCursor.renderOrder = 2000;
-                eraserCursor.visible = false;
-                scene.add(eraserCursor);
-                
-                document.getElementById('eraser-size-row').style.display = 'flex';
-            }}
-            
-            function eraseAtPoint(point) {{
-                const eraseRadiusWorld = eraserRadius * currentZoom;
-                
-                // Check drawn objects
-                for(let i = drawnObjects.length - 1; i >= 0; i--) {{
-                    const obj = drawnObjects[i];
-                    
-                    if(obj.geometry && obj.geometry.attributes && obj.geometry.attributes.position) {{
-                        const positions = obj.geometry.attributes.position.array;
-                        let shouldErase = false;
-                        
-                        for(let j = 0; j < positions.length; j += 3) {{
-                            const vertex = new THREE.Vector3(
-                                positions[j],
-                                positions[j + 1],
-                                positions[j + 2]
-                            );
-                            
-                            vertex.applyMatrix4(obj.matrixWorld);
-                            
-                            if(vertex.distanceTo(point) < eraseRadiusWorld) {{
-                                shouldErase = true;
-                                break;
-                            }}
-                        }}
-                        
-                        if(shouldErase) {{
-                            // Check if this object is linked to a label
-                            const linkedLabel = floatingLabels.find(l => 
-                                l.relatedObjects.includes(obj)
-                            );
-                            
-                            if(linkedLabel) {{
-                                // Delete entire measurement including label
-                                deleteFloatingLabel(linkedLabel);
-                            }} else {{
-                                // Just delete the object
-                                scene.remove(obj);
-                                if(obj.geometry) obj.geometry.dispose();
-                                if(obj.material) obj.material.dispose();
-                                drawnObjects.splice(i, 1);
-                            }}
-                        }}
-                    }}
-                    else if(obj.type === 'Mesh' && obj.geometry && obj.geometry.type === 'SphereGeometry') {{
-                        if(obj.position.distanceTo(point) < eraseRadiusWorld) {{
-                            scene.remove(obj);
-                            if(obj.geometry) obj.geometry.dispose();
-                            if(obj.material) obj.material.dispose();
-                            
-                            const annotation = annotations.find(a => a.marker === obj);
-                            if(annotation) {{
-                                annotation.label.remove();
-                                annotations = annotations.filter(a => a !== annotation);
-                            }}
-                            
-                            drawnObjects.splice(i, 1);
-                        }}
-                    }}
-                }}
-            }}
-
-            function toScreenPosition(point3D) {{
-                const vector = point3D.clone();
-                vector.project(camera);
-                
-                const rect = renderer.domElement.getBoundingClientRect();
-                return {{
-                    x: (vector.x + 1) / 2 * rect.width + rect.left,
-                    y: -(vector.y - 1) / 2 * rect.height + rect.top
-                }};
-            }}
-            
-            // --- FLOATING LABELS (DRAGGABLE & DELETABLE) ---
-            function createFloatingLabel(point3D, text, type) {{
-                const label = document.createElement('div');
-                label.className = `floating-label ${{type}}`;
-                
-                const textSpan = document.createElement('span');
-                textSpan.innerText = text;
-                
-                const closeBtn = document.createElement('button');
-                closeBtn.className = 'label-close-btn';
-                closeBtn.innerHTML = '×';
-                closeBtn.title = 'Delete measurement';
-                
-                label.appendChild(textSpan);
-                label.appendChild(closeBtn);
-                
-                document.body.appendChild(label);
-                
-                const labelData = {{
-                    element: label,
-                    point3D: point3D.clone(),
-                    text: text,
-                    type: type,
-                    offsetX: 0,
-                    offsetY: -30,
-                    relatedObjects: [] // Store related line/mesh objects
-                }};
-                
-                floatingLabels.push(labelData);
-                
-                // 1. Mouse (Máy tính)
-                label.addEventListener('mousedown', (e) => {{
-                    if(e.target === closeBtn) return;
-                    e.preventDefault();
-                    e.stopPropagation();
-                    draggedLabel = labelData;
-                    labelDragOffset.x = e.clientX - parseFloat(label.style.left);
-                    labelDragOffset.y = e.clientY - parseFloat(label.style.top);
-                }});
-
-                // 2. Touch (iPad/Điện thoại) - ĐANG THIẾU CÁI NÀY
-                label.addEventListener('touchstart', (e) => {{
-                    if(e.target === closeBtn) return;
-                    e.preventDefault();
-                    e.stopPropagation();
-                    const touch = e.touches[0];
-                    draggedLabel = labelData;
-                    // Lấy vị trí hiện tại của nhãn
-                    const currentLeft = parseFloat(label.style.left) || 0;
-                    const currentTop = parseFloat(label.style.top) || 0;
-                    labelDragOffset.x = touch.clientX - currentLeft;
-                    labelDragOffset.y = touch.clientY - currentTop;
-                }}, {{ passive: false }});
-                
-                // Delete functionality
-                const handleDelete = (e) => {{
-                    e.preventDefault();
-                    e.stopPropagation(); // Chặn ngay lập tức, không cho sự kiện lan xuống nhãn
-                    deleteFloatingLabel(labelData);
-                    draggedLabel = null; // Ngắt trạng thái kéo nếu có lỡ kích hoạt
-                }};
-
-                closeBtn.addEventListener('click', handleDelete);
-                // QUAN TRỌNG: Thêm touchstart để iPad nhận diện ngay lập tức
-                closeBtn.addEventListener('touchstart', handleDelete, {{ passive: false }});
-                
-                function updatePosition() {{
-                    if(!label.parentElement) return;
-                    const pos = toScreenPosition(point3D);
-                    label.style.left = (pos.x + labelData.offsetX) + 'px';
-                    label.style.top = (pos.y + labelData.offsetY) + 'px';
-                    requestAnimationFrame(updatePosition);
-                }}
-                updatePosition();
-                
-                return labelData;
-            }}
-            
-           // --- GLOBAL DRAG HANDLERS (UPDATED: ANTI-STICKY LOGIC) ---
-            
-            // 1. Xử lý di chuyển cho LABEL (Floating Label)
-            function handleLabelMove(clientX, clientY, event) {{
-                if(draggedLabel) {{
-                    event.preventDefault();
-                    event.stopPropagation();
-                    
-                    const newX = clientX - labelDragOffset.x;
-                    const newY = clientY - labelDragOffset.y;
-                    
-                    draggedLabel.element.style.left = newX + 'px';
-                    draggedLabel.element.style.top = newY + 'px';
-                    
-                    // Cập nhật offset tương đối để xoay 3D vẫn chuẩn
-                    const originalPos = toScreenPosition(draggedLabel.point3D);
-                    draggedLabel.offsetX = newX - originalPos.x;
-                    draggedLabel.offsetY = newY - originalPos.y;
-                }}
-            }}
-
-            // Sự kiện chuột
-            document.addEventListener('mousemove', (e) => {{
-                handleLabelMove(e.clientX, e.clientY, e);
-            }});
-            
-            // Sự kiện cảm ứng (iPad) - Thêm passive: false để chặn cuộn trang
-            document.addEventListener('touchmove', (e) => {{
-                if(draggedLabel) {{
-                    const touch = e.touches[0];
-                    handleLabelMove(touch.clientX, touch.clientY, e);
-                }}
-            }}, {{ passive: false }});
-
-            // 2. Xử lý thả tay (End/Drop) - GLOBAL KILL SWITCH
-            // Hàm này sẽ ngắt mọi loại kéo thả (cả Label lẫn Annotation)
-            function endAllDrags() {{
-                // Ngắt Label
-                draggedLabel = null;
-                
-                // Ngắt Annotation (nếu đang bị dính)
-                if (typeof isDraggingAnnotation !== 'undefined' && isDraggingAnnotation) {{
-                    isDraggingAnnotation = false;
-                    
-                    // Reset lại style cho Annotation
-                    if(draggedAnnotation) {{
-                        draggedAnnotation.label.style.zIndex = 1000;
-                        draggedAnnotation = null;
-                    }}
-                    
-                    // Trả lại quyền xoay 3D cho OrbitControls
-                    if(controls && currentTool === 'view') {{
-                        controls.enabled = true;
-                    }}
-                }}
-            }}
-
-            // Bắt sự kiện trên toàn bộ cửa sổ (Window) để không bị sót
-            window.addEventListener('mouseup', endAllDrags);
-            window.addEventListener('touchend', endAllDrags);
-            window.addEventListener('touchcancel', endAllDrags); // Quan trọng: Xử lý khi có noti/cuộc gọi làm ngắt touch
-            window.addEventListener('blur', endAllDrags);        // Xử lý khi tab bị ẩn hoặc switch app
-            
-            function deleteFloatingLabel(labelData) {{
-                // Remove label element
-                if(labelData.element && labelData.element.parentElement) {{
-                    labelData.element.remove();
-                }}
-                
-                // Remove related 3D objects (lines, meshes)
-                labelData.relatedObjects.forEach(obj => {{
-                    scene.remove(obj);
-                    if(obj.geometry) obj.geometry.dispose();
-                    if(obj.material) obj.material.dispose();
-                    
-                    const index = drawnObjects.indexOf(obj);
-                    if(index > -1) drawnObjects.splice(index, 1);
-                }});
-                
-                // Remove from floatingLabels array
-                const index = floatingLabels.indexOf(labelData);
-                if(index > -1) floatingLabels.splice(index, 1);
-                
-                // Remove from measurements array
-                const measureIndex = measurements.findIndex(m => 
-                    m.labelData === labelData
-                );
-                if(measureIndex > -1) measurements.splice(measureIndex, 1);
-            }}
-            
-            // --- AREA CALCULATION (SKIN FLAP) ---
-            function calculateArea(points3D) {{
-                if (points3D.length < 3) return {{ value: 0, center: new THREE.Vector3() }};
-                
-                // 1. Tính vector pháp tuyến và tâm (Newell's method)
-                let normal = new THREE.Vector3();
-                let center = new THREE.Vector3();
-                
-                for (let i = 0; i < points3D.length; i++) {{
-                    let j = (i + 1) % points3D.length;
-                    normal.x += (points3D[i].y - points3D[j].y) * (points3D[i].z + points3D[j].z);
-                    normal.y += (points3D[i].z - points3D[j].z) * (points3D[i].x + points3D[j].x);
-                    normal.z += (points3D[i].x - points3D[j].x) * (points3D[i].y + points3D[j].y);
-                    center.add(points3D[i]);
-                }}
-                normal.normalize();
-                center.divideScalar(points3D.length);
-                
-                // 2. Tạo Quaternion để xoay về mặt phẳng XY
-                const alignVector = new THREE.Vector3(0, 0, 1);
-                const quaternion = new THREE.Quaternion().setFromUnitVectors(normal, alignVector);
-                
-                // 3. Chiếu điểm sang 2D
-                const points2D = points3D.map(p => {{
-                    const vec = p.clone().sub(center).applyQuaternion(quaternion);
-                    return new THREE.Vector2(vec.x, vec.y);
-                }});
-                
-                // 4. Tính diện tích 2D (Shoelace formula)
-                const areaVirtual = THREE.ShapeUtils.area(points2D);
-                
-                // 5. Đổi sang mm² thật
-                const areaReal = Math.abs(areaVirtual) * SCALE_FACTOR * SCALE_FACTOR;
-                
-                return {{
-                    value: areaReal,
-                    points2D: points2D,
-                    center: center,
-                    quaternion: quaternion
-                }};
-            }}
-            
-            // Tô màu vùng đã chọn (Tạo Flap Mesh)
-            function fillClosedLoop(points3D, areaData) {{
-                const shape = new THREE.Shape(areaData.points2D);
-                const geometry = new THREE.ShapeGeometry(shape);
-                
-                const material = new THREE.MeshBasicMaterial({{
-                    color: settings.color,
-                    transparent: true,
-                    opacity: 0.4,
-                    side: THREE.DoubleSide,
-                    depthTest: false
-                }});
-                
-                const mesh = new THREE.Mesh(geometry, material);
-                
-                // Xoay về vị trí 3D ban đầu
-                const invertQuat = areaData.quaternion.clone().invert();
-                mesh.quaternion.copy(invertQuat);
-                mesh.position.copy(areaData.center);
-                
-                // Đẩy nhẹ lên bề mặt
-                const offsetVec = new THREE.Vector3(0, 0, currentZoom * 0.001);
-                offsetVec.applyQuaternion(invertQuat);
-                mesh.position.add(offsetVec);
-                
-                mesh.renderOrder = 998;
-                scene.add(mesh);
-                drawnObjects.push(mesh);
-                
-                return mesh;
-            }}
-
-            function measureDistance(p1, p2) {{
-                const dist = p1.distanceTo(p2) * SCALE_FACTOR;
-                const distText = dist.toFixed(2) + ' mm';
-                document.getElementById('measure-value').innerText = distText;
-                
-                const line = drawSurfaceLine(p1, p2);
-                
-                // Tạo floating label
-                const midPoint = new THREE.Vector3().lerpVectors(p1, p2, 0.5);
-                const labelData = createFloatingLabel(midPoint, distText, 'distance');
-                labelData.relatedObjects = [line]; // Link line to label
-                
-                // Lưu vào measurements
-                measurements.push({{
-                    type: 'distance',
-                    value: dist,
-                    unit: 'mm',
-                    points: [p1.clone(), p2.clone()],
-                    labelData: labelData
-                }});
-                
-                setTimeout(() => {{
-                    measureMarkers.forEach(m => scene.remove(m));
-                    measureMarkers = [];
-                }}, 3000);
-            }}
-
-            // --- ANGLE MEASUREMENT (CORRECTED: A-B-C LOGIC) ---
-            // --- ANGLE MEASUREMENT (FIXED FOR PYTHON F-STRING) ---
-            function handleAngleMeasurement(point) {{
-                // 1. Tự động Reset: Nếu đã đo xong 3 điểm, chạm tiếp sẽ bắt đầu góc mới
-                if (measurePoints.length === 3) {{
-                    measureMarkers.forEach(m => scene.remove(m));
-                    measureMarkers = [];
-                    measurePoints = [];
-                    // Xóa đường line tạm cũ
-                     if(window.tempAngleLines) {{
-                        window.tempAngleLines.forEach(l => scene.remove(l));
-                        window.tempAngleLines = [];
-                    }}
-                    document.getElementById('measure-value').innerText = "0.0°";
-                    document.getElementById('info-hud').innerText = "Starting new angle...";
-                }}
-
-                // 2. CHỐNG TRÙNG ĐIỂM (QUAN TRỌNG CHO iPAD)
-                if (measurePoints.length > 0) {{
-                    const lastPoint = measurePoints[measurePoints.length - 1];
-                    const dist = point.distanceTo(lastPoint);
-                    // Ngưỡng lọc: khoảng 1% độ zoom hiện tại
-                    if (dist < currentZoom * 0.01) {{ 
-                        console.log("Ignored double tap");
-                        return; 
-                    }}
-                }}
-
-                measurePoints.push(point);
-                
-                // --- Logic hiển thị màu và tính toán ---
-                let markerColor;
-                let isVertex = false;
-                
-                if(measurePoints.length === 1) {{
-                    markerColor = 0x4CAF50; // A - Xanh lá
-                    document.getElementById('info-hud').innerText = "Point A set. Click Vertex B (Đỉnh góc)";
-                }}
-                else if(measurePoints.length === 2) {{
-                    markerColor = 0xFF0000; // B - Đỏ
-                    isVertex = true;
-                    document.getElementById('info-hud').innerText = "Vertex B set. Click Point C";
-                    
-                    // Vẽ cạnh BA
-                    const line1 = drawSurfaceLine(measurePoints[1], measurePoints[0]);
-                    if(!window.tempAngleLines) window.tempAngleLines = [];
-                    window.tempAngleLines.push(line1);
-                }}
-                else if(measurePoints.length === 3) {{
-                    markerColor = 0x2196F3; // C - Xanh dương
-                    
-                    const pointA = measurePoints[0];
-                    const pointB = measurePoints[1];
-                    const pointC = measurePoints[2];
-                    
-                    const vectorBA = pointA.clone().sub(pointB).normalize();
-                    const vectorBC = pointC.clone().sub(pointB).normalize();
-                    
-                    const angleRad = vectorBA.angleTo(vectorBC);
-                    const angleDeg = THREE.MathUtils.radToDeg(angleRad);
-                    const angleText = angleDeg.toFixed(1) + '°';
-                    
-                    document.getElementById('measure-value').innerText = angleText;
-                    // Chú ý: Dùng ${{ }} cho biến JS trong chuỗi
-                    document.getElementById('info-hud').innerText = `∠ABC = ${{angleText}} (Click to start new)`;
-                    
-                    // Vẽ cạnh BC
-                    const line2 = drawSurfaceLine(measurePoints[1], measurePoints[2]);
-                    if(!window.tempAngleLines) window.tempAngleLines = [];
-                    window.tempAngleLines.push(line2);
-                    
-                    // Tạo nhãn kết quả
-                    const labelData = createFloatingLabel(pointB, '∠' + angleText, 'angle');
-                    labelData.relatedObjects = [...window.tempAngleLines];
-                    
-                    // Lưu vào báo cáo
-                    measurements.push({{
-                        type: 'angle',
-                        value: angleDeg,
-                        unit: '°',
-                        points: [pointA.clone(), pointB.clone(), pointC.clone()],
-                        labelData: labelData
-                    }});
-
-                    window.tempAngleLines = [];
-                }}
-                
-                addMarker(point, markerColor, isVertex);
-            }}
-
-            // --- EXPORT PDF REPORT ---
-            window.exportPDFReport = async function() {{
-                const {{ jsPDF }} = window.jspdf;
-                const pdf = new jsPDF('p', 'mm', 'a4');
-                
-                // Hide UI elements temporarily
-                document.querySelector('.toolbar').style.display = 'none';
-                document.querySelector('.settings-panel').style.display = 'none';
-                document.querySelector('.nav-panel').style.display = 'none';
-                document.querySelector('.export-panel').style.display = 'none';
-                document.querySelector('.info-hud').style.display = 'none';
-                
-                const captureView = async (viewName) => {{
-                    return new Promise((resolve) => {{
-                        setView(viewName);
-                        setTimeout(async () => {{
-                            const canvas = await html2canvas(document.body, {{
-                                backgroundColor: '#1a1a1a',
-                                scale: 1
-                            }});
-                            resolve(canvas.toDataURL('image/jpeg', 0.8));
-                        }}, 1000);
-                    }});
-                }};
-                
-                // Capture 3 views
-                const frontImg = await captureView('front');
-                const leftImg = await captureView('left');
-                const rightImg = await captureView('right');
-                
-                // Restore UI
-                document.querySelector('.toolbar').style.display = 'flex';
-                document.querySelector('.nav-panel').style.display = 'block';
-                document.querySelector('.export-panel').style.display = 'flex';
-                
-                // Build PDF
-                const pageWidth = 210;
-                const pageHeight = 297;
-                const margin = 15;
-                const imgWidth = (pageWidth - 3 * margin) / 2;
-                const imgHeight = imgWidth * 0.75;
-                
-                // Header
-                pdf.setFontSize(20);
-                pdf.setTextColor(33, 150, 243);
-                pdf.text('HIDU Surgical Planning Report', margin, margin + 10);
-                
-                pdf.setFontSize(10);
-                pdf.setTextColor(100);
-                const date = new Date().toLocaleDateString();
-                pdf.text(`Date: ${{date}}`, margin, margin + 18);
-                
-                // Images
-                let y = margin + 30;
-                pdf.setFontSize(12);
-                pdf.setTextColor(0);
-                
-                pdf.text('Front View', margin, y);
-                pdf.addImage(frontImg, 'JPEG', margin, y + 5, imgWidth, imgHeight);
-                
-                pdf.text('Left Profile', pageWidth - margin - imgWidth, y);
-                pdf.addImage(leftImg, 'JPEG', pageWidth - margin - imgWidth, y + 5, imgWidth, imgHeight);
-                
-                y += imgHeight + 15;
-                pdf.text('Right Profile', margin, y);
-                pdf.addImage(rightImg, 'JPEG', margin, y + 5, imgWidth, imgHeight);
-                
-                // Measurements Table
-                y += imgHeight + 20;
-                if(measurements.length > 0) {{
-                    pdf.setFontSize(14);
-                    pdf.setTextColor(33, 150, 243);
-                    pdf.text('Measurements', margin, y);
-                    y += 8;
-                    
-                    pdf.setFontSize(10);
-                    pdf.setTextColor(0);
-                    
-                    // Group by type
-                    const distances = measurements.filter(m => m.type === 'distance');
-                    const angles = measurements.filter(m => m.type === 'angle');
-                    const areas = measurements.filter(m => m.type === 'area');
-                    
-                    if(distances.length > 0) {{
-                        pdf.setTextColor(33, 150, 243);
-                        pdf.text('Distances:', margin + 2, y);
-                        y += 5;
-                        pdf.setTextColor(0);
-                        distances.forEach((m, i) => {{
-                            const text = `  • ${{m.value.toFixed(2)}} mm`;
-                            pdf.text(text, margin + 5, y);
-                            y += 5;
-                        }});
-                        y += 2;
-                    }}
-                    
-                    if(angles.length > 0) {{
-                        pdf.setTextColor(255, 152, 0);
-                        pdf.text('Angles:', margin + 2, y);
-                        y += 5;
-                        pdf.setTextColor(0);
-                        angles.forEach((m, i) => {{
-                            const text = `  • ${{m.value.toFixed(1)}}°`;
-                            pdf.text(text, margin + 5, y);
-                            y += 5;
-                        }});
-                        y += 2;
-                    }}
-                    
-                    if(areas.length > 0) {{
-                        pdf.setTextColor(156, 39, 176);
-                        pdf.text('Skin Flap Areas:', margin + 2, y);
-                        y += 5;
-                        pdf.setTextColor(0);
-                        areas.forEach((m, i) => {{
-                            const text = `  • ${{m.value.toFixed(1)}} mm² (Flap ${{i + 1}})`;
-                            pdf.text(text, margin + 5, y);
-                            y += 5;
-                        }});
-                    }}
-                }}
-                
-                // Annotations
-                if(annotations.length > 0) {{
-                    y += 5;
-                    pdf.setFontSize(14);
-                    pdf.setTextColor(33, 150, 243);
-                    pdf.text('Annotations', margin, y);
-                    y += 8;
-                    
-                    pdf.setFontSize(10);
-                    pdf.setTextColor(0);
-                    
-                    annotations.forEach((a, i) => {{
-                        const input = a.label.querySelector('.annotation-input');
-                        const note = input ? input.value || '(No note)' : '(No note)';
-                        pdf.text(`${{i + 1}}. ${{note}}`, margin + 5, y);
-                        y += 6;
-                    }});
-                }}
-                
-                // Footer
-                pdf.setFontSize(8);
-                pdf.setTextColor(150);
-                pdf.text('Generated by HIDU Surgical Planning Studio', margin, pageHeight - 10);
-                
-                // Save
-                pdf.save(`surgical-plan-${{date.replace(/\\//g, '-')}}.pdf`);
-                
-                alert('PDF exported successfully!');
-            }};
-            
-            // --- SAVE PROJECT ---
-            window.saveProject = function() {{
-                const projectData = {{
-                    version: '1.0',
-                    date: new Date().toISOString(),
-                    scaleFactor: SCALE_FACTOR,
-                    drawnObjects: [],
-                    annotations: [],
-                    measurements: measurements
-                }};
-                
-                // Serialize drawn objects
-                drawnObjects.forEach(obj => {{
-                    if(obj.geometry && obj.geometry.attributes && obj.geometry.attributes.position) {{
-                        const positions = Array.from(obj.geometry.attributes.position.array);
-                        projectData.drawnObjects.push({{
-                            type: obj.geometry.type,
-                            positions: positions,
-                            color: obj.material.color.getHex(),
-                            opacity: obj.material.opacity
-                        }});
-                    }}
-                }});
-                
-                // Serialize annotations
-                annotations.forEach(a => {{
-                    const input = a.label.querySelector('.annotation-input');
-                    projectData.annotations.push({{
-                        id: a.id,
-                        point3D: {{x: a.point3D.x, y: a.point3D.y, z: a.point3D.z}},
-                        offsetX: a.offsetX,
-                        offsetY: a.offsetY,
-                        text: input ? input.value : '',
-                        color: a.marker.material.color.getHex()
-                    }});
-                }});
-                
-                // Download JSON
-                const blob = new Blob([JSON.stringify(projectData, null, 2)], {{ type: 'application/json' }});
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = `surgical-plan-${{new Date().toISOString().split('T')[0]}}.json`;
-                a.click();
-                URL.revokeObjectURL(url);
-                
-                alert('Project saved successfully!');
-            }};
-            
-            // --- LOAD PROJECT ---
-            window.loadProject = function(event) {{
-                const file = event.target.files[0];
-                if(!file) return;
-                
-                const reader = new FileReader();
-                reader.onload = function(e) {{
-                    try {{
-                        const projectData = JSON.parse(e.target.result);
-                        
-                        // Clear current scene
-                        clearAll();
-                        
-                        // Restore drawn objects
-                        projectData.drawnObjects.forEach(objData => {{
-                            const positions = new Float32Array(objData.positions);
-                            const geometry = new THREE.BufferGeometry();
-                            geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
-                            
-                            const material = new THREE.MeshBasicMaterial({{
-                                color: objData.color,
-                                transparent: true,
-                                opacity: objData.opacity,
-                                depthTest: false
-                            }});
-                            
-                            let mesh;
-                            if(objData.type === 'TubeGeometry') {{
-                                mesh = new THREE.Mesh(geometry, material);
-                            }} else {{
-                                mesh = new THREE.Line(geometry, material);
-                            }}
-                            
-                            mesh.renderOrder = 999;
-                            scene.add(mesh);
-                            drawnObjects.push(mesh);
-                        }});
-                        
-                        // Restore annotations
-                        projectData.annotations.forEach(aData => {{
-                            const point3D = new THREE.Vector3(aData.point3D.x, aData.point3D.y, aData.point3D.z);
-                            
-                            // Create marker
-                            const markerGeo = new THREE.SphereGeometry(currentZoom * 0.003, 16, 16);
-                            const markerMat = new THREE.MeshBasicMaterial({{ color: aData.color, depthTest: false }});
-                            const marker = new THREE.Mesh(markerGeo, markerMat);
-                            marker.position.copy(point3D);
-                            marker.renderOrder = 1001;
-                            scene.add(marker);
-                            
-                            // Create label
-                            const label = document.createElement('div');
-                            label.className = 'annotation-label';
-                            label.style.background = '#' + aData.color.toString(16).padStart(6, '0');
-                            
-                            label.innerHTML = `
-                                <div class="annotation-header" onmousedown="startDragAnnotation(event, ${{aData.id}})">
-                                    <div style="display:flex; align-items:center;">
-                                        <span class="annotation-number" style="background:#${{aData.color.toString(16).padStart(6, '0')}}; color:#fff;">${{aData.id}}</span>
-                                        <span style="font-size:11px;">Note #${{aData.id}}</span>
-                                    </div>
-                                    <i class="material-icons" style="font-size:14px; opacity:0.7;">open_with</i>
-                                </div>
-                                <div class="annotation-body">
-                                    <input type="text" 
-                                           class="annotation-input" 
-                                           placeholder="Enter note..."
-                                           value="${{aData.text}}"
-                                           onkeydown="event.stopPropagation()"
-                                           onmousedown="event.stopPropagation()">
-                                </div>
-                            `;
-                            
-                            document.body.appendChild(label);
-                            
-                            const annotation = {{
-                                id: aData.id,
-                                point3D: point3D,
-                                marker: marker,
-                                label: label,
-                                offsetX: aData.offsetX,
-                                offsetY: aData.offsetY
-                            }};
-                            
-                            annotations.push(annotation);
-                            drawnObjects.push(marker);
-                            
-                            if(aData.id >= annotationCounter) {{
-                                annotationCounter = aData.id + 1;
-                            }}
-                            
-                            function updatePos() {{
-                                if(!label.parentElement) return;
-                                const pos = toScreenPosition(point3D);
-                                label.style.left = (pos.x + annotation.offsetX) + 'px';
-                                label.style.top = (pos.y + annotation.offsetY) + 'px';
-                                requestAnimationFrame(updatePos);
-                            }}
-                            updatePos();
-                        }});
-                        
-                        // Restore measurements
-                        if(projectData.measurements) {{
-                            measurements = projectData.measurements;
-                        }}
-                        
-                        alert('Project loaded successfully!');
-                    }} catch(error) {{
-                        alert('Error loading project: ' + error.message);
-                    }}
-                }};
-                reader.readAsText(file);
-            }};
-            
-            // --- UTILITIES ---
-            window.undo = function() {{
-                if (drawnObjects.length > 0) {{
-                    const obj = drawnObjects.pop();
-                    scene.remove(obj);
-                    if(obj.geometry) obj.geometry.dispose();
-                    if(obj.material) obj.material.dispose();
-                    
-                    const annotation = annotations.find(a => a.marker === obj);
-                    if(annotation) {{
-                        annotation.label.remove();
-                        annotations = annotations.filter(a => a !== annotation);
-                    }}
-                }}
-            }}
-
-            window.clearAll = function() {{
-                if(confirm('Clear all surgical markings and annotations?')) {{
-                    while(drawnObjects.length > 0) undo();
-                    resetTemp();
-                    annotationCounter = 1;
-                    measurements = [];
-                    
-                    // Remove floating labels
-                    floatingLabels.forEach(l => {{
-                        if(l.element && l.element.parentElement) {{
-                            l.element.remove();
-                        }}
-                    }});
-                    floatingLabels = [];
-                }}
-            }}
-
-            function resetTemp() {{
-                tempMeshes.forEach(m => {{
-                    scene.remove(m);
-                    if(m.geometry) m.geometry.dispose();
-                    if(m.material) m.material.dispose();
-                }});
-                tempMeshes = [];
-                
-                measurePoints = [];
-                measureMarkers.forEach(m => scene.remove(m));
-                measureMarkers = [];
-                drawPoints = [];
-                isDrawing = false;
-                isErasing = false;
-                
-                if(eraserCursor) {{
-                    eraserCursor.visible = false;
-                }}
-                document.getElementById('eraser-size-row').style.display = 'none';
-            }}
-
-            // --- VIEW CONTROLS ---
-            window.setView = function(v) {{
-                const d = currentZoom * 0.8;
-                const views = {{
-                    'front': {{p: {{x:0, y:0, z:d}}, u: {{x:0, y:1, z:0}}}},
-                    'left': {{p: {{x:-d, y:0, z:0}}, u: {{x:0, y:1, z:0}}}},
-                    'right': {{p: {{x:d, y:0, z:0}}, u: {{x:0, y:1, z:0}}}},
-                    'top': {{p: {{x:0, y:d, z:0}}, u: {{x:0, y:0, z:-1}}}},
-                    'bottom': {{p: {{x:0, y:-d, z:0}}, u: {{x:0, y:0, z:1}}}}
-                }};
-                
-                const target = views[v];
-                if(!target) return;
-                
-                new TWEEN.Tween(controls.target)
-                    .to({{x:0, y:0, z:0}}, 600)
-                    .easing(TWEEN.Easing.Cubic.InOut)
-                    .start();
-                    
-                new TWEEN.Tween(camera.position)
-                    .to(target.p, 800)
-                    .easing(TWEEN.Easing.Cubic.InOut)
-                    .onUpdate(() => {{
-                        camera.up.copy(target.u);
-                    }})
-                    .start();
-            }}
-
-            window.rotateCamera = function(direction) {{
-                const rotateAmount = Math.PI / 8;
-                const currentPos = camera.position.clone();
-                const target = controls.target.clone();
-                
-                let newPos = currentPos.clone().sub(target);
-                
-                if(direction === 'left') {{
-                    const axis = new THREE.Vector3(0, 1, 0);
-                    newPos.applyAxisAngle(axis, rotateAmount);
-                }}
-                else if(direction === 'right') {{
-                    const axis = new THREE.Vector3(0, 1, 0);
-                    newPos.applyAxisAngle(axis, -rotateAmount);
-                }}
-                else if(direction === 'up') {{
-                    const axis = new THREE.Vector3(1, 0, 0);
-                    newPos.applyAxisAngle(axis, rotateAmount);
-                }}
-                else if(direction === 'down') {{
-                    const axis = new THREE.Vector3(1, 0, 0);
-                    newPos.applyAxisAngle(axis, -rotateAmount);
-                }}
-                
-                newPos.add(target);
-                
-                new TWEEN.Tween(camera.position)
-                    .to({{x: newPos.x, y: newPos.y, z: newPos.z}}, 400)
-                    .easing(TWEEN.Easing.Cubic.Out)
-                    .start();
-            }}
-
-            init();
-        </script>
-    </body>
-    </html>
-    """
-    components.html(html_code, height=height)
-
-# --- SIDEBAR ---
-with st.sidebar:
-    st.header("📂 Model Input")
-    st.markdown("Upload 3D scan from Scaniverse")
-    uploaded_file = st.file_uploader("", type="zip", label_visibility="collapsed")
-    
-    st.divider()
-    
-    st.header("📏 Calibration")
-    st.markdown("*Calibrate measurements using known distance*")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.number_input("Virtual (units)", key="v_dist", format="%.2f", help="Measured distance on 3D model")
-    with col2:
-        st.number_input("Real (mm)", value=20.0, key="r_dist", help="Actual physical distance")
-    
-    if st.button("⚡ Apply Calibration", use_container_width=True):
-        v = st.session_state.v_dist
-        if v > 0:
-            s = st.session_state.r_dist / v
-            st.session_state['scale_factor'] = s
-            st.success(f"✓ Scale factor: {s:.4f}")
-        else:
-            st.error("Virtual distance must be > 0")
-    
-    st.divider()
-    
-    st.markdown("### 🎯 Feature Guide")
-    st.markdown("""
-    **Drawing Tools:**
-    - 🖱️ **View**: Rotate and zoom
-    - 🖌️ **Brush**: Freehand drawing (adjustable width)
-    - 🧹 **Eraser**: Remove markings
-    - 📏 **Line**: Straight surgical lines
-    - 📍 **Annotation**: Colored markers with notes
-    
-    **Measurement Guide:**
-    - 📐 **Distance**: Click 2 points (red markers)
-    - 📊 **Angle**: 3-step process
-      1. Click **Point A** (green marker)
-      2. Click **Vertex B** (red marker - angle vertex)
-      3. Click **Point C** (blue marker)
-      - Result: Angle ∠ABC at vertex B
-      - Both edges BA and BC are drawn
-    
-    **UI Controls:**
-    - Click tool twice to toggle settings panel
-    - Click "−" button to collapse navigation panel
-    - Drag annotation headers to reposition
-    - Annotations inherit selected color
-    
-    **Line Width:**
-    - Range: 1-8 (thinner options available)
-    - Adjustable in real-time
-    """)
-
-# --- MAIN AREA ---
-if uploaded_file:
-    st.cache_data.clear()
-    with st.spinner("🔄 Loading surgical planning studio..."):
-        obj, mtl, err = process_file_high_quality(uploaded_file)
-    
-    if err:
-        st.error(err)
-    else:
-        render_studio_viewer(obj, mtl, st.session_state['scale_factor'], height=750)
-else:
-    st.info("👆 Upload a Scaniverse .zip file to begin surgical planning")
-    st.markdown("""
-    ### HIDU Surgical Planning Studio
-    
-    **Professional Features:**
-    - ✨ Smooth continuous surface drawing
-    - 📍 Draggable colored annotations
-    - 📏 Distance & angle measurements
-    - 📐 **Skin Flap Area Calculation** (mm²)
-    - 🏷️ Draggable floating labels with delete
-    - 📄 PDF export with 3 views + data
-    - 💾 Save/Load projects (.json)
-    - 🎨 Medical color coding
-    - 📱 iPad & touch optimized
-    - 🎛️ Collapsible UI
-    
-    **Clinical Workflow:**
-    1. Upload 3D scan → Calibrate
-    2. Draw surgical markings (Brush)
-    3. **Draw closed loop for flap area**
-    4. Measure distances & angles
-    5. Add annotations with notes
-    6. Drag labels to optimal positions
-    7. Save project for later
-    8. Export PDF for medical records
-    
-    **Optimized for:**
-    - **Skin Flap Surgery** (area calculation)
-    - Rhinoplasty planning
-    - Facial reconstructive surgery
-    - Tumor excision planning
-    - Maxillofacial procedures
-    - Pre-operative documentation
-    
-    **New: Area Measurement**
-    - Draw around tumor/defect with Brush
-    - Auto-detects closed loops
-    - Calculates true 3D surface area
-    - Shows result in mm² (calibrated)
-    - Ideal for flap planning!
-    """)
-
-
+import streamlit as st
+import streamlit.components.v1 as components
+import trimesh
+import os
+import zipfile
+import tempfile
+import shutil
+import hashlib
+import io
+import csv
+import json
+import numpy as np
+from scipy.spatial import cKDTree
+from mesh_pipeline import (clean_scan, focus_region, write_tileset, write_scalar_layer, write_patch,
+                           write_deltas)
+from mesh_analysis import (register_scans, vertex_normals, surface_deviation, transform_points,
+                           region_volume_change, fit_symmetry_plane, asymmetry_field, curvature_fields,
+                           landmark_candidates, LANDMARK_NAMES, flap_parameterization,
+                           flap_transposition, flap_targets, SliceIndex, profile_metrics,
+                           face_tree, enclosed_volume, anthropometry, ANTHROPOMETRIC_LANDMARKS,
+                           ANTHROPOMETRIC_DISTANCES, ANTHROPOMETRIC_ANGLES, ANTHROPOMETRIC_RATIOS)
+from vendor_viewer_libs import missing_vendor_files
+
+# --- CONFIGURATION ---
+st.set_page_config(layout="wide", page_title="HIDU - Surgical Planning Studio")
+
+st.markdown("""
+<style>
+    .stApp { background-color: #0a0e27; color: #e8eaf6; }
+    h1 { color: #ffffff !important; font-weight: 300 !important; letter-spacing: 2px; }
+    .stFileUploader { 
+        border: 2px dashed #3949ab; 
+        border-radius: 12px; 
+        background: rgba(57, 73, 171, 0.05);
+        padding: 20px;
+    }
+    section[data-testid="stSidebar"] { 
+        background: linear-gradient(180deg, #1a237e 0%, #0d47a1 100%);
+        color: white;
+    }
+    .stButton>button {
+        background: linear-gradient(135deg, #1976d2 0%, #2196f3 100%);
+        color: white;
+        border: none;
+        border-radius: 8px;
+        padding: 10px 24px;
+        font-weight: 500;
+        transition: all 0.3s;
+    }
+    .stButton>button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 12px rgba(33, 150, 243, 0.4);
+    }
+</style>
+""", unsafe_allow_html=True)
+
+st.title("⚕️ HIDU: Medical Surgical Planning Studio")
+
+if 'scale_factor' not in st.session_state:
+    st.session_state['scale_factor'] = 1.0
+
+# --- BACKEND ---
+VIEWER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "viewer")
+# Processed meshes are written next to the viewer so the component server
+# hands them out as plain static files, one immutable folder per digest.
+ASSETS_DIR = os.path.join(VIEWER_DIR, "assets")
+MAX_CACHED_SCANS = 8
+
+def get_scan_digest(uploaded_file):
+    # file_id changes on every upload, the digest only when the content does
+    digests = st.session_state.setdefault('scan_digests', {})
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+    return digests[uploaded_file.file_id]
+
+def prune_scan_assets(keep=MAX_CACHED_SCANS):
+    if not os.path.isdir(ASSETS_DIR):
+        return
+    folders = [os.path.join(ASSETS_DIR, d) for d in os.listdir(ASSETS_DIR)]
+    folders = sorted((f for f in folders if os.path.isdir(f)), key=os.path.getmtime, reverse=True)
+    for folder in folders[keep:]:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def processing_options():
+    # Sidebar choices that change the processed mesh
+    focus = None
+    center = st.session_state.get('focus_center')
+    if st.session_state.get('focus_enabled', True) and center:
+        focus = {
+            "center": center,
+            # Radius in scan units, so the same region is reused until the calibration changes
+            "radius": round(st.session_state.get('focus_radius_mm', 30.0) / st.session_state['scale_factor'], 6),
+            "grid": st.session_state.get('focus_periphery', 48),
+        }
+    return {
+        "cleanup": st.session_state.get('cleanup_enabled', True),
+        "min_component": st.session_state.get('cleanup_min_component', 2.0),
+        "trim": st.session_state.get('cleanup_trim', False),
+        "trim_margin": st.session_state.get('cleanup_trim_margin', 5.0),
+        "focus": focus,
+    }
+
+def asset_key(scan_digest, options):
+    # One asset folder per upload content and processing options
+    blob = json.dumps(options, sort_keys=True).encode()
+    return f"{scan_digest}-{hashlib.sha1(blob).hexdigest()[:10]}"
+
+def scan_asset_urls(key, meta=None, analysis_key=None):
+    # Relative to the component's index.html; the analysis mesh is only read by Python.
+    # Focus regions only re-mesh the tiles and share the whole scan's analysis folder.
+    analysis_key = analysis_key or key
+    return {
+        "tiles_url": f"assets/{key}/tiles.json",
+        "key": key,
+        "meta": meta or {},
+        "analysis_key": analysis_key,
+        "analysis_path": os.path.join(ASSETS_DIR, analysis_key, "analysis.npz"),
+    }
+
+def load_analysis_mesh(path):
+    # Full-resolution, cleaned and centred scan (before any focus-region re-meshing)
+    with np.load(path) as data:
+        return data["vertices"].astype(np.float64), data["faces"].astype(np.int64)
+
+def publish_assets(build_dir, out_dir):
+    # Swap a finished temp folder in, so a half-written scan is never served
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    shutil.move(build_dir, out_dir)
+
+# Keyed on the content digest and options; the underscore keeps Streamlit
+# from re-hashing the whole upload on every rerun.
+@st.cache_data(show_spinner=False, max_entries=4)
+def process_file_high_quality(scan_digest, options, _uploaded_file):
+    key = asset_key(scan_digest, options)
+    out_dir = os.path.join(ASSETS_DIR, key)
+    manifest_path = os.path.join(out_dir, "tiles.json")
+    if options.get("focus"):
+        return focus_scan_assets(scan_digest, options, _uploaded_file)
+    if os.path.exists(manifest_path) and os.path.exists(os.path.join(out_dir, "analysis.npz")):
+        os.utime(out_dir)
+        with open(manifest_path, encoding="utf-8") as f:
+            return scan_asset_urls(key, json.load(f).get("meta")), None
+    
+    uploaded_file = _uploaded_file
+    uploaded_file.seek(0)
+    temp_dir = tempfile.mkdtemp()
+    extract_path = os.path.join(temp_dir, "extracted")
+    os.makedirs(extract_path, exist_ok=True)
+    
+    with zipfile.ZipFile(uploaded_file, 'r') as zip_ref:
+        zip_ref.extractall(extract_path)
+    
+    obj_file = None
+    tex_file = None
+    
+    for root, dirs, files in os.walk(extract_path):
+        for file in files:
+            if file.lower().endswith('.obj'):
+                obj_file = os.path.join(root, file)
+            elif file.lower().endswith(('.jpg', '.jpeg', '.png')):
+                tex_file = os.path.join(root, file)
+
+    if not obj_file:
+        shutil.rmtree(temp_dir)
+        return None, "❌ No .obj file found"
+    
+    mesh = trimesh.load(obj_file, force='mesh')
+    vertices, faces = mesh.vertices, mesh.faces
+    uv = getattr(mesh.visual, 'uv', None)
+    meta = {"options": options, "scan": scan_digest}
+    if options["cleanup"]:
+        # Drop detached fragments (chair, hair, floor) before centring and tiling
+        vertices, faces, uv, meta["cleanup"] = clean_scan(
+            vertices, faces, uv,
+            min_fraction=options["min_component"] / 100,
+            trim_margin=options["trim_margin"] / 100 if options["trim"] else None)
+    # Centre and frame once for the whole scan, so every focus region of it
+    # shares one coordinate frame and markings stay in place
+    origin = trimesh.Trimesh(vertices, faces, process=False).centroid
+    vertices = vertices - origin
+    meta["origin"] = origin.tolist()
+    meta["frame"] = [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()]
+    
+    # Write into a temp folder first so a half-written scan is never served
+    build_dir = os.path.join(temp_dir, "assets")
+    os.makedirs(build_dir)
+    tex_name = None
+    if tex_file and uv is not None:
+        tex_name = "texture" + os.path.splitext(tex_file)[1].lower()
+        shutil.copyfile(tex_file, os.path.join(build_dir, tex_name))
+    # Octree tiles with per-tile LOD, streamed by the viewer on demand
+    write_tileset(build_dir, vertices, faces, uv, texture=tex_name, meta=meta)
+    # The analysis mesh keeps the UVs so focus regions can be re-meshed from it
+    analysis = {"vertices": vertices.astype(np.float32), "faces": np.asarray(faces, dtype=np.int32)}
+    if uv is not None:
+        analysis["uv"] = np.asarray(uv, dtype=np.float32)
+    np.savez(os.path.join(build_dir, "analysis.npz"), **analysis)
+    
+    publish_assets(build_dir, out_dir)
+    shutil.rmtree(temp_dir)
+    prune_scan_assets()
+    return scan_asset_urls(key, meta), None
+
+# A focus region re-meshes the whole scan's analysis mesh (full detail around
+# the site, coarse elsewhere) into a folder that only holds the new tiles;
+# the analysis mesh, symmetry and curvature stay with the whole scan.
+def focus_scan_assets(scan_digest, options, uploaded_file):
+    base, err = process_file_high_quality(scan_digest, dict(options, focus=None), uploaded_file)
+    if err:
+        return base, err
+    key = asset_key(scan_digest, options)
+    out_dir = os.path.join(ASSETS_DIR, key)
+    manifest_path = os.path.join(out_dir, "tiles.json")
+    if os.path.exists(manifest_path):
+        os.utime(out_dir)
+        with open(manifest_path, encoding="utf-8") as f:
+            return scan_asset_urls(key, json.load(f).get("meta"), base["key"]), None
+
+    base_dir = os.path.dirname(base["analysis_path"])
+    with np.load(base["analysis_path"]) as data:
+        vertices, faces = data["vertices"].astype(np.float64), data["faces"].astype(np.int64)
+        uv = data["uv"].astype(np.float64) if "uv" in data.files else None
+    with open(os.path.join(base_dir, "tiles.json"), encoding="utf-8") as f:
+        tex_name = json.load(f).get("texture")
+    focus = options["focus"]
+    origin = base["meta"]["origin"]
+    # Keep full resolution around the surgical site and strongly simplify the rest
+    vertices, faces, uv, stats = focus_region(
+        vertices, faces, uv, [c - o for c, o in zip(focus["center"], origin)],
+        focus["radius"], periphery_grid=focus["grid"])
+    meta = dict(base["meta"], options=options, focus=dict(focus, **stats))
+
+    temp_dir = tempfile.mkdtemp()
+    build_dir = os.path.join(temp_dir, "assets")
+    os.makedirs(build_dir)
+    if tex_name and uv is not None:
+        shutil.copyfile(os.path.join(base_dir, tex_name), os.path.join(build_dir, tex_name))
+    else:
+        tex_name = None
+    write_tileset(build_dir, vertices, faces, uv, texture=tex_name, meta=meta)
+    publish_assets(build_dir, out_dir)
+    shutil.rmtree(temp_dir)
+    prune_scan_assets()
+    return scan_asset_urls(key, meta, base["key"]), None
+
+def load_scan_assets(scan_digest, options, uploaded_file):
+    # The cache is shared by every session and answers without touching the
+    # disk, so another session may have pruned the folder since. Rebuild it
+    # then (with the layers written into it), and mark it as in use on every
+    # rerun so pruning only removes folders no session is showing.
+    assets, err = process_file_high_quality(scan_digest, options, uploaded_file)
+    if err:
+        return assets, err
+    if not (os.path.exists(os.path.join(ASSETS_DIR, assets["key"], "tiles.json"))
+            and os.path.exists(assets["analysis_path"])):
+        # A focus region's entry also stands on the whole scan's entry
+        for cached in (process_file_high_quality, scalar_layer, flap_patch, transposition_preview):
+            cached.clear()
+        assets, err = process_file_high_quality(scan_digest, options, uploaded_file)
+        if err:
+            return assets, err
+    os.utime(os.path.join(ASSETS_DIR, assets["key"]))
+    os.utime(os.path.dirname(assets["analysis_path"]))
+    return assets, None
+
+# One registration per pair of processed scans (content + cleanup options);
+# focus regions do not change the analysis mesh, so they share it.
+@st.cache_data(show_spinner=False, max_entries=8)
+def register_scan_pair(pre_key, post_key, _pre_path, _post_path):
+    pre_vertices, pre_faces = load_analysis_mesh(_pre_path)
+    post_vertices, post_faces = load_analysis_mesh(_post_path)
+    # Bring the follow-up (post-op) scan into the pre-op scan's coordinate frame
+    matrix, stats = register_scans(post_vertices, post_faces, pre_vertices, pre_faces)
+    return {"matrix": matrix.tolist(), **stats}
+
+# Signed distance from every reference vertex to the registered follow-up
+# surface (positive = swelling). The matrix follows from the pair key.
+@st.cache_data(show_spinner=False, max_entries=8)
+def scan_deviation(pre_key, post_key, _pre_path, _post_path, _matrix):
+    pre_vertices, pre_faces = load_analysis_mesh(_pre_path)
+    post_vertices, post_faces = load_analysis_mesh(_post_path)
+    normals = vertex_normals(pre_vertices, pre_faces)
+    return surface_deviation(pre_vertices, normals, transform_points(_matrix, post_vertices),
+                             post_faces).astype(np.float32)
+
+# Mid-sagittal plane and left/right asymmetry per analysis vertex. Also
+# stored next to the analysis mesh, so reopening a scan skips the fit.
+@st.cache_data(show_spinner=False, max_entries=8)
+def scan_symmetry(analysis_key, _analysis_path):
+    path = os.path.join(os.path.dirname(_analysis_path), "symmetry.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    vertices, faces = load_analysis_mesh(_analysis_path)
+    point, normal, stats = fit_symmetry_plane(vertices, faces)
+    asymmetry = asymmetry_field(vertices, faces, point, normal).astype(np.float32)
+    result = {"point": point, "normal": normal, "rms": np.float64(stats["rms"]),
+              "inliers": np.float64(stats["inliers"]), "asymmetry": asymmetry}
+    np.savez(path, **result)
+    return result
+
+# Curvature fields and landmark candidates per analysis vertex, on disk like
+# the symmetry fit (the landmarks are placed relative to its plane)
+@st.cache_data(show_spinner=False, max_entries=8)
+def scan_landmarks(analysis_key, _analysis_path):
+    path = os.path.join(os.path.dirname(_analysis_path), "curvature.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    symmetry = scan_symmetry(analysis_key, _analysis_path)
+    vertices, faces = load_analysis_mesh(_analysis_path)
+    mean, gaussian = curvature_fields(vertices, faces)
+    landmarks, extrema = landmark_candidates(vertices, faces, mean, symmetry["point"], symmetry["normal"])
+    result = {"mean": mean.astype(np.float32), "gaussian": gaussian.astype(np.float32),
+              "landmark_ids": np.array(list(landmarks), dtype=str),
+              "landmark_points": np.array(list(landmarks.values()), dtype=np.float64).reshape(-1, 3),
+              "extrema": extrema}
+    np.savez(path, **result)
+    return result
+
+# A per-analysis-vertex field sampled at the displayed tiles' vertices (a
+# focus region re-meshes them), written next to the tiles as an int8 layer
+@st.cache_data(show_spinner=False, max_entries=8)
+def scalar_layer(tiles_key, name, _values, _analysis_path):
+    out_dir = os.path.join(ASSETS_DIR, tiles_key)
+    with open(os.path.join(out_dir, "tiles.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    tree = cKDTree(load_analysis_mesh(_analysis_path)[0])
+    value_range = float(np.percentile(np.abs(_values), 99.5)) or 1.0
+    layer = write_scalar_layer(out_dir, manifest, name,
+                               lambda positions: _values[tree.query(positions, workers=-1)[1]], value_range)
+    layer["url"] = f"assets/{tiles_key}/{layer['url']}"
+    return layer
+
+# Skin around a flap site flattened for the viewer's flap templates, written
+# next to the tiles once per site (tile-space centre and radius)
+@st.cache_data(show_spinner=False, max_entries=16)
+def site_parameterization(tiles_key, center, radius, _analysis_path):
+    vertices, faces = load_analysis_mesh(_analysis_path)
+    ids, uv, patch_faces = flap_parameterization(vertices, faces, center, radius)
+    return vertices[ids], uv, patch_faces
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def flap_patch(tiles_key, center, radius, _analysis_path):
+    name = "flap-" + hashlib.sha1(json.dumps([center, radius]).encode()).hexdigest()[:10]
+    path = os.path.join(ASSETS_DIR, tiles_key, f"{name}.bin")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            vertex_count, face_count = np.frombuffer(f.read(8), dtype="<u4").tolist()
+        patch = {"url": f"{name}.bin", "vertices": vertex_count, "faces": face_count}
+    else:
+        vertices, uv, patch_faces = site_parameterization(tiles_key, center, radius, _analysis_path)
+        patch = write_patch(os.path.dirname(path), name, vertices, uv, patch_faces)
+    patch["url"] = f"assets/{tiles_key}/{patch['url']}"
+    return dict(patch, center=list(center), radius=radius)
+
+# The ARAP system of one flap region (site, flap and defect outlines),
+# factorized once and kept in memory while the flap is moved
+@st.cache_resource(max_entries=4)
+def flap_deformer(tiles_key, center, radius, flaps, defect, _analysis_path):
+    vertices, uv, faces = site_parameterization(tiles_key, center, radius, _analysis_path)
+    return flap_transposition(vertices, uv, faces, flaps, defect)
+
+# Flap moved part of the way onto its defect (motion from the viewer, flat
+# coordinates), written as position deltas on the site's patch
+@st.cache_data(show_spinner=False, max_entries=64)
+def transposition_preview(tiles_key, site, motion, _analysis_path):
+    vertices, uv, faces = site_parameterization(tiles_key, site["center"], site["radius"], _analysis_path)
+    deformer, handles, _ = flap_deformer(tiles_key, site["center"], site["radius"], motion["flaps"],
+                                         motion["defect"], _analysis_path)
+    targets = flap_targets(vertices, uv, faces, handles, motion["pivot"], np.radians(motion["angle"]),
+                           motion["shift"])
+    deltas = deformer.solve(targets) - vertices
+    name = "flap-" + hashlib.sha1(json.dumps([site["url"], motion], sort_keys=True).encode()).hexdigest()[:10]
+    preview = write_deltas(os.path.join(ASSETS_DIR, tiles_key), name, deltas, site["radius"] * 1e-5)
+    preview["url"] = f"assets/{tiles_key}/{preview['url']}"
+    return dict(preview, site=site["url"], defect=motion["defect"],
+                peak=float(np.linalg.norm(deltas, axis=1).max()))
+
+# Edge index of a scan for cross-section profiles, built once and kept in
+# memory so dragging the cutting plane only slices
+@st.cache_resource(max_entries=4)
+def scan_slice_index(analysis_key, _analysis_path):
+    return SliceIndex(*load_analysis_mesh(_analysis_path))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cross_section(analysis_key, request, _analysis_path):
+    index = scan_slice_index(analysis_key, _analysis_path)
+    points = index.profile(request["a"], request["b"], request["direction"], request["offset"])
+    return dict(profile_metrics(points), request=request, points=points.round(5).tolist())
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def loop_volume_change(pre_key, post_key, loop, _pre_path, _deviation):
+    vertices, faces = load_analysis_mesh(_pre_path)
+    return region_volume_change(vertices, faces, _deviation, loop)
+
+def area_loops(measurements, assets):
+    # Area loops come in viewer (world) coordinates: the scan group is shifted by the frame centre
+    lo, hi = np.asarray(assets["meta"]["frame"])
+    shift = (lo + hi) / 2
+    return {m["id"]: tuple(tuple(round(c, 5) for c in p) for p in np.asarray(m["loop"]) + shift)
+            for m in measurements if m["type"] == "area" and m.get("loop")}
+
+def area_volume_changes(measurements, assets, pre_key, post_key, deviation):
+    return {i: loop_volume_change(pre_key, post_key, loop, assets["analysis_path"], deviation)
+            for i, loop in area_loops(measurements, assets).items()}
+
+# Centroid tree of a scan, kept in memory so every closed loop only queries it
+@st.cache_resource(max_entries=4)
+def scan_face_tree(analysis_key, _analysis_path):
+    return face_tree(*load_analysis_mesh(_analysis_path))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def loop_enclosed_volume(analysis_key, loop, _analysis_path):
+    vertices, faces = load_analysis_mesh(_analysis_path)
+    return enclosed_volume(vertices, faces, loop, scan_face_tree(analysis_key, _analysis_path))
+
+def area_enclosed_volumes(measurements, assets):
+    return {i: loop_enclosed_volume(assets["analysis_key"], loop, assets["analysis_path"])
+            for i, loop in area_loops(measurements, assets).items()}
+
+# --- FRONTEND: MEDICAL GRADE 3D VIEWER ---
+# Bidirectional component: the viewer lives in ./viewer as static, cacheable
+# JS/CSS and keeps its scene between reruns. Python only sends small render
+# messages (asset URLs, scale factor, saved tool settings) and receives
+# measurements back.
+_studio_viewer = components.declare_component("hidu_studio_viewer", path=VIEWER_DIR)
+
+def render_studio_viewer(assets, scale_factor, height=750, mesh_key=None, compare=None, heatmap=None,
+                         symmetry_plane=None, landmarks=None, flap=None, flap_preview=None, profile=None,
+                         enclosed=None, landmark_set=None):
+    state = _studio_viewer(
+        tiles_url=assets["tiles_url"],
+        mesh_key=mesh_key or assets["tiles_url"],
+        scale_factor=scale_factor,
+        settings=st.session_state.get('viewer_settings'),
+        gpu_budget_mb=st.session_state.get('gpu_budget_mb', 512),
+        debug=st.session_state.get('gpu_debug', False),
+        focus=assets["meta"].get("focus"),
+        compare=compare,
+        heatmap=heatmap,
+        symmetry_plane=symmetry_plane,
+        landmarks=landmarks,
+        flap=flap,
+        flap_preview=flap_preview,
+        profile=profile,
+        enclosed=enclosed,
+        landmark_set=landmark_set,
+        height=height,
+        key="studio_viewer",
+        default=None,
+    )
+    if state:
+        st.session_state['measurements'] = state.get('measurements', [])
+        st.session_state['viewer_settings'] = state.get('settings')
+        st.session_state['flap_motion'] = state.get('flap_motion')
+        st.session_state['profile_request'] = state.get('profile_request')
+        st.session_state['landmark_set'] = state.get('landmark_set') or {}
+        # A new focus centre picked in the viewer (seq tells repeated picks apart)
+        pick = state.get('focus_pick')
+        if pick and pick.get('seq') != st.session_state.get('focus_pick_seq'):
+            st.session_state['focus_pick_seq'] = pick['seq']
+            st.session_state['focus_center'] = [round(c, 4) for c in pick['center']]
+            st.rerun()
+        pick = state.get('flap_pick')
+        if pick and pick.get('seq') != st.session_state.get('flap_pick_seq'):
+            st.session_state['flap_pick_seq'] = pick['seq']
+            st.session_state['flap_center'] = [round(c, 4) for c in pick['center']]
+            st.rerun()
+        # A loop closed in the viewer: rerun so its enclosed volume goes back with this render
+        loops = {m["id"] for m in st.session_state['measurements'] if m["type"] == "area" and m.get("loop")}
+        if enclosed is not None and not loops <= {v["id"] for v in enclosed}:
+            st.rerun()
+    return state
+
+def profile_shape(points, scale):
+    p = profile_metrics(points)
+    return (f"chord {p['chord'] * scale:.1f} mm · depth {p['depth'] * scale:.1f} mm "
+            f"at {p['depth_at']:.0%} · ends {p['start_angle']:.0f}° / {p['end_angle']:.0f}°")
+
+def render_measurement_report(measurements, volumes=None, enclosed=None):
+    st.subheader("📋 Measurements")
+    if not measurements:
+        st.caption("Measurements taken in the viewer appear here.")
+        return
+    
+    # Volume change between scans inside area loops (mm³ = scan units³ × scale³)
+    volumes = volumes or {}
+    enclosed = enclosed or {}
+    s = st.session_state['scale_factor']
+    rows = [{
+        "#": i + 1,
+        "Type": m["type"].capitalize(),
+        "Value": (f"{m['value']:.2f} {m['unit']}" if m["type"] in ("distance", "profile")
+                  else f"{m['value']:.1f} {m['unit']}"),
+    } for i, m in enumerate(measurements)]
+    # Profiles keep their polyline; its shape is measured here so it follows the calibration
+    shapes = {m["id"]: profile_shape(m["points"], s) for m in measurements if m["type"] == "profile"}
+    if shapes:
+        for row, m in zip(rows, measurements):
+            row["Shape"] = shapes.get(m["id"], "")
+    # Volume between the skin inside an area loop and the loop's plane: + raised, − sunken
+    if enclosed:
+        for row, m in zip(rows, measurements):
+            v = enclosed.get(m["id"])
+            row["Enclosed volume"] = (f"{v['volume'] * s ** 3:+.1f} mm³ (peak {v['peak'] * s:+.1f} mm)"
+                                      if v else "")
+    if volumes:
+        for row, m in zip(rows, measurements):
+            v = volumes.get(m["id"])
+            row["Volume change"] = (f"{v['volume'] * s ** 3:+.1f} mm³ (mean {v['mean'] * s:+.2f} mm)" if v else "")
+    st.table(rows)
+    
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["id", "type", "value", "unit", "raw_value", "enclosed_volume_mm3", "volume_change_mm3",
+                     "shape"])
+    for m in measurements:
+        v = volumes.get(m["id"])
+        e = enclosed.get(m["id"])
+        writer.writerow([m["id"], m["type"], m["value"], m["unit"], m.get("raw_value"),
+                         e["volume"] * s ** 3 if e else "", v["volume"] * s ** 3 if v else "",
+                         shapes.get(m["id"], "")])
+    st.download_button("⬇️ Download measurements (.csv)", buf.getvalue(),
+                       file_name="measurements.csv", mime="text/csv")
+
+# Raw values (scan units) are cached per landmark set; the calibration is
+# applied when the table is drawn, so a new scale factor is only a multiply
+@st.cache_data(show_spinner=False, max_entries=32)
+def landmark_anthropometry(points):
+    return anthropometry(dict(points))
+
+def render_anthropometry(landmark_set):
+    st.subheader("🧭 Anthropometry")
+    if not landmark_set:
+        st.caption("Place landmarks with the 🧭 tool in the viewer, or accept the detected ones there.")
+        return
+
+    s = st.session_state['scale_factor']
+    names = ANTHROPOMETRIC_LANDMARKS
+    result = landmark_anthropometry(tuple(sorted((k, tuple(p)) for k, p in landmark_set.items())))
+    measures = (
+        [(name, f"{names[a]} – {names[b]}", v * s, "mm")
+         for (name, a, b), v in zip(ANTHROPOMETRIC_DISTANCES, result["distances"])]
+        + [(name, f"{names[a]} – {names[v]} – {names[c]}", value, "°")
+           for (name, a, v, c), value in zip(ANTHROPOMETRIC_ANGLES, result["angles"])]
+        + [(name, f"{a} / {b}", v, "")
+           for (name, a, b), v in zip(ANTHROPOMETRIC_RATIOS, result["ratios"])]
+    )
+    rows = [{"Measure": name, "Value": f"{value:.2f} {unit}".strip() if unit != "°" else f"{value:.1f}°",
+             "Between": between} for name, between, value, unit in measures if np.isfinite(value)]
+    st.caption(f"{len(landmark_set)} of {len(names)} landmarks placed · {len(rows)} of {len(measures)} measures")
+    if rows:
+        st.table(rows)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["measure", "value", "unit", "between"])
+    for name, between, value, unit in measures:
+        writer.writerow([name, value if np.isfinite(value) else "", unit, between])
+    st.download_button("⬇️ Download anthropometry (.csv)", buf.getvalue(),
+                       file_name="anthropometry.csv", mime="text/csv")
+
+# --- SIDEBAR ---
+# Calibration and the feature guide are fragments: their widgets rerun only
+# themselves instead of the whole script (and the viewer with it).
+@st.fragment
+def calibration_panel():
+    st.header("📏 Calibration")
+    st.markdown("*Calibrate measurements using known distance*")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.number_input("Virtual (units)", key="v_dist", format="%.2f", help="Measured distance on 3D model")
+    with col2:
+        st.number_input("Real (mm)", value=20.0, key="r_dist", help="Actual physical distance")
+    
+    if st.button("⚡ Apply Calibration", use_container_width=True):
+        v = st.session_state.v_dist
+        if v > 0:
+            s = st.session_state.r_dist / v
+            st.session_state['scale_factor'] = s
+            # The viewer fragment has to pick up the new scale; its scene is kept
+            st.rerun()
+        else:
+            st.error("Virtual distance must be > 0")
+    
+    if st.session_state['scale_factor'] != 1.0:
+        st.success(f"✓ Scale factor: {st.session_state['scale_factor']:.4f}")
+
+@st.fragment
+def feature_guide():
+    st.markdown("### 🎯 Feature Guide")
+    st.markdown("""
+    **Drawing Tools:**
+    - 🖱️ **View**: Rotate and zoom
+    - 👆 **Select**: Click a marking or marker, Delete removes it (with its measurement)
+    - 🖌️ **Brush**: Freehand drawing (adjustable width)
+    - 🧹 **Eraser**: Remove markings
+    - 📏 **Line**: Straight surgical lines
+    - 📍 **Annotation**: Colored markers with notes
+    - 🎨 **Paint on Texture** (brush settings): strokes, fills and erasing go into the scan texture
+    
+    **Measurement Guide:**
+    - 📐 **Distance**: Click 2 points (red markers)
+    - 📊 **Angle**: 3-step process
+      1. Click **Point A** (green marker)
+      2. Click **Vertex B** (red marker - angle vertex)
+      3. Click **Point C** (blue marker)
+      - Result: Angle ∠ABC at vertex B
+      - Both edges BA and BC are drawn
+    - 📈 **Profile**: Click 2 points - the skin is cut along your view between them
+      - Plane Offset slides the cut; Save profile records its arc length
+    - 🧭 **Landmarks**: Place named landmarks (or accept the detected ones) -
+      all standard facial distances, angles and ratios are listed below the viewer
+    
+    **UI Controls:**
+    - Click tool twice to toggle settings panel
+    - Click "−" button to collapse navigation panel
+    - Drag annotation headers to reposition
+    - Annotations inherit selected color
+    
+    **Line Width:**
+    - Range: 1-8 (thinner options available)
+    - Adjustable in real-time
+    """)
+
+with st.sidebar:
+    # Without the vendored libraries the viewer falls back to CDNs (see viewer/vendor/README.md)
+    missing_vendor = missing_vendor_files()
+    if missing_vendor:
+        st.warning(f"Viewer libraries not vendored: {', '.join(missing_vendor)}. The 3D viewer loads them "
+                   "from CDNs and needs internet access until vendor_viewer_libs.py has been run and "
+                   "viewer/vendor/ committed.")
+    st.header("📂 Model Input")
+    st.markdown("Upload 3D scan from Scaniverse")
+    uploaded_file = st.file_uploader("", type="zip", label_visibility="collapsed")
+    compare_file = st.file_uploader("Follow-up scan (optional)", type="zip", key="compare_upload",
+                                    help="A post-op scan of the same patient, aligned onto the scan above")
+    if compare_file:
+        st.slider("Follow-up overlay opacity", 0.0, 1.0, 0.5, 0.05, key="compare_opacity")
+    
+    with st.expander("🌡️ Heatmap & Symmetry"):
+        heatmap_modes = (["Off", "Left/right asymmetry", "Mean curvature"]
+                         + (["Follow-up deviation"] if compare_file else []))
+        if st.session_state.get('heatmap_mode', "Off") not in heatmap_modes:
+            st.session_state['heatmap_mode'] = "Off"  # the follow-up scan was removed
+        st.radio("Heatmap", heatmap_modes, key="heatmap_mode",
+                 help="Colour the scan by a per-vertex analysis: red = more volume, blue = less")
+        st.slider("Heatmap range (± mm)", 0.5, 20.0, 3.0, 0.5, key="heatmap_range_mm",
+                  disabled=st.session_state.get('heatmap_mode', "Off") in ("Off", "Mean curvature"))
+        st.checkbox("Show mid-sagittal plane", value=False, key="show_symmetry_plane")
+        st.checkbox("Landmark candidates", value=True, key="show_landmarks",
+                    help="Find nasion, pronasale, alar bases and commissures from the surface curvature; "
+                         "distance and angle points snap to them")
+    
+    with st.expander("🧹 Scan Cleanup"):
+        st.checkbox("Remove floating debris", value=True, key="cleanup_enabled",
+                    help="Drop detached fragments (chair, hair wisps, floor bits) before the scan is shown")
+        st.slider("Min. fragment size (% of main surface faces)", 0.1, 20.0, 2.0, 0.1,
+                  key="cleanup_min_component", disabled=not st.session_state.get('cleanup_enabled', True))
+        st.checkbox("Trim background around the subject", value=False, key="cleanup_trim",
+                    disabled=not st.session_state.get('cleanup_enabled', True))
+        st.slider("Trim margin (% of subject size)", 0.0, 50.0, 5.0, 1.0, key="cleanup_trim_margin",
+                  disabled=not st.session_state.get('cleanup_trim', False))
+    
+    with st.expander("🎯 Focus Region"):
+        st.caption("Pick the surgical site with the 🎯 tool in the viewer. Detail is kept around it "
+                   "and the rest of the scan is simplified.")
+        st.checkbox("Focus on region", value=True, key="focus_enabled",
+                    disabled=not st.session_state.get('focus_center'))
+        st.number_input("Region radius (mm)", min_value=5.0, max_value=200.0, value=30.0, step=5.0,
+                        key="focus_radius_mm")
+        st.slider("Periphery detail", 16, 128, 48, 8, key="focus_periphery",
+                  help="Clustering cells along the scan's diagonal outside the region")
+        if st.session_state.get('focus_center'):
+            st.button("Clear region", use_container_width=True,
+                      on_click=lambda: st.session_state.update(focus_center=None))
+    
+    with st.expander("✂️ Flap Templates"):
+        st.caption("Pick the flap site with the ✂️ tool in the viewer, then choose a template, its size "
+                   "and rotation there. The skin around the site is flattened once and reused.")
+        st.number_input("Site radius (mm)", min_value=10.0, max_value=100.0, value=30.0, step=5.0,
+                        key="flap_radius_mm")
+        if st.session_state.get('flap_center'):
+            st.button("Clear flap site", use_container_width=True,
+                      on_click=lambda: st.session_state.update(flap_center=None))
+    
+    st.divider()
+    calibration_panel()
+    st.divider()
+    feature_guide()
+    
+    with st.expander("🛠 Diagnostics"):
+        st.checkbox("GPU debug overlay", key="gpu_debug",
+                    help="Show tracked GPU memory, live resources and draw calls in the viewer")
+        st.number_input("GPU budget (MB)", min_value=64, max_value=8192, value=512, step=64, key="gpu_budget_mb",
+                        help="Warn in the viewer when markings and the scan exceed this much GPU memory")
+
+# --- MAIN AREA ---
+# Component values (measurements, settings) rerun only this fragment. The
+# mesh is processed once per upload content and the viewer iframe is kept.
+@st.fragment
+def viewer_panel(uploaded_file, compare_file=None):
+    digest = get_scan_digest(uploaded_file)
+    options = processing_options()
+    with st.spinner("🔄 Loading surgical planning studio..."):
+        assets, err = load_scan_assets(digest, options, uploaded_file)
+    
+    compare = None
+    pre_key = deviation = None
+    if not err and compare_file:
+        # The follow-up scan is processed like the main one, without its focus region.
+        # A bad follow-up zip only drops the overlay; the main scan is still shown.
+        compare_options = dict(options, focus=None)
+        with st.spinner("🔄 Aligning follow-up scan..."):
+            compare_assets, compare_err = load_scan_assets(get_scan_digest(compare_file), compare_options,
+                                                           compare_file)
+            if compare_err:
+                st.warning(f"Follow-up scan not shown: {compare_err}")
+            else:
+                pre_key = assets["analysis_key"]
+                registration = register_scan_pair(pre_key, compare_assets["key"],
+                                                  assets["analysis_path"], compare_assets["analysis_path"])
+                compare = {
+                    "tiles_url": compare_assets["tiles_url"],
+                    "key": compare_assets["key"],
+                    "matrix": registration["matrix"],
+                    "opacity": st.session_state.get('compare_opacity', 0.5),
+                }
+                st.caption(f"🔗 Follow-up scan aligned: RMS {registration['rms'] * st.session_state['scale_factor']:.2f} mm, "
+                           f"{registration['inliers']:.0%} overlap")
+                deviation = scan_deviation(pre_key, compare_assets["key"], assets["analysis_path"],
+                                           compare_assets["analysis_path"], np.asarray(registration["matrix"]))
+    
+    heatmap = None
+    symmetry_plane = None
+    mode = st.session_state.get('heatmap_mode', "Off")
+    range_mm = st.session_state.get('heatmap_range_mm', 3.0)
+    if not err and mode == "Follow-up deviation" and compare:
+        heatmap = scalar_layer(assets["key"], f"deviation-{compare['key']}", deviation, assets["analysis_path"])
+        st.caption(f"🌡️ Heatmap: red = swelling, blue = recession, full colour at ±{range_mm:g} mm")
+    if not err and (mode == "Left/right asymmetry" or st.session_state.get('show_symmetry_plane')):
+        with st.spinner("🔄 Fitting symmetry plane..."):
+            # Left/right symmetry on the full mesh (before any focus region)
+            symmetry = scan_symmetry(assets["analysis_key"], assets["analysis_path"])
+        s = st.session_state['scale_factor']
+        asymmetry = np.abs(symmetry["asymmetry"])
+        st.caption(f"🪞 Symmetry: mean asymmetry {asymmetry.mean() * s:.2f} mm, 95% within "
+                   f"{np.percentile(asymmetry, 95) * s:.2f} mm, max {asymmetry.max() * s:.2f} mm")
+        if mode == "Left/right asymmetry":
+            heatmap = scalar_layer(assets["key"], "asymmetry", symmetry["asymmetry"], assets["analysis_path"])
+            st.caption(f"🌡️ Heatmap: red = fuller than the other side, blue = deficient, full colour at ±{range_mm:g} mm")
+        if st.session_state.get('show_symmetry_plane'):
+            symmetry_plane = {"point": symmetry["point"].tolist(), "normal": symmetry["normal"].tolist()}
+    if heatmap:
+        heatmap = dict(heatmap, display=range_mm / st.session_state['scale_factor'])
+    landmarks = None
+    if not err and (mode == "Mean curvature" or st.session_state.get('show_landmarks', True)):
+        with st.spinner("🔄 Computing curvature & landmarks..."):
+            curvature = scan_landmarks(assets["analysis_key"], assets["analysis_path"])
+        if mode == "Mean curvature":
+            # Curvature has no mm range: saturate at half the layer's robust maximum
+            heatmap = scalar_layer(assets["key"], "curvature", curvature["mean"], assets["analysis_path"])
+            heatmap = dict(heatmap, display=heatmap["range"] / 2)
+            st.caption("🌡️ Heatmap: red = convex (ridges, tips), blue = concave (folds, creases)")
+        if st.session_state.get('show_landmarks', True):
+            landmarks = {
+                "named": [{"id": k, "name": LANDMARK_NAMES[k], "point": p.tolist()}
+                          for k, p in zip(curvature["landmark_ids"].tolist(), curvature["landmark_points"])],
+                "extrema": curvature["extrema"].tolist(),
+            }
+            st.caption(f"📍 {len(landmarks['named'])} landmark candidates: "
+                       + ", ".join(m["name"] for m in landmarks["named"]))
+    
+    if err:
+        st.error(err)
+    else:
+        cleanup = assets["meta"].get("cleanup")
+        if cleanup and cleanup["faces_after"] < cleanup["faces_before"]:
+            st.caption(f"🧹 Removed {cleanup['components_removed']} fragment(s): "
+                       f"{cleanup['faces_before']:,} → {cleanup['faces_after']:,} faces")
+        focus = assets["meta"].get("focus")
+        if focus:
+            st.caption(f"🎯 Focus region: {focus['faces_inside']:,} faces at full detail, "
+                       f"{focus['faces_before']:,} → {focus['faces_after']:,} faces overall")
+        flap = None
+        if st.session_state.get('flap_center'):
+            radius = round(st.session_state.get('flap_radius_mm', 30.0) / st.session_state['scale_factor'], 6)
+            with st.spinner("🔄 Flattening the flap site..."):
+                flap = flap_patch(assets["key"], st.session_state['flap_center'], radius, assets["analysis_path"])
+            st.caption(f"✂️ Flap site: {flap['faces']:,} faces flattened")
+        preview = None
+        motion = st.session_state.get('flap_motion')
+        if flap and motion and motion.get("site") == flap["url"]:
+            with st.spinner("🔄 Moving the flap..."):
+                preview = transposition_preview(assets["key"], flap, motion, assets["analysis_path"])
+            st.caption(f"✂️ Transposition preview: {preview['moved']:,} vertices moved, "
+                       f"up to {preview['peak'] * st.session_state['scale_factor']:.1f} mm")
+        profile = None
+        request = st.session_state.get('profile_request')
+        if request:
+            profile = cross_section(assets["analysis_key"], request, assets["analysis_path"])
+            st.caption(f"📈 Profile: {profile['arc'] * st.session_state['scale_factor']:.1f} mm arc, "
+                       + profile_shape(profile["points"], st.session_state['scale_factor']))
+        enclosed = area_enclosed_volumes(st.session_state.get('measurements', []), assets)
+        render_studio_viewer(assets, st.session_state['scale_factor'], height=750, mesh_key=assets["key"],
+                             compare=compare, heatmap=heatmap, symmetry_plane=symmetry_plane,
+                             landmarks=landmarks, flap=flap, flap_preview=preview, profile=profile,
+                             enclosed=[dict(v, id=i) for i, v in enclosed.items()],
+                             landmark_set={"names": [{"id": k, "name": v} for k, v in ANTHROPOMETRIC_LANDMARKS.items()],
+                                           "placed": st.session_state.get('landmark_set', {})})
+        measurements = st.session_state.get('measurements', [])
+        volumes = (area_volume_changes(measurements, assets, pre_key, compare["key"], deviation)
+                   if compare else None)
+        render_measurement_report(measurements, volumes, enclosed)
+        render_anthropometry(st.session_state.get('landmark_set', {}))
+
+if uploaded_file:
+    viewer_panel(uploaded_file, compare_file)
+else:
+    st.info("👆 Upload a Scaniverse .zip file to begin surgical planning")
+    st.markdown("""
+    ### HIDU Surgical Planning Studio
+    
+    **Professional Features:**
+    - ✨ Smooth continuous surface drawing
+    - 📍 Draggable colored annotations
+    - 📏 Distance & angle measurements
+    - 📐 **Skin Flap Area Calculation** (mm²)
+    - 🏷️ Draggable floating labels with delete
+    - 📄 PDF export with 3 views + data
+    - 💾 Save/Load projects (.json)
+    - 🎨 Medical color coding
+    - 📱 iPad & touch optimized
+    - 🎛️ Collapsible UI
+    
+    **Clinical Workflow:**
+    1. Upload 3D scan → Calibrate
+    2. Draw surgical markings (Brush)
+    3. **Draw closed loop for flap area**
+    4. Measure distances & angles
+    5. Add annotations with notes
+    6. Drag labels to optimal positions
+    7. Save project for later
+    8. Export PDF for medical records
+    
+    **Optimized for:**
+    - **Skin Flap Surgery** (area calculation)
+    - Rhinoplasty planning
+    - Facial reconstructive surgery
+    - Tumor excision planning
+    - Maxillofacial procedures
+    - Pre-operative documentation
+    
+    **New: Area Measurement**
+    - Draw around tumor/defect with Brush
+    - Auto-detects closed loops
+    - Calculates true 3D surface area
+    - Shows result in mm² (calibrated)
+    - Ideal for flap planning!
+    """)
+
+
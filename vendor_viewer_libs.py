@@ -0,0 +1,85 @@
+"""Download the viewer's third-party libraries into viewer/vendor/.
+
+The viewer loads three.js, OrbitControls, tween.js, the export libraries and
+the Material Icons font from viewer/vendor/ so it works on networks without
+internet access. Run this once on a connected machine and commit the files:
+
+    python vendor_viewer_libs.py
+"""
+import os
+import re
+import sys
+import urllib.error
+import urllib.request
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "viewer", "vendor")
+
+# Versions must match the ?v= queries and CDN fallbacks in viewer/index.html
+# and viewer/js/project.js.
+LIBRARIES = {
+    "three.min.js": "https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js",
+    "OrbitControls.js": "https://cdn.jsdelivr.net/npm/three@0.128.0/examples/js/controls/OrbitControls.js",
+    "tween.umd.js": "https://cdnjs.cloudflare.com/ajax/libs/tween.js/18.6.4/tween.umd.js",
+    "html2canvas.min.js": "https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js",
+    "jspdf.umd.min.js": "https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js",
+}
+
+# License texts shipped next to the files, one per project
+LICENSES = {
+    "three.js.LICENSE": "https://raw.githubusercontent.com/mrdoob/three.js/r128/LICENSE",
+    "tween.js.LICENSE": "https://raw.githubusercontent.com/tweenjs/tween.js/v18.6.4/LICENSE",
+    "html2canvas.LICENSE": "https://raw.githubusercontent.com/niklasvh/html2canvas/v1.4.1/LICENSE",
+    "jspdf.LICENSE": "https://raw.githubusercontent.com/parallax/jsPDF/v2.5.1/LICENSE",
+    "material-icons.LICENSE": "https://raw.githubusercontent.com/google/material-design-icons/master/LICENSE",
+}
+
+# Everything index.html loads from viewer/vendor/
+VENDORED_FILES = list(LIBRARIES) + ["material-icons.css", "material-icons.woff2"]
+
+MATERIAL_ICONS_CSS = "https://fonts.googleapis.com/icon?family=Material+Icons"
+# Google Fonts only returns woff2 to user agents it recognises
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": BROWSER_UA})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.read()
+
+
+def missing_vendor_files():
+    """Vendored files not present yet; the viewer loads these from their CDNs."""
+    return [name for name in VENDORED_FILES if not os.path.exists(os.path.join(VENDOR_DIR, name))]
+
+
+def vendor_material_icons():
+    css = fetch(MATERIAL_ICONS_CSS).decode("utf-8")
+    font_url = re.search(r"url\((https://[^)]+)\)", css).group(1)
+    with open(os.path.join(VENDOR_DIR, "material-icons.woff2"), "wb") as f:
+        f.write(fetch(font_url))
+    with open(os.path.join(VENDOR_DIR, "material-icons.css"), "w", encoding="utf-8") as f:
+        f.write(css.replace(font_url, "material-icons.woff2"))
+
+
+def main():
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    for name, url in LIBRARIES.items():
+        data = fetch(url)
+        with open(os.path.join(VENDOR_DIR, name), "wb") as f:
+            f.write(data)
+        print(f"✓ {name} ({len(data) // 1024} KB)")
+    vendor_material_icons()
+    print("✓ material-icons.css + material-icons.woff2")
+    os.makedirs(os.path.join(VENDOR_DIR, "licenses"), exist_ok=True)
+    for name, url in LICENSES.items():
+        with open(os.path.join(VENDOR_DIR, "licenses", name), "wb") as f:
+            f.write(fetch(url))
+    print(f"✓ {len(LICENSES)} licenses")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except urllib.error.URLError as e:
+        sys.exit(f"✗ Download failed ({e.reason}); run this on a machine with internet access. "
+                 f"Still missing: {', '.join(missing_vendor_files()) or 'licenses'}")
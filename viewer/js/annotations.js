@@ -0,0 +1,162 @@
+// --- ANNOTATION TOOL (FIXED: iPad Touch Support) ---
+function createAnnotation(point3D, event) {
+    // 1. Tạo marker 3D với màu hiện tại
+    const marker = addPin(point3D, settings.color);
+
+    // 2. Tạo HTML label
+    const label = document.createElement('div');
+    label.className = 'annotation-label';
+    label.style.background = settings.colorHex;
+
+    // Đổi màu chữ nếu nền quá sáng
+    if(settings.colorHex === '#FFFFFF' || settings.colorHex === '#FFEB3B') {
+        label.style.color = '#333';
+    }
+
+    const annotId = annotationCounter;
+
+    label.innerHTML = `
+        <div class="annotation-header" data-annot-id="${annotId}">
+            <div style="display:flex; align-items:center;">
+                <span class="annotation-number" style="background:${settings.colorHex}; color:#fff;">${annotId}</span>
+                <span style="font-size:11px;">Note #${annotId}</span>
+            </div>
+            <i class="material-icons" style="font-size:14px; opacity:0.7;">open_with</i>
+        </div>
+        <div class="annotation-body">
+            <input type="text" 
+                   class="annotation-input" 
+                   placeholder="Enter note..."
+                   onkeydown="event.stopPropagation()"
+                   onmousedown="event.stopPropagation()"
+                   ontouchstart="event.stopPropagation()">
+        </div>
+    `;
+
+    document.body.appendChild(label);
+
+    const annotation = {
+        id: annotId,
+        point3D: point3D,
+        marker: marker,
+        label: label,
+        offsetX: 20,
+        offsetY: -40
+    };
+
+    annotations.push(annotation);
+    drawnObjects.push(marker);
+
+    // Setup drag handlers
+    setupAnnotationDrag(annotation);
+
+    annotationCounter++;
+
+    function updateLabelPosition() {
+        if(!label.parentElement) return;
+
+        const pos = toScreenPosition(point3D);
+        const finalX = pos.x + annotation.offsetX;
+        const finalY = pos.y + annotation.offsetY;
+
+        label.style.left = finalX + 'px';
+        label.style.top = finalY + 'px';
+
+        requestAnimationFrame(updateLabelPosition);
+    }
+    updateLabelPosition();
+}
+
+// --- ANNOTATION DRAGGING (iPad Compatible) ---
+function setupAnnotationDrag(annotation) {
+    const header = annotation.label.querySelector('.annotation-header');
+    let dragStartTime = 0;
+
+    // Mouse events
+    header.addEventListener('mousedown', (e) => {
+        if(e.target.tagName === 'INPUT') return;
+        e.preventDefault();
+        e.stopPropagation();
+        startAnnotationDrag(annotation, e.clientX, e.clientY);
+    });
+
+    // Touch events - iPad optimized
+    header.addEventListener('touchstart', (e) => {
+        dragStartTime = Date.now();
+        e.preventDefault();
+        e.stopPropagation();
+        const touch = e.touches[0];
+        startAnnotationDrag(annotation, touch.clientX, touch.clientY);
+    }, { passive: false });
+
+    header.addEventListener('touchend', (e) => {
+        const dragDuration = Date.now() - dragStartTime;
+        // If very short touch, might be a tap not drag
+        if(dragDuration < 100) {
+            endAnnotationDrag();
+        }
+    });
+}
+
+function startAnnotationDrag(annotation, clientX, clientY) {
+    draggedAnnotation = annotation;
+    isDraggingAnnotation = true;
+    dragOffset.x = clientX;
+    dragOffset.y = clientY;
+    annotation.label.style.zIndex = 10000;
+
+    // Disable orbit controls when dragging
+    if(controls) controls.enabled = false;
+}
+
+// Global drag handlers
+document.addEventListener('mousemove', (event) => {
+    if (isDraggingAnnotation && draggedAnnotation) {
+        event.preventDefault();
+        updateAnnotationDrag(event.clientX, event.clientY);
+    }
+});
+
+document.addEventListener('touchmove', (event) => {
+    if (isDraggingAnnotation && draggedAnnotation) {
+        event.preventDefault();
+        event.stopPropagation();
+        const touch = event.touches[0];
+        updateAnnotationDrag(touch.clientX, touch.clientY);
+    }
+}, { passive: false });
+
+document.addEventListener('mouseup', () => {
+    if (isDraggingAnnotation) {
+        endAnnotationDrag();
+    }
+});
+
+document.addEventListener('touchend', () => {
+    if (isDraggingAnnotation) {
+        endAnnotationDrag();
+    }
+});
+
+function updateAnnotationDrag(clientX, clientY) {
+    const deltaX = clientX - dragOffset.x;
+    const deltaY = clientY - dragOffset.y;
+
+    draggedAnnotation.offsetX += deltaX;
+    draggedAnnotation.offsetY += deltaY;
+
+    dragOffset.x = clientX;
+    dragOffset.y = clientY;
+}
+
+function endAnnotationDrag() {
+    isDraggingAnnotation = false;
+    if(draggedAnnotation) {
+        draggedAnnotation.label.style.zIndex = 1000;
+        draggedAnnotation = null;
+    }
+    // Re-enable orbit controls if in view mode
+    if(controls && currentTool === 'view') {
+        controls.enabled = true;
+    }
+}
@@ -0,0 +1,96 @@
+// --- ANTHROPOMETRIC LANDMARKS ---
+// The landmark tool places named landmarks one after another (clicks snap
+// like measurement points), or accepts the detected candidates in one go.
+// The whole set goes to Python as landmark_set in tile space; Python
+// evaluates every standard facial distance, angle and ratio from it at once
+// and lists them below the viewer, so nothing is measured click by click.
+const PLACED_LANDMARK_COLOR = 0xe040fb;
+
+let landmarkNames = [];        // [{ id, name }] from args.landmark_set
+let placedLandmarks = {};      // id -> [x, y, z] in tile space, sent with the component value
+let placedMarkers = [];
+let placedPool = null;
+let placedAdopted = false;
+
+// args.landmark_set: { names, placed }. After a page reload the viewer
+// starts empty and takes the set Python kept, once.
+function setLandmarkNames(landmarkSet) {
+    if(!landmarkSet) return;
+    if(JSON.stringify(landmarkSet.names) !== JSON.stringify(landmarkNames)) {
+        landmarkNames = landmarkSet.names;
+        updateLandmarkSelect();
+    }
+    if(!placedAdopted) {
+        placedAdopted = true;
+        if(Object.keys(placedLandmarks).length === 0 && landmarkSet.placed) {
+            placedLandmarks = Object.assign({}, landmarkSet.placed);
+            updatePlacedMarkers();
+        }
+    }
+}
+
+function updateLandmarkSelect() {
+    const select = document.getElementById('p-anthro-landmark');
+    const current = select.value;
+    select.innerHTML = '';
+    landmarkNames.forEach(l => {
+        const option = document.createElement('option');
+        option.value = l.id;
+        option.innerText = l.name + (placedLandmarks[l.id] ? ' ✓' : '');
+        select.appendChild(option);
+    });
+    if(current) select.value = current;
+}
+
+// Rebuilt when the set or the scan placement change
+function updatePlacedMarkers() {
+    placedMarkers.forEach(releaseMarker);
+    placedMarkers = [];
+    updateLandmarkSelect();
+    if(!tileSet) return;
+    if(!placedPool) placedPool = new MarkerPool(1003);
+    Object.values(placedLandmarks).forEach(p => {
+        const position = tileSet.group.localToWorld(new THREE.Vector3().fromArray(p));
+        placedMarkers.push(placedPool.add(position, PLACED_LANDMARK_COLOR, currentZoom * 0.0015));
+    });
+}
+
+function placeLandmark(point) {
+    const select = document.getElementById('p-anthro-landmark');
+    if(!tileSet || !select.value) return;
+    const local = tileSet.group.worldToLocal(point.clone());
+    placedLandmarks[select.value] = local.toArray().map(c => Math.round(c * 1e5) / 1e5);
+
+    // Move on to the next landmark still missing
+    const hud = document.getElementById('info-hud');
+    const next = landmarkNames.find(l => !placedLandmarks[l.id]);
+    const placed = landmarkNames.find(l => l.id === select.value);
+    hud.innerText = 'Placed ' + placed.name + (next ? ' - next: ' + next.name : ' - all landmarks placed');
+    updatePlacedMarkers();
+    if(next) select.value = next.id;
+    pushState();
+}
+
+window.acceptDetectedLandmarks = function() {
+    const hud = document.getElementById('info-hud');
+    if(!landmarkSet || landmarkSet.named.length === 0) {
+        hud.innerText = 'No detected landmarks - turn on "Landmark candidates" in the sidebar';
+        return;
+    }
+    landmarkSet.named.forEach(m => { placedLandmarks[m.id] = m.point.slice(); });
+    hud.innerText = 'Accepted ' + landmarkSet.named.length + ' detected landmarks';
+    updatePlacedMarkers();
+    pushState();
+}
+
+window.removeLandmark = function() {
+    delete placedLandmarks[document.getElementById('p-anthro-landmark').value];
+    updatePlacedMarkers();
+    pushState();
+}
+
+window.clearLandmarks = function() {
+    placedLandmarks = {};
+    updatePlacedMarkers();
+    pushState();
+}
@@ -0,0 +1,93 @@
+// --- STREAMLIT BRIDGE ---
+// Minimal implementation of the custom component protocol: Python sends
+// small render messages (scale, settings, mesh URLs) and the viewer sends
+// measurements and settings back as the component value.
+function sendToStreamlit(type, data) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+}
+
+let pushTimer = null;
+let lastPushed = null;
+function pushState() {
+    clearTimeout(pushTimer);
+    pushTimer = setTimeout(() => {
+        const value = {
+            measurements: serializeMeasurements(),
+            settings: serializeSettings(),
+            focus_pick: focusPick,
+            flap_pick: flapPick,
+            flap_motion: flapMotion,
+            profile_request: profileRequest,
+            landmark_set: placedLandmarks
+        };
+        // Every value sent triggers a Python rerun, so skip no-op updates
+        const serialized = JSON.stringify(value);
+        if(serialized === lastPushed) return;
+        lastPushed = serialized;
+        sendToStreamlit('streamlit:setComponentValue', { value: value, dataType: 'json' });
+    }, 300);
+}
+
+function onRender(args) {
+    if(args.height && args.height !== viewerHeight) {
+        viewerHeight = args.height;
+        if(renderer) resizeViewer();
+    }
+    sendToStreamlit('streamlit:setFrameHeight', { height: viewerHeight });
+
+    if(!renderer) {
+        init();
+        if(args.settings) applySettings(args.settings);
+    }
+    if(args.mesh_key !== loadedMeshKey) {
+        loadModel(args.tiles_url);
+        loadedMeshKey = args.mesh_key;
+    }
+    const compareKey = args.compare ? args.compare.key : null;
+    if(compareKey !== loadedCompareKey) {
+        loadCompareModel(args.compare);
+        loadedCompareKey = compareKey;
+    } else if(args.compare) {
+        updateCompareModel(args.compare);
+    }
+    if(args.scale_factor !== scaleFactor) {
+        setScaleFactor(args.scale_factor);
+    }
+    if(args.gpu_budget_mb && args.gpu_budget_mb * 1048576 !== gpu.budgetBytes) {
+        gpu.setBudget(args.gpu_budget_mb);
+    }
+    setDebugOverlay(!!args.debug);
+    if(JSON.stringify(args.focus || null) !== JSON.stringify(focusRegion)) {
+        setFocusRegion(args.focus);
+    }
+    if(JSON.stringify(args.heatmap || null) !== JSON.stringify(heatmapLayer)) {
+        showHeatmap(args.heatmap || null);
+    }
+    if(JSON.stringify(args.symmetry_plane || null) !== JSON.stringify(symmetryPlane)) {
+        setSymmetryPlane(args.symmetry_plane);
+    }
+    if(JSON.stringify(args.landmarks || null) !== JSON.stringify(landmarkSet)) {
+        setLandmarks(args.landmarks);
+    }
+    if(JSON.stringify(args.flap || null) !== JSON.stringify(flapSite)) {
+        setFlapSite(args.flap);
+    }
+    if(JSON.stringify(args.flap_preview || null) !== JSON.stringify(flapPreview)) {
+        setFlapPreview(args.flap_preview);
+    }
+    setLandmarkNames(args.landmark_set);
+    if(JSON.stringify(args.enclosed || null) !== JSON.stringify(enclosedVolumes)) {
+        setEnclosedVolumes(args.enclosed);
+    }
+    if(JSON.stringify(args.profile || null) !== JSON.stringify(profileResult)) {
+        setProfile(args.profile);
+    }
+}
+
+window.addEventListener('message', (event) => {
+    if(event.data && event.data.type === 'streamlit:render') {
+        onRender(event.data.args);
+    }
+});
+
+sendToStreamlit('streamlit:componentReady', { apiVersion: 1 });
@@ -0,0 +1,127 @@
+// --- UTILITIES ---
+// Markings are meshes, instanced marker slots or paint-layer records
+function disposeDrawnObject(obj) {
+    if(obj.isMarker) {
+        releaseMarker(obj);
+    } else if(obj.isPaint) {
+        if(paintLayer) paintLayer.remove(obj);
+    } else {
+        gpu.disposeObject(obj);
+    }
+}
+
+window.undo = function() {
+    if (drawnObjects.length > 0) {
+        const obj = drawnObjects.pop();
+        disposeDrawnObject(obj);
+
+        const annotation = annotations.find(a => a.marker === obj);
+        if(annotation) {
+            annotation.label.remove();
+            annotations = annotations.filter(a => a !== annotation);
+        }
+    }
+}
+
+window.clearAll = function() {
+    if(confirm('Clear all surgical markings and annotations?')) {
+        while(drawnObjects.length > 0) undo();
+        resetTemp();
+        annotationCounter = 1;
+        measurements = [];
+        pushState();
+
+        // Remove floating labels
+        floatingLabels.forEach(l => {
+            if(l.element && l.element.parentElement) {
+                l.element.remove();
+            }
+        });
+        floatingLabels = [];
+    }
+}
+
+function resetTemp() {
+    clearSelection();
+    tempMeshes.forEach(disposeDrawnObject);
+    tempMeshes = [];
+    if(paintStroke) {
+        disposeDrawnObject(paintStroke);
+        paintStroke = null;
+    }
+
+    measurePoints = [];
+    measureMarkers.forEach(releaseMarker);
+    measureMarkers = [];
+    drawPoints = [];
+    isDrawing = false;
+    isErasing = false;
+
+    if(eraserCursor) {
+        eraserCursor.visible = false;
+    }
+    document.getElementById('eraser-size-row').style.display = 'none';
+    document.getElementById('flap-rows').style.display = 'none';
+    document.getElementById('profile-rows').style.display = 'none';
+    document.getElementById('anthro-rows').style.display = 'none';
+}
+
+// --- VIEW CONTROLS ---
+window.setView = function(v) {
+    const d = currentZoom * 0.8;
+    const views = {
+        'front': {p: {x:0, y:0, z:d}, u: {x:0, y:1, z:0}},
+        'left': {p: {x:-d, y:0, z:0}, u: {x:0, y:1, z:0}},
+        'right': {p: {x:d, y:0, z:0}, u: {x:0, y:1, z:0}},
+        'top': {p: {x:0, y:d, z:0}, u: {x:0, y:0, z:-1}},
+        'bottom': {p: {x:0, y:-d, z:0}, u: {x:0, y:0, z:1}}
+    };
+
+    const target = views[v];
+    if(!target) return;
+
+    new TWEEN.Tween(controls.target)
+        .to({x:0, y:0, z:0}, 600)
+        .easing(TWEEN.Easing.Cubic.InOut)
+        .start();
+
+    new TWEEN.Tween(camera.position)
+        .to(target.p, 800)
+        .easing(TWEEN.Easing.Cubic.InOut)
+        .onUpdate(() => {
+            camera.up.copy(target.u);
+        })
+        .start();
+}
+
+window.rotateCamera = function(direction) {
+    const rotateAmount = Math.PI / 8;
+    const currentPos = camera.position.clone();
+    const target = controls.target.clone();
+
+    let newPos = currentPos.clone().sub(target);
+
+    if(direction === 'left') {
+        const axis = new THREE.Vector3(0, 1, 0);
+        newPos.applyAxisAngle(axis, rotateAmount);
+    }
+    else if(direction === 'right') {
+        const axis = new THREE.Vector3(0, 1, 0);
+        newPos.applyAxisAngle(axis, -rotateAmount);
+    }
+    else if(direction === 'up') {
+        const axis = new THREE.Vector3(1, 0, 0);
+        newPos.applyAxisAngle(axis, rotateAmount);
+    }
+    else if(direction === 'down') {
+        const axis = new THREE.Vector3(1, 0, 0);
+        newPos.applyAxisAngle(axis, -rotateAmount);
+    }
+
+    newPos.add(target);
+
+    new TWEEN.Tween(camera.position)
+        .to({x: newPos.x, y: newPos.y, z: newPos.z}, 400)
+        .easing(TWEEN.Easing.Cubic.Out)
+        .start();
+}
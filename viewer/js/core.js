@@ -0,0 +1,296 @@
+let camera, controls, scene, renderer, raycaster, mouse;
+let currentZoom = 300; 
+let targetObject = null;
+let currentTool = 'view';
+let scaleFactor = 1.0; // mm per model unit, pushed from the Python sidebar
+let viewerHeight = 750;
+let loadedMeshKey = null;
+let loadedCompareKey = null;
+
+// Drawing State
+let isDrawing = false;
+let drawPoints = [];
+let tempMeshes = [];
+let paintStroke = null; // texture-space stroke (or erase) in progress
+let drawnObjects = [];
+
+// Eraser State
+let isErasing = false;
+let eraserRadius = 0.05;
+let eraserCursor = null;
+
+// Annotation State
+let annotationCounter = 1;
+let annotations = [];
+let draggedAnnotation = null;
+let dragOffset = { x: 0, y: 0 };
+let isDraggingAnnotation = false;
+
+// Measurement State
+let measurePoints = [];
+let measureMarkers = [];
+let floatingLabels = []; // Floating measurement labels
+let measurements = []; // Store all measurements for export
+let measurementCounter = 1;
+let draggedLabel = null;
+let labelDragOffset = { x: 0, y: 0 };
+
+// iPad touch handling
+let touchStartTime = 0;
+let longPressTimer = null;
+let lastClickTime = 0; // Prevent double-tap
+
+// UI State
+let settingsPanelVisible = false;
+let navPanelExpanded = true;
+
+// Settings
+let settings = {
+    color: 0x9C27B0,
+    colorHex: '#9C27B0',
+    lineWidth: 0.002,
+    opacity: 0.95,
+    offsetFactor: 0.0001,
+    autoArea: true,
+    texturePaint: false, // paint strokes/fills into the scan texture instead of tube meshes
+    snapLandmarkMm: 3,   // measurement points within this of a landmark candidate snap to it (0 = off)
+    snapVertexMm: 0.5    // otherwise to the nearest scan vertex within this (0 = off)
+};
+
+function init() {
+    scene = new THREE.Scene();
+    scene.background = new THREE.Color(0x1a1a1a);
+
+    camera = new THREE.PerspectiveCamera(45, window.innerWidth / viewerHeight, 0.1, 2000);
+    renderer = new THREE.WebGLRenderer({ antialias: true, preserveDrawingBuffer: true });
+    renderer.setSize(window.innerWidth, viewerHeight);
+    renderer.setPixelRatio(window.devicePixelRatio);
+    renderer.outputEncoding = THREE.sRGBEncoding;
+    document.body.appendChild(renderer.domElement);
+
+    controls = new THREE.OrbitControls(camera, renderer.domElement);
+    controls.enableDamping = true;
+    controls.dampingFactor = 0.05;
+
+    initMarkerPools();
+
+    raycaster = new THREE.Raycaster();
+    raycaster.params.Line.threshold = 0.5;
+    mouse = new THREE.Vector2();
+
+    // Event Listeners - iPad optimized
+    const canvas = renderer.domElement;
+
+    canvas.addEventListener('contextmenu', (e) => e.preventDefault());
+    document.addEventListener('contextmenu', (e) => e.preventDefault());
+
+    canvas.addEventListener('touchstart', onTouchStart, { passive: false });
+    canvas.addEventListener('touchmove', onTouchMove, { passive: false });
+    canvas.addEventListener('touchend', onTouchEnd, { passive: false });
+
+    canvas.addEventListener('pointerdown', onDown);
+    canvas.addEventListener('pointermove', onMove);
+    canvas.addEventListener('pointerup', onUp);
+
+    window.addEventListener('resize', resizeViewer);
+
+    animate();
+    selectTool('view');
+}
+
+function resizeViewer() {
+    camera.aspect = window.innerWidth / viewerHeight;
+    camera.updateProjectionMatrix();
+    renderer.setSize(window.innerWidth, viewerHeight);
+}
+
+// --- MODEL LOADING ---
+// Only called when mesh_key changes - calibration and settings updates keep the scene.
+// Tile files are immutable per scan digest, so the browser can cache them.
+let loadToken = 0;
+
+let loadedScanId = null; // meta.scan of the scan on screen; focus-region variants share it
+
+function disposeModel() {
+    if(!targetObject) return;
+    tileSet.dispose();
+    tileSet = null;
+    targetObject = null;
+}
+
+function scanMaterial(baseUrl, manifest) {
+    const material = new THREE.MeshBasicMaterial({ side: THREE.DoubleSide });
+    if(manifest.texture) {
+        material.map = new THREE.TextureLoader().load(baseUrl + manifest.texture, tex => gpu.refresh(tex));
+        material.map.encoding = THREE.sRGBEncoding;
+    }
+    return material;
+}
+
+function loadModel(tilesUrl) {
+    const token = ++loadToken;
+    disposeModel();
+
+    const baseUrl = tilesUrl.substring(0, tilesUrl.lastIndexOf('/') + 1);
+    fetch(tilesUrl)
+        .then(response => response.json())
+        .then(manifest => {
+            // A newer scan was requested while this one was downloading
+            if(token !== loadToken) return;
+
+            const material = scanMaterial(baseUrl, manifest);
+            // A re-meshed focus region of the same scan keeps the view and the markings
+            const meta = manifest.meta || {};
+            const sameScan = !!meta.scan && meta.scan === loadedScanId;
+            loadedScanId = meta.scan || null;
+            tileSet = new TileSet(baseUrl, manifest, material);
+            placeModel(tileSet.group, tileSetBox(manifest), sameScan);
+            updateFocusOutline();
+            placeCompareModel();
+            showHeatmap(heatmapLayer);
+            updateSymmetryOutline();
+            updateLandmarkMarkers();
+            updatePlacedMarkers();
+            updateFlapOutline();
+        })
+        .catch(err => console.error('Scan failed to load', err));
+}
+
+// --- FOLLOW-UP SCAN OVERLAY ---
+// A second scan (post-op) drawn over the main one. Python registers it and
+// sends the 4×4 matrix from its tile space into the main scan's tile space.
+let compareToken = 0;
+const compareMatrix = new THREE.Matrix4();
+
+function loadCompareModel(compare) {
+    const token = ++compareToken;
+    if(compareSet) {
+        compareSet.dispose();
+        compareSet = null;
+    }
+    if(!compare) return;
+
+    const baseUrl = compare.tiles_url.substring(0, compare.tiles_url.lastIndexOf('/') + 1);
+    fetch(compare.tiles_url)
+        .then(response => response.json())
+        .then(manifest => {
+            if(token !== compareToken) return;
+            const material = scanMaterial(baseUrl, manifest);
+            material.transparent = true;
+            material.depthWrite = false;
+            compareSet = new TileSet(baseUrl, manifest, material);
+            compareSet.group.matrixAutoUpdate = false;
+            scene.add(compareSet.group);
+            updateCompareModel(compare);
+        })
+        .catch(err => console.error('Follow-up scan failed to load', err));
+}
+
+function updateCompareModel(compare) {
+    // Python sends rows; Matrix4.set() takes them row-major too
+    compareMatrix.set(...compare.matrix.flat());
+    if(!compareSet) return;
+    compareSet.material.opacity = compare.opacity;
+    compareSet.group.visible = compare.opacity > 0;
+    placeCompareModel();
+}
+
+// Main group matrix (centring) × registration
+function placeCompareModel() {
+    if(!compareSet || !tileSet) return;
+    compareSet.group.matrix.multiplyMatrices(tileSet.group.matrix, compareMatrix);
+    compareSet.group.matrixWorldNeedsUpdate = true;
+}
+
+// `box` is the scan's bounding box; tiles arrive after the group is placed
+function placeModel(object, box, keepView = false) {
+    const center = box.getCenter(new THREE.Vector3());
+    object.position.sub(center);
+    object.updateMatrixWorld();
+    const size = box.getSize(new THREE.Vector3());
+    const maxDim = Math.max(size.x, size.y, size.z);
+
+    if(!keepView) {
+        if(maxDim > 0) {
+             currentZoom = maxDim * 2.0; 
+             camera.position.set(0, 0, currentZoom);
+        } else { 
+            camera.position.set(0, 0, 300); 
+        }
+        controls.target.set(0, 0, 0);
+    }
+
+    scene.add(object);
+    targetObject = object;
+    if(paintLayer) paintLayer.attach(object, keepView);
+}
+
+function animate() {
+    requestAnimationFrame(animate);
+    TWEEN.update();
+    controls.update();
+    if(tileSet) tileSet.update();
+    if(compareSet && compareSet.group.visible) compareSet.update();
+    processPointerQueue();
+    if(paintLayer) paintLayer.flush();
+    renderer.render(scene, camera);
+}
+
+// --- iPad TOUCH HANDLING ---
+function onTouchStart(event) {
+    event.preventDefault();
+    event.stopPropagation();
+
+    touchStartTime = Date.now();
+
+    if(longPressTimer) {
+        clearTimeout(longPressTimer);
+        longPressTimer = null;
+    }
+
+    if(event.touches.length === 1 && currentTool !== 'view') {
+        const touch = event.touches[0];
+        const fakeEvent = {
+            clientX: touch.clientX,
+            clientY: touch.clientY,
+            button: 0
+        };
+        onDown(fakeEvent);
+    }
+}
+
+function onTouchMove(event) {
+    event.preventDefault();
+    event.stopPropagation();
+
+    if(longPressTimer) {
+        clearTimeout(longPressTimer);
+        longPressTimer = null;
+    }
+
+    if(event.touches.length === 1 && currentTool !== 'view') {
+        const touch = event.touches[0];
+        const fakeEvent = {
+            clientX: touch.clientX,
+            clientY: touch.clientY
+        };
+        onMove(fakeEvent);
+    }
+}
+
+function onTouchEnd(event) {
+    event.preventDefault();
+    event.stopPropagation();
+
+    if(longPressTimer) {
+        clearTimeout(longPressTimer);
+        longPressTimer = null;
+    }
+
+    const touchDuration = Date.now() - touchStartTime;
+
+    if(touchDuration < 500 && currentTool !== 'view') {
+        const fakeEvent = { button: 0 };
+        onUp(fakeEvent);
+    }
+}
@@ -0,0 +1,88 @@
+// --- ERASER TOOL ---
+function createEraserCursor() {
+    if(eraserCursor) {
+        gpu.disposeObject(eraserCursor);
+    }
+
+    const geo = new THREE.SphereGeometry(1, 32, 32);
+    const mat = new THREE.MeshBasicMaterial({
+        color: 0xff5252,
+        transparent: true,
+        opacity: 0.3,
+        depthTest: false,
+        wireframe: true
+    });
+    eraserCursor = gpu.retainObject(new THREE.Mesh(geo, mat));
+    eraserCursor.scale.setScalar(eraserRadius * currentZoom);
+    eraserCursor.renderOrder = 2000;
+    eraserCursor.visible = false;
+    scene.add(eraserCursor);
+
+    document.getElementById('eraser-size-row').style.display = 'flex';
+}
+
+// `sample` is the screen position of the eraser; what lies under the eraser
+// circle is read from the GPU picking pass instead of scanning vertices.
+// A frame's samples are queued and erased together by flushErase, so a fast
+// stroke costs one picking pass per frame, not one per sample. A circle too
+// large for the pick buffer (zoomed in with a big eraser) falls back to the
+// world-distance test around its point.
+let eraseQueue = [];  // { x, y, r, point } screen circles not yet erased
+
+function queueErase(point, sample) {
+    eraseQueue.push({ x: sample.x, y: sample.y, r: worldToScreenRadius(point, eraserRadius * currentZoom), point: point.clone() });
+}
+
+function eraseAtPoint(point, sample) {
+    queueErase(point, sample);
+    flushErase();
+}
+
+// Marking meshes with a vertex, and markers, within radiusWorld of point
+function objectsNear(point, radiusWorld) {
+    const vertex = new THREE.Vector3();
+    return drawnObjects.filter(obj => {
+        if(obj.isMarker) return obj.position.distanceTo(point) < radiusWorld;
+        const position = obj.geometry && obj.geometry.attributes && obj.geometry.attributes.position;
+        if(!position) return false;
+        for(let j = 0; j < position.count; j++) {
+            vertex.fromBufferAttribute(position, j).applyMatrix4(obj.matrixWorld);
+            if(vertex.distanceTo(point) < radiusWorld) return true;
+        }
+        return false;
+    });
+}
+
+function flushErase() {
+    if(eraseQueue.length === 0) return;
+    const picker = getPicker();
+    const circles = eraseQueue.filter(c => picker.covers(c.r));
+    const oversize = eraseQueue.filter(c => !picker.covers(c.r));
+    eraseQueue = [];
+
+    const hits = new Set(picker.pickCircles(circles));
+    oversize.forEach(c => objectsNear(c.point, eraserRadius * currentZoom).forEach(obj => hits.add(obj)));
+
+    hits.forEach(obj => {
+        const index = drawnObjects.indexOf(obj);
+        if(index === -1) return; // already removed with its measurement
+
+        // Check if this object is linked to a label
+        const linkedLabel = findLinkedLabel(obj);
+
+        if(linkedLabel) {
+            // Delete entire measurement including label
+            deleteFloatingLabel(linkedLabel);
+            return;
+        }
+
+        disposeDrawnObject(obj);
+        drawnObjects.splice(index, 1);
+
+        const annotation = annotations.find(a => a.marker === obj);
+        if(annotation) {
+            annotation.label.remove();
+            annotations = annotations.filter(a => a !== annotation);
+        }
+    });
+}
@@ -0,0 +1,402 @@
+// --- FLAP TEMPLATES ---
+// The flap tool picks a site; Python flattens the skin around it once (LSCM)
+// and sends the patch as args.flap. Templates are laid out in that plane in
+// model units, so resizing, rotating or moving one only re-maps its outline
+// onto the skin here, with no round trip. The true skin area of each outline
+// comes from the patch's per-triangle ratio of skin area to flat area.
+// The transposition slider sends the flap's motion to Python, which deforms
+// the patch (ARAP) and answers with position deltas shown as args.flap_preview.
+const FLAP_OUTLINE_STEPS = 24;     // outline samples per template size along each side
+const FLAP_AREA_SAMPLES = 2500;    // grid samples inside an outline for its skin area
+const FLAP_COLOR = 0x00e676;
+
+// Closed outlines in units of the template size, centred on the site, +y up the face
+const FLAP_TEMPLATES = {
+    // Limberg: rhombic defect with 60° and 120° corners, flap off the short diagonal
+    rhomboid: () => {
+        const h = Math.sqrt(3) / 2;
+        return [
+            { name: 'Defect', points: [[0, h], [0.5, 0], [0, -h], [-0.5, 0]] },
+            { name: 'Flap', points: [[0.5, 0], [1.5, 0], [1, -h], [0, -h]] }
+        ];
+    },
+    // Zitelli: round defect, two lobes rotated 45° each about a pivot one radius below its edge
+    bilobed: () => {
+        const circle = (cx, cy, r) => Array.from({ length: 32 }, (_, i) =>
+            [cx + r * Math.cos(i * Math.PI / 16), cy + r * Math.sin(i * Math.PI / 16)]);
+        const s = Math.SQRT1_2;
+        return [
+            { name: 'Defect', points: circle(0, 0, 0.5) },
+            { name: 'Lobe 1', points: circle(s, s - 1, 0.5) },
+            { name: 'Lobe 2', points: circle(1, -1, 0.4) }
+        ];
+    },
+    // Single-pedicle advancement, 3:1 length to width
+    advancement: () => [
+        { name: 'Defect', points: [[-0.5, 0.5], [0.5, 0.5], [0.5, -0.5], [-0.5, -0.5]] },
+        { name: 'Flap', points: [[-0.5, -0.5], [0.5, -0.5], [0.5, -3.5], [-0.5, -3.5]] }
+    ]
+};
+
+// How each template's flap moves onto its defect (template units, degrees counter-clockwise)
+const FLAP_MOTIONS = {
+    rhomboid: { pivot: [0, -Math.sqrt(3) / 2], angle: 60, shift: [0, 0] },
+    bilobed: { pivot: [0, -1], angle: 45, shift: [0, 0] },
+    advancement: { pivot: [0, 0], angle: 0, shift: [0, 1] }
+};
+
+let flapPick = null;     // { center, seq } last site pick, sent with the component value
+let flapSite = null;     // { url, center, radius, vertices, faces } from args.flap
+let flapPatch = null;    // parsed patch with its flat-space grid
+let flapToken = 0;
+let flapTemplate = { type: 'rhomboid', sizeMm: 10, rotation: 0, offset: [0, 0], transpose: 0 };
+let flapPaths = [];      // { name, flat, points, area } of the current outline
+let flapOutline = null;
+let flapMotion = null;   // { site, flaps, defect, pivot, angle, shift } sent with the component value
+let flapPreview = null;  // { url, site, defect, ... } from args.flap_preview
+let flapPreviewMesh = null;
+let flapPreviewToken = 0;
+
+function pickFlapSite(hit) {
+    if(!tileSet) return;
+    const local = tileSet.group.worldToLocal(hit.point.clone());
+    // Inside the flattened patch the template just moves there
+    const flat = flapPatch ? surfaceToFlat(local) : null;
+    if(flat) {
+        flapTemplate.offset = flat;
+        updateFlapOutline();
+        return;
+    }
+    flapPick = { center: local.toArray(), seq: Date.now() };
+    document.getElementById('info-hud').innerText = "Flattening the skin around the site...";
+    pushState();
+}
+
+function setFlapSite(site) {
+    flapSite = site || null;
+    if(!flapSite) {
+        ++flapToken;
+        flapPatch = null;
+        updateFlapOutline();
+        showFlapPreview(null);
+        return;
+    }
+    if(flapPatch && flapPatch.url === flapSite.url) {
+        updateFlapOutline();
+        return;
+    }
+    const token = ++flapToken;
+    fetch(flapSite.url)
+        .then(response => {
+            if(!response.ok) throw new Error(response.status);
+            return response.arrayBuffer();
+        })
+        .then(buffer => {
+            if(token !== flapToken) return;
+            flapPatch = parseFlapPatch(flapSite.url, buffer);
+            flapTemplate.offset = [0, 0];
+            updateFlapOutline();
+            showFlapPreview(flapPreview);
+        })
+        .catch(err => console.warn('Flap site failed to load', err));
+}
+
+// uint32 vertex and face counts, float32 positions, float32 uv, uint32 indices
+function parseFlapPatch(url, buffer) {
+    const [vertexCount, faceCount] = new Uint32Array(buffer, 0, 2);
+    const positions = new Float32Array(buffer, 8, vertexCount * 3);
+    const uv = new Float32Array(buffer, 8 + vertexCount * 12, vertexCount * 2);
+    const index = new Uint32Array(buffer, 8 + vertexCount * 20, faceCount * 3);
+
+    let minU = Infinity, minV = Infinity, maxU = -Infinity, maxV = -Infinity;
+    for(let i = 0; i < vertexCount; i++) {
+        minU = Math.min(minU, uv[2 * i]); maxU = Math.max(maxU, uv[2 * i]);
+        minV = Math.min(minV, uv[2 * i + 1]); maxV = Math.max(maxV, uv[2 * i + 1]);
+    }
+    // Uniform grid over the flat triangles, about four per cell
+    const cell = Math.sqrt(Math.max((maxU - minU) * (maxV - minV), 1e-12) / Math.max(faceCount, 1)) * 2;
+    const columns = Math.max(1, Math.ceil((maxU - minU) / cell));
+    const rows = Math.max(1, Math.ceil((maxV - minV) / cell));
+    const cells = Array.from({ length: columns * rows }, () => []);
+    const ratio = new Float32Array(faceCount);
+    let edgeSum = 0;
+    const a = new THREE.Vector3(), b = new THREE.Vector3(), c = new THREE.Vector3();
+    for(let t = 0; t < faceCount; t++) {
+        const i0 = index[3 * t], i1 = index[3 * t + 1], i2 = index[3 * t + 2];
+        a.fromArray(positions, 3 * i0);
+        b.fromArray(positions, 3 * i1);
+        c.fromArray(positions, 3 * i2);
+        edgeSum += a.distanceTo(b);
+        const skin = b.sub(a).cross(c.sub(a)).length();
+        const du1 = uv[2 * i1] - uv[2 * i0], dv1 = uv[2 * i1 + 1] - uv[2 * i0 + 1];
+        const du2 = uv[2 * i2] - uv[2 * i0], dv2 = uv[2 * i2 + 1] - uv[2 * i0 + 1];
+        const flat = Math.abs(du1 * dv2 - dv1 * du2);
+        ratio[t] = flat > 0 ? skin / flat : 1;
+
+        const u0 = Math.min(uv[2 * i0], uv[2 * i1], uv[2 * i2]), u1 = Math.max(uv[2 * i0], uv[2 * i1], uv[2 * i2]);
+        const v0 = Math.min(uv[2 * i0 + 1], uv[2 * i1 + 1], uv[2 * i2 + 1]), v1 = Math.max(uv[2 * i0 + 1], uv[2 * i1 + 1], uv[2 * i2 + 1]);
+        const cx0 = Math.floor((u0 - minU) / cell), cx1 = Math.min(columns - 1, Math.floor((u1 - minU) / cell));
+        const cy0 = Math.floor((v0 - minV) / cell), cy1 = Math.min(rows - 1, Math.floor((v1 - minV) / cell));
+        for(let y = cy0; y <= cy1; y++) {
+            for(let x = cx0; x <= cx1; x++) cells[y * columns + x].push(t);
+        }
+    }
+    return {
+        url: url,
+        positions: positions,
+        uv: uv,
+        index: index,
+        ratio: ratio,
+        grid: { minU: minU, minV: minV, cell: cell, columns: columns, rows: rows, cells: cells },
+        tree: new PointTree(positions),
+        edge: faceCount > 0 ? edgeSum / faceCount : 0
+    };
+}
+
+// Triangle and barycentric weights of a flat point, or null outside the patch
+function locateFlat(u, v) {
+    const { minU, minV, cell, columns, rows, cells } = flapPatch.grid;
+    const x = Math.floor((u - minU) / cell), y = Math.floor((v - minV) / cell);
+    if(x < 0 || y < 0 || x >= columns || y >= rows) return null;
+    const uv = flapPatch.uv, index = flapPatch.index;
+    for(const t of cells[y * columns + x]) {
+        const i0 = 2 * index[3 * t], i1 = 2 * index[3 * t + 1], i2 = 2 * index[3 * t + 2];
+        const du1 = uv[i1] - uv[i0], dv1 = uv[i1 + 1] - uv[i0 + 1];
+        const du2 = uv[i2] - uv[i0], dv2 = uv[i2 + 1] - uv[i0 + 1];
+        const det = du1 * dv2 - dv1 * du2;
+        if(det === 0) continue;
+        const pu = u - uv[i0], pv = v - uv[i0 + 1];
+        const w1 = (pu * dv2 - pv * du2) / det;
+        const w2 = (du1 * pv - dv1 * pu) / det;
+        if(w1 >= -1e-6 && w2 >= -1e-6 && w1 + w2 <= 1 + 1e-6) return { t: t, w1: w1, w2: w2 };
+    }
+    return null;
+}
+
+// Flat point → world position on the skin, or null outside the patch
+function flatToWorld(u, v) {
+    const hit = locateFlat(u, v);
+    if(!hit) return null;
+    const p = flapPatch.positions, index = flapPatch.index;
+    const i0 = 3 * index[3 * hit.t], i1 = 3 * index[3 * hit.t + 1], i2 = 3 * index[3 * hit.t + 2];
+    const w0 = 1 - hit.w1 - hit.w2;
+    return tileSet.group.localToWorld(new THREE.Vector3(
+        w0 * p[i0] + hit.w1 * p[i1] + hit.w2 * p[i2],
+        w0 * p[i0 + 1] + hit.w1 * p[i1 + 1] + hit.w2 * p[i2 + 1],
+        w0 * p[i0 + 2] + hit.w1 * p[i1 + 2] + hit.w2 * p[i2 + 2]));
+}
+
+// Tile-space skin point → flat coordinates of the nearest patch vertex, or null off the patch
+function surfaceToFlat(local) {
+    const nearest = flapPatch.tree.nearest(local.x, local.y, local.z, flapPatch.edge * 2);
+    return nearest < 0 ? null : [flapPatch.uv[2 * nearest], flapPatch.uv[2 * nearest + 1]];
+}
+
+function insideFlat(polygon, u, v) {
+    let inside = false;
+    for(let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
+        const [ui, vi] = polygon[i], [uj, vj] = polygon[j];
+        if((vi > v) !== (vj > v) && u < ui + (v - vi) * (uj - ui) / (vj - vi)) inside = !inside;
+    }
+    return inside;
+}
+
+// Skin area (model units²) inside a flat polygon, by grid sampling
+function flatSkinArea(polygon) {
+    let u0 = Infinity, v0 = Infinity, u1 = -Infinity, v1 = -Infinity;
+    polygon.forEach(([u, v]) => {
+        u0 = Math.min(u0, u); u1 = Math.max(u1, u);
+        v0 = Math.min(v0, v); v1 = Math.max(v1, v);
+    });
+    const h = Math.sqrt((u1 - u0) * (v1 - v0) / FLAP_AREA_SAMPLES);
+    if(!(h > 0)) return 0;
+    let area = 0;
+    for(let v = v0 + h / 2; v < v1; v += h) {
+        for(let u = u0 + h / 2; u < u1; u += h) {
+            if(!insideFlat(polygon, u, v)) continue;
+            const hit = locateFlat(u, v);
+            area += h * h * (hit ? flapPatch.ratio[hit.t] : 1);
+        }
+    }
+    return area;
+}
+
+// Re-map the current template onto the skin; cheap enough for every slider step
+function updateFlapOutline() {
+    gpu.disposeObject(flapOutline);
+    flapOutline = null;
+    flapPaths = [];
+    if(flapPatch && tileSet) {
+        const size = flapTemplate.sizeMm / scaleFactor;
+        const angle = flapTemplate.rotation * Math.PI / 180;
+        const cos = Math.cos(angle), sin = Math.sin(angle);
+        const [ou, ov] = flapTemplate.offset;
+        const segments = [];
+        FLAP_TEMPLATES[flapTemplate.type]().forEach(path => {
+            const flat = path.points.map(([x, y]) => [ou + size * (x * cos - y * sin), ov + size * (x * sin + y * cos)]);
+            const points = [];
+            flat.forEach((a, i) => {
+                const b = flat[(i + 1) % flat.length];
+                const steps = Math.max(1, Math.ceil(Math.hypot(b[0] - a[0], b[1] - a[1]) / size * FLAP_OUTLINE_STEPS));
+                for(let s = 0; s < steps; s++) {
+                    const t = s / steps;
+                    points.push(flatToWorld(a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t));
+                }
+            });
+            points.forEach((p, i) => {
+                const q = points[(i + 1) % points.length];
+                if(p && q) segments.push(p, q);
+            });
+            flapPaths.push({ name: path.name, flat: flat, points: points, area: flatSkinArea(flat) });
+        });
+        if(segments.length > 0) {
+            const geometry = new THREE.BufferGeometry().setFromPoints(segments);
+            flapOutline = new THREE.LineSegments(gpu.track(geometry),
+                gpu.track(new THREE.LineBasicMaterial({ color: FLAP_COLOR, depthTest: false })));
+            flapOutline.renderOrder = 999;
+            flapOutline.raycast = () => {};
+            scene.add(flapOutline);
+        }
+    }
+    updateFlapMotion();
+    placeFlapPreview();
+    if(currentTool === 'flap') {
+        document.getElementById('measure-value').innerText = flapPaths.length
+            ? flapPaths.map(p => p.name + ' ' + toCalibrated('area', p.area).toFixed(1)).join(' · ') + ' mm²'
+            : '-';
+    }
+}
+
+// Motion of the current template at the slider's fraction, in flat coordinates
+function updateFlapMotion() {
+    let motion = null;
+    if(flapPatch && flapTemplate.transpose > 0 && flapPaths.length > 1) {
+        const size = flapTemplate.sizeMm / scaleFactor;
+        const angle = flapTemplate.rotation * Math.PI / 180;
+        const cos = Math.cos(angle), sin = Math.sin(angle);
+        const [ou, ov] = flapTemplate.offset;
+        const full = FLAP_MOTIONS[flapTemplate.type];
+        const round = p => p.map(c => Math.round(c * 1e4) / 1e4);
+        const [px, py] = full.pivot, [sx, sy] = full.shift;
+        const t = flapTemplate.transpose;
+        motion = {
+            site: flapSite.url,
+            defect: flapPaths[0].flat.map(round),
+            flaps: flapPaths.slice(1).map(p => p.flat.map(round)),
+            pivot: round([ou + size * (px * cos - py * sin), ov + size * (px * sin + py * cos)]),
+            angle: Math.round(full.angle * t * 100) / 100,
+            shift: round([t * size * (sx * cos - sy * sin), t * size * (sx * sin + sy * cos)])
+        };
+    }
+    if(JSON.stringify(motion) === JSON.stringify(flapMotion)) return;
+    flapMotion = motion;
+    if(!motion) showFlapPreview(null);
+    pushState();
+}
+
+function setFlapPreview(preview) {
+    flapPreview = preview || null;
+    showFlapPreview(flapPreview);
+}
+
+// uint32 moved count, float32 scale, uint32 vertex indices, int16 xyz deltas
+function showFlapPreview(preview) {
+    const token = ++flapPreviewToken;
+    if(!preview || !flapPatch || !flapMotion || preview.site !== flapPatch.url) {
+        gpu.disposeObject(flapPreviewMesh);
+        flapPreviewMesh = null;
+        return;
+    }
+    fetch(preview.url)
+        .then(response => {
+            if(!response.ok) throw new Error(response.status);
+            return response.arrayBuffer();
+        })
+        .then(buffer => {
+            if(token !== flapPreviewToken || !flapPatch) return;
+            const moved = new Uint32Array(buffer, 0, 1)[0];
+            const scale = new Float32Array(buffer, 4, 1)[0];
+            const index = new Uint32Array(buffer, 8, moved);
+            const deltas = new Int16Array(buffer, 8 + moved * 4, moved * 3);
+            buildFlapPreview(index, deltas, scale, preview.defect);
+        })
+        .catch(err => console.warn('Flap preview failed to load', err));
+}
+
+// The patch with its deltas applied and the defect cut out, orange where it moved most
+function buildFlapPreview(moved, deltas, scale, defect) {
+    gpu.disposeObject(flapPreviewMesh);
+    const positions = new Float32Array(flapPatch.positions);
+    const shift = new Float32Array(positions.length / 3);
+    let peak = 0;
+    for(let k = 0; k < moved.length; k++) {
+        const i = moved[k];
+        const dx = deltas[3 * k] * scale, dy = deltas[3 * k + 1] * scale, dz = deltas[3 * k + 2] * scale;
+        positions[3 * i] += dx;
+        positions[3 * i + 1] += dy;
+        positions[3 * i + 2] += dz;
+        shift[i] = Math.hypot(dx, dy, dz);
+        peak = Math.max(peak, shift[i]);
+    }
+    const colors = new Float32Array(positions.length);
+    for(let i = 0; i < shift.length; i++) {
+        const s = peak > 0 ? shift[i] / peak : 0;
+        colors[3 * i] = 0.95;
+        colors[3 * i + 1] = 0.95 - 0.5 * s;
+        colors[3 * i + 2] = 0.95 - 0.85 * s;
+    }
+    const uv = flapPatch.uv, index = flapPatch.index;
+    const kept = [];
+    for(let t = 0; t < index.length / 3; t++) {
+        const a = index[3 * t], b = index[3 * t + 1], c = index[3 * t + 2];
+        const u = (uv[2 * a] + uv[2 * b] + uv[2 * c]) / 3, v = (uv[2 * a + 1] + uv[2 * b + 1] + uv[2 * c + 1]) / 3;
+        if(!insideFlat(defect, u, v)) kept.push(a, b, c);
+    }
+    const geometry = new THREE.BufferGeometry();
+    geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+    geometry.setAttribute('color', new THREE.BufferAttribute(colors, 3));
+    geometry.setIndex(kept);
+    flapPreviewMesh = new THREE.Mesh(gpu.track(geometry), gpu.track(new THREE.MeshBasicMaterial({
+        vertexColors: true, side: THREE.DoubleSide, polygonOffset: true, polygonOffsetFactor: -2
+    })));
+    flapPreviewMesh.matrixAutoUpdate = false;
+    flapPreviewMesh.raycast = () => {};
+    scene.add(flapPreviewMesh);
+    placeFlapPreview();
+}
+
+// The patch is in tile space; follow the scan group
+function placeFlapPreview() {
+    if(!flapPreviewMesh || !tileSet) return;
+    flapPreviewMesh.matrix.copy(tileSet.group.matrixWorld);
+    flapPreviewMesh.matrixWorldNeedsUpdate = true;
+}
+
+window.updateFlapTemplate = function() {
+    flapTemplate.type = document.getElementById('p-flap-type').value;
+    flapTemplate.sizeMm = parseFloat(document.getElementById('p-flap-size').value);
+    flapTemplate.rotation = parseFloat(document.getElementById('p-flap-rotation').value);
+    flapTemplate.transpose = parseFloat(document.getElementById('p-flap-transpose').value) / 100;
+    document.getElementById('flap-transpose-val').innerText = Math.round(flapTemplate.transpose * 100) + '%';
+    document.getElementById('flap-size-val').innerText = flapTemplate.sizeMm.toFixed(1);
+    document.getElementById('flap-rotation-val').innerText = flapTemplate.rotation.toFixed(0) + '°';
+    updateFlapOutline();
+}
+
+// Turn the outline into surface markings, one area measurement per closed path
+window.placeFlap = function() {
+    flapPaths.forEach(path => {
+        const points = path.points.filter(p => p);
+        if(points.length < 3) return;
+        const loop = points.concat([points[0]]);
+        const tube = buildStrokeTube(loop);
+        scene.add(tube);
+        drawnObjects.push(tube);
+
+        const center = points.reduce((sum, p) => sum.add(p), new THREE.Vector3()).divideScalar(points.length);
+        const measurement = recordMeasurement('area', path.area, [center]);
+        measurement.loop = loop.map(p => p.clone());
+        measurement.labelData = createFloatingLabel(center, formatMeasurement(measurement), 'area');
+        measurement.labelData.relatedObjects = [tube];
+    });
+}
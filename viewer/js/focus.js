@@ -0,0 +1,47 @@
+// --- FOCUS REGION (ROI) ---
+// The focus tool picks the surgical site. The pick goes to Python in the
+// component value; the server re-meshes the scan with full density inside
+// the region and a decimated periphery, and sends the region back as
+// args.focus so it can be outlined here. Centres are exchanged in the
+// uploaded scan's own coordinates (manifest meta.origin + tile space), which
+// do not depend on the region itself.
+let focusPick = null;    // { center, seq } last pick, sent with the component value
+let focusRegion = null;  // { center, radius } the current scan was processed with
+let focusOutline = null;
+
+function scanMeta() {
+    return (tileSet && tileSet.manifest.meta) || {};
+}
+
+function pickFocusCenter(hit) {
+    if(!tileSet) return;
+    const origin = scanMeta().origin || [0, 0, 0];
+    const local = tileSet.group.worldToLocal(hit.point.clone());
+    focusPick = {
+        center: local.toArray().map((c, i) => c + origin[i]),
+        seq: Date.now() // unique across page reloads too
+    };
+    document.getElementById('info-hud').innerText = "Re-meshing around the selected site...";
+    pushState();
+}
+
+function setFocusRegion(region) {
+    focusRegion = region || null;
+    updateFocusOutline();
+}
+
+// Wire sphere around the region; rebuilt when the region or the scan changes
+function updateFocusOutline() {
+    gpu.disposeObject(focusOutline);
+    focusOutline = null;
+    if(!focusRegion || !tileSet) return;
+    const origin = scanMeta().origin || [0, 0, 0];
+    const center = new THREE.Vector3().fromArray(focusRegion.center.map((c, i) => c - origin[i]));
+    focusOutline = new THREE.Mesh(
+        gpu.track(new THREE.SphereGeometry(focusRegion.radius, 24, 16)),
+        gpu.track(new THREE.MeshBasicMaterial({ color: 0x00e5ff, wireframe: true, transparent: true, opacity: 0.25, depthWrite: false }))
+    );
+    focusOutline.position.copy(tileSet.group.localToWorld(center));
+    focusOutline.raycast = () => {};
+    scene.add(focusOutline);
+}
@@ -0,0 +1,115 @@
+// --- HEATMAP ---
+// Signed per-vertex fields computed in Python (distance to the registered
+// follow-up scan, left/right asymmetry) arrive as int8 scalar layers, one
+// byte per tile vertex. The tiles swap to a diverging colour map while one
+// is shown: white = no difference, red = more, blue = less, full colour at
+// ±display.
+let heatmapLayer = null;    // { url, range, display } from args.heatmap
+let heatmapValues = null;   // Int8Array of the loaded layer
+let heatmapUrl = null;
+let heatmapToken = 0;
+let heatmapMaterial = null;
+
+function getHeatmapMaterial() {
+    if(!heatmapMaterial) {
+        heatmapMaterial = gpu.track(new THREE.ShaderMaterial({
+            uniforms: { gain: { value: 1 }, paintMap: { value: null }, paintMix: { value: 0 } },
+            side: THREE.DoubleSide,
+            vertexShader: [
+                'attribute float scalar;',
+                'varying float vScalar;',
+                'varying vec2 vUv;',
+                'void main() {',
+                '    vScalar = scalar;',
+                '    vUv = uv;',
+                '    gl_Position = projectionMatrix * modelViewMatrix * vec4( position, 1.0 );',
+                '}'
+            ].join('\n'),
+            fragmentShader: [
+                'uniform float gain;',
+                'uniform sampler2D paintMap;',
+                'uniform float paintMix;',
+                'varying float vScalar;',
+                'varying vec2 vUv;',
+                'void main() {',
+                '    float s = clamp( vScalar * gain, -1.0, 1.0 );',
+                '    vec3 color = s < 0.0 ? mix( vec3( 0.95 ), vec3( 0.13, 0.4, 0.9 ), -s )',
+                '                         : mix( vec3( 0.95 ), vec3( 0.9, 0.15, 0.12 ), s );',
+                '    vec4 paintTexel = texture2D( paintMap, vUv );',
+                '    color = mix( color, paintTexel.rgb, paintTexel.a * paintMix );',
+                '    gl_FragColor = vec4( color, 1.0 );',
+                '}'
+            ].join('\n')
+        }));
+    }
+    blendHeatmapPaint();
+    return heatmapMaterial;
+}
+
+// Texture-space markings (paint.js) stay visible over the heatmap, blended
+// like the scan material does while the paint layer is attached to the scan
+function blendHeatmapPaint() {
+    if(!heatmapMaterial) return;
+    const attached = !!(paintLayer && paintLayer.attached);
+    heatmapMaterial.uniforms.paintMap.value = attached ? paintLayer.texture : null;
+    heatmapMaterial.uniforms.paintMix.value = attached ? 1 : 0;
+}
+
+function showHeatmap(layer) {
+    heatmapLayer = layer;
+    if(!tileSet) return;
+    if(!layer) {
+        ++heatmapToken;
+        if(tileSet.scalars) tileSet.setScalars(null, null);
+        return;
+    }
+    // Stored values are value / range; the colour map saturates at ±display
+    const material = getHeatmapMaterial();
+    material.uniforms.gain.value = layer.range / layer.display;
+    if(layer.url === heatmapUrl) {
+        if(tileSet.scalars !== heatmapValues) tileSet.setScalars(heatmapValues, material);
+        return;
+    }
+
+    const token = ++heatmapToken;
+    fetch(layer.url)
+        .then(response => {
+            if(!response.ok) throw new Error(response.status);
+            return response.arrayBuffer();
+        })
+        .then(buffer => {
+            if(token !== heatmapToken) return;
+            heatmapUrl = layer.url;
+            heatmapValues = new Int8Array(buffer);
+            if(tileSet && heatmapLayer) tileSet.setScalars(heatmapValues, material);
+        })
+        .catch(err => console.warn('Heatmap layer failed to load', err));
+}
+
+// --- SYMMETRY PLANE ---
+// Mid-sagittal plane fitted in Python, drawn as a translucent square
+// through the scan (point and normal in tile space).
+let symmetryPlane = null;
+let symmetryOutline = null;
+
+function setSymmetryPlane(plane) {
+    symmetryPlane = plane || null;
+    updateSymmetryOutline();
+}
+
+function updateSymmetryOutline() {
+    gpu.disposeObject(symmetryOutline);
+    symmetryOutline = null;
+    if(!symmetryPlane || !tileSet) return;
+    const box = tileSetBox(tileSet.manifest);
+    const size = box.getSize(new THREE.Vector3()).length();
+    symmetryOutline = new THREE.Mesh(
+        gpu.track(new THREE.PlaneGeometry(size, size)),
+        gpu.track(new THREE.MeshBasicMaterial({ color: 0xffeb3b, transparent: true, opacity: 0.15, side: THREE.DoubleSide, depthWrite: false }))
+    );
+    const normal = new THREE.Vector3().fromArray(symmetryPlane.normal);
+    symmetryOutline.quaternion.setFromUnitVectors(new THREE.Vector3(0, 0, 1), normal);
+    symmetryOutline.position.copy(tileSet.group.localToWorld(new THREE.Vector3().fromArray(symmetryPlane.point)));
+    symmetryOutline.raycast = () => {};
+    scene.add(symmetryOutline);
+}
@@ -0,0 +1,78 @@
+// --- POINTER INPUT SCHEDULER ---
+// Pointer moves only queue samples (including the coalesced ones a pen
+// delivers at 120-240 Hz between frames). Once per animation frame the queue
+// is resolved in a single raycast pass shared by the eraser cursor, the brush
+// and the eraser, so no sample is dropped and no ray is cast twice.
+const INPUT_MIN_SPACING = 1.5;   // px between samples that are worth a ray
+const INPUT_MAX_RAYS = 24;       // per frame; beyond this samples are thinned evenly
+const INPUT_GAP_PROJECT = 12;    // px gap between two brush samples that still needs surface projection
+
+let pointerQueue = [];
+let lastStrokeSample = null;     // { x, y } screen position of the last resolved brush sample
+
+function queuePointer(event) {
+    const coalesced = event.getCoalescedEvents ? event.getCoalescedEvents() : [];
+    const samples = coalesced.length > 0 ? coalesced : [event];
+    samples.forEach(e => pointerQueue.push({ x: e.clientX, y: e.clientY }));
+}
+
+// Hover samples queued before the press are not part of the stroke
+function startPointerStroke(event) {
+    pointerQueue = [];
+    lastStrokeSample = { x: event.clientX, y: event.clientY };
+}
+
+// Keep samples at least INPUT_MIN_SPACING apart, then thin to the ray cap
+function selectSamples(samples) {
+    const kept = [samples[0]];
+    for(let i = 1; i < samples.length; i++) {
+        const last = kept[kept.length - 1];
+        if(Math.hypot(samples[i].x - last.x, samples[i].y - last.y) >= INPUT_MIN_SPACING) kept.push(samples[i]);
+    }
+    if(kept.length <= INPUT_MAX_RAYS) return kept;
+    const step = (kept.length - 1) / (INPUT_MAX_RAYS - 1);
+    return Array.from({ length: INPUT_MAX_RAYS }, (_, i) => kept[Math.round(i * step)]);
+}
+
+function castSample(sample, rect) {
+    mouse.x = ((sample.x - rect.left) / rect.width) * 2 - 1;
+    mouse.y = -((sample.y - rect.top) / rect.height) * 2 + 1;
+    raycaster.setFromCamera(mouse, camera);
+    const hits = raycaster.intersectObject(targetObject, true);
+    return hits.length > 0 ? hits[0] : null;
+}
+
+// Called once per frame from animate()
+function processPointerQueue() {
+    if(pointerQueue.length === 0) return;
+    const queued = pointerQueue;
+    pointerQueue = [];
+    if(!targetObject) return;
+
+    const stroking = isDrawing || isErasing;
+    const cursor = currentTool === 'eraser' && eraserCursor;
+    if(!stroking && !cursor) return;
+
+    // Hovering only needs the newest position
+    const samples = stroking ? selectSamples(queued) : [queued[queued.length - 1]];
+    const rect = renderer.domElement.getBoundingClientRect();
+    let lastHit = null;
+    let strokeChanged = false;
+
+    samples.forEach(sample => {
+        const hit = castSample(sample, rect);
+        if(!hit) return;
+        lastHit = hit;
+        if(stroking && handleStrokeSample(hit, sample)) strokeChanged = true;
+    });
+
+    // Everything the eraser passed over this frame goes in one picking pass
+    flushErase();
+
+    if(cursor) {
+        eraserCursor.visible = lastHit !== null;
+        if(lastHit) eraserCursor.position.copy(getOffsetPoint(lastHit));
+    }
+    // The tube is rebuilt once per frame, not once per sample
+    if(strokeChanged && !paintStroke) updateBrushStroke();
+}
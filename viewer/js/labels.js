@@ -0,0 +1,284 @@
+function toScreenPosition(point3D) {
+    const vector = point3D.clone();
+    vector.project(camera);
+
+    const rect = renderer.domElement.getBoundingClientRect();
+    return {
+        x: (vector.x + 1) / 2 * rect.width + rect.left,
+        y: -(vector.y - 1) / 2 * rect.height + rect.top
+    };
+}
+
+// --- FLOATING LABELS (DRAGGABLE & DELETABLE) ---
+function createFloatingLabel(point3D, text, type) {
+    const label = document.createElement('div');
+    label.className = `floating-label ${type}`;
+
+    const textSpan = document.createElement('span');
+    textSpan.innerText = text;
+
+    const closeBtn = document.createElement('button');
+    closeBtn.className = 'label-close-btn';
+    closeBtn.innerHTML = '×';
+    closeBtn.title = 'Delete measurement';
+
+    label.appendChild(textSpan);
+    label.appendChild(closeBtn);
+
+    document.body.appendChild(label);
+
+    const labelData = {
+        element: label,
+        point3D: point3D.clone(),
+        text: text,
+        textSpan: textSpan,
+        type: type,
+        offsetX: 0,
+        offsetY: -30,
+        relatedObjects: [] // Store related line/mesh objects
+    };
+
+    floatingLabels.push(labelData);
+
+    // 1. Mouse (Máy tính)
+    label.addEventListener('mousedown', (e) => {
+        if(e.target === closeBtn) return;
+        e.preventDefault();
+        e.stopPropagation();
+        draggedLabel = labelData;
+        labelDragOffset.x = e.clientX - parseFloat(label.style.left);
+        labelDragOffset.y = e.clientY - parseFloat(label.style.top);
+    });
+
+    // 2. Touch (iPad/Điện thoại) - ĐANG THIẾU CÁI NÀY
+    label.addEventListener('touchstart', (e) => {
+        if(e.target === closeBtn) return;
+        e.preventDefault();
+        e.stopPropagation();
+        const touch = e.touches[0];
+        draggedLabel = labelData;
+        // Lấy vị trí hiện tại của nhãn
+        const currentLeft = parseFloat(label.style.left) || 0;
+        const currentTop = parseFloat(label.style.top) || 0;
+        labelDragOffset.x = touch.clientX - currentLeft;
+        labelDragOffset.y = touch.clientY - currentTop;
+    }, { passive: false });
+
+    // Delete functionality
+    const handleDelete = (e) => {
+        e.preventDefault();
+        e.stopPropagation(); // Chặn ngay lập tức, không cho sự kiện lan xuống nhãn
+        deleteFloatingLabel(labelData);
+        draggedLabel = null; // Ngắt trạng thái kéo nếu có lỡ kích hoạt
+    };
+
+    closeBtn.addEventListener('click', handleDelete);
+    // QUAN TRỌNG: Thêm touchstart để iPad nhận diện ngay lập tức
+    closeBtn.addEventListener('touchstart', handleDelete, { passive: false });
+
+    function updatePosition() {
+        if(!label.parentElement) return;
+        const pos = toScreenPosition(point3D);
+        label.style.left = (pos.x + labelData.offsetX) + 'px';
+        label.style.top = (pos.y + labelData.offsetY) + 'px';
+        requestAnimationFrame(updatePosition);
+    }
+    updatePosition();
+
+    return labelData;
+}
+
+// --- GLOBAL DRAG HANDLERS (UPDATED: ANTI-STICKY LOGIC) ---
+
+// 1. Xử lý di chuyển cho LABEL (Floating Label)
+function handleLabelMove(clientX, clientY, event) {
+    if(draggedLabel) {
+        event.preventDefault();
+        event.stopPropagation();
+
+        const newX = clientX - labelDragOffset.x;
+        const newY = clientY - labelDragOffset.y;
+
+        draggedLabel.element.style.left = newX + 'px';
+        draggedLabel.element.style.top = newY + 'px';
+
+        // Cập nhật offset tương đối để xoay 3D vẫn chuẩn
+        const originalPos = toScreenPosition(draggedLabel.point3D);
+        draggedLabel.offsetX = newX - originalPos.x;
+        draggedLabel.offsetY = newY - originalPos.y;
+    }
+}
+
+// Sự kiện chuột
+document.addEventListener('mousemove', (e) => {
+    handleLabelMove(e.clientX, e.clientY, e);
+});
+
+// Sự kiện cảm ứng (iPad) - Thêm passive: false để chặn cuộn trang
+document.addEventListener('touchmove', (e) => {
+    if(draggedLabel) {
+        const touch = e.touches[0];
+        handleLabelMove(touch.clientX, touch.clientY, e);
+    }
+}, { passive: false });
+
+// 2. Xử lý thả tay (End/Drop) - GLOBAL KILL SWITCH
+// Hàm này sẽ ngắt mọi loại kéo thả (cả Label lẫn Annotation)
+function endAllDrags() {
+    // Ngắt Label
+    draggedLabel = null;
+
+    // Ngắt Annotation (nếu đang bị dính)
+    if (typeof isDraggingAnnotation !== 'undefined' && isDraggingAnnotation) {
+        isDraggingAnnotation = false;
+
+        // Reset lại style cho Annotation
+        if(draggedAnnotation) {
+            draggedAnnotation.label.style.zIndex = 1000;
+            draggedAnnotation = null;
+        }
+
+        // Trả lại quyền xoay 3D cho OrbitControls
+        if(controls && currentTool === 'view') {
+            controls.enabled = true;
+        }
+    }
+}
+
+// Bắt sự kiện trên toàn bộ cửa sổ (Window) để không bị sót
+window.addEventListener('mouseup', endAllDrags);
+window.addEventListener('touchend', endAllDrags);
+window.addEventListener('touchcancel', endAllDrags); // Quan trọng: Xử lý khi có noti/cuộc gọi làm ngắt touch
+window.addEventListener('blur', endAllDrags);        // Xử lý khi tab bị ẩn hoặc switch app
+
+function deleteFloatingLabel(labelData) {
+    // Remove label element
+    if(labelData.element && labelData.element.parentElement) {
+        labelData.element.remove();
+    }
+
+    // Remove related 3D objects (lines, meshes)
+    labelData.relatedObjects.forEach(obj => {
+        disposeDrawnObject(obj);
+
+        const index = drawnObjects.indexOf(obj);
+        if(index > -1) drawnObjects.splice(index, 1);
+    });
+
+    // Remove from floatingLabels array
+    const index = floatingLabels.indexOf(labelData);
+    if(index > -1) floatingLabels.splice(index, 1);
+
+    // Remove from measurements array
+    const measureIndex = measurements.findIndex(m => 
+        m.labelData === labelData
+    );
+    if(measureIndex > -1) measurements.splice(measureIndex, 1);
+    pushState();
+}
+
+// --- MEASUREMENT RECORDS ---
+// Values are kept in model units and converted on display, so a new
+// calibration from the sidebar only has to relabel what is on screen.
+const MEASUREMENT_UNITS = { distance: 'mm', angle: '°', area: 'mm²', profile: 'mm' };
+
+function toCalibrated(type, rawValue) {
+    if(type === 'distance' || type === 'profile') return rawValue * scaleFactor;
+    if(type === 'area') return rawValue * scaleFactor * scaleFactor;
+    return rawValue; // Angles do not depend on scale
+}
+
+function formatMeasurement(m) {
+    if(m.type === 'distance') return m.value.toFixed(2) + ' mm';
+    if(m.type === 'angle') return '∠' + m.value.toFixed(1) + '°';
+    if(m.type === 'profile') return '⌒ ' + m.value.toFixed(2) + ' mm';
+    const area = m.value.toFixed(1) + ' mm²';
+    if(!m.enclosed) return area;
+    // Enclosed volume in model units³: + skin raised above the loop's plane, − sunken below it
+    const volume = m.enclosed.volume * scaleFactor * scaleFactor * scaleFactor;
+    return area + ' · ' + (volume >= 0 ? '+' : '') + volume.toFixed(1) + ' mm³';
+}
+
+function relabelMeasurement(m) {
+    if(!m.labelData) return;
+    m.labelData.text = formatMeasurement(m);
+    m.labelData.textSpan.innerText = m.labelData.text;
+}
+
+// Python answers closed area loops with { id, volume, area, peak } (args.enclosed)
+let enclosedVolumes = null;
+function setEnclosedVolumes(volumes) {
+    enclosedVolumes = volumes || null;
+    const byId = new Map((volumes || []).map(v => [v.id, v]));
+    measurements.forEach(m => {
+        if(m.type !== 'area' || m.enclosed === byId.get(m.id)) return;
+        m.enclosed = byId.get(m.id);
+        relabelMeasurement(m);
+    });
+}
+
+function recordMeasurement(type, rawValue, points) {
+    const measurement = {
+        id: measurementCounter++,
+        type: type,
+        rawValue: rawValue,
+        value: toCalibrated(type, rawValue),
+        unit: MEASUREMENT_UNITS[type],
+        points: points.map(p => p.clone()),
+        labelData: null
+    };
+    measurements.push(measurement);
+    pushState();
+    return measurement;
+}
+
+function setScaleFactor(newScale) {
+    scaleFactor = newScale;
+    measurements.forEach(m => {
+        if(m.rawValue === undefined) return;
+        m.value = toCalibrated(m.type, m.rawValue);
+        relabelMeasurement(m);
+    });
+
+    const last = measurements.filter(m => m.type === currentTool).pop();
+    if(last) {
+        document.getElementById('measure-value').innerText = formatMeasurement(last).replace(/^[∠⌒] ?/, '');
+    }
+    pushState();
+}
+
+// Projects saved before raw values were stored only carry calibrated values
+function restoreMeasurements(saved, savedScale) {
+    const toVector = p => Array.isArray(p) ? new THREE.Vector3(p[0], p[1], p[2]) : new THREE.Vector3(p.x, p.y, p.z);
+    measurements = saved.map(m => {
+        let rawValue = m.raw_value;
+        if(rawValue === undefined) {
+            if(m.type === 'distance' || m.type === 'profile') rawValue = m.value / savedScale;
+            else if(m.type === 'area') rawValue = m.value / (savedScale * savedScale);
+            else rawValue = m.value;
+        }
+        return {
+            id: measurementCounter++,
+            type: m.type,
+            rawValue: rawValue,
+            value: m.value,
+            unit: MEASUREMENT_UNITS[m.type] || m.unit,
+            points: (m.points || []).map(toVector),
+            loop: m.loop ? m.loop.map(toVector) : null,
+            labelData: null
+        };
+    });
+    pushState();
+}
+
+function serializeMeasurements() {
+    return measurements.map(m => ({
+        id: m.id,
+        type: m.type,
+        value: m.value,
+        raw_value: m.rawValue,
+        unit: m.unit,
+        points: (m.points || []).map(p => [p.x, p.y, p.z]),
+        loop: m.loop ? m.loop.map(p => [p.x, p.y, p.z]) : undefined
+    }));
+}
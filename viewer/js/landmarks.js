@@ -0,0 +1,50 @@
+// --- LANDMARK CANDIDATES ---
+// Python finds facial landmarks (nasion, pronasale, alar bases, commissures)
+// and the strongest unnamed curvature peaks and pits once per scan and sends
+// them as args.landmarks in tile space. Named candidates are drawn as small
+// markers; distance, line and angle clicks near any candidate snap onto it
+// (snap.js), so a landmark takes one tap instead of several attempts.
+const LANDMARK_COLOR = 0xffc107;
+
+let landmarkSet = null;          // { named: [{ id, name, point }], extrema: [[x, y, z]] }
+let landmarkPool = null;
+let landmarkMarkers = [];
+let landmarkTargets = [];        // { name, position } in world space, named first
+let landmarkTrees = null;        // { named, extrema } PointTrees over the target positions
+
+function setLandmarks(landmarks) {
+    landmarkSet = landmarks || null;
+    updateLandmarkMarkers();
+}
+
+// Rebuilt when the candidates or the scan placement change
+function updateLandmarkMarkers() {
+    landmarkMarkers.forEach(releaseMarker);
+    landmarkMarkers = [];
+    landmarkTargets = [];
+    landmarkTrees = null;
+    if(!landmarkSet || !tileSet) return;
+    if(!landmarkPool) landmarkPool = new MarkerPool(1002);
+
+    const toWorld = p => tileSet.group.localToWorld(new THREE.Vector3().fromArray(p));
+    landmarkSet.named.forEach(m => {
+        const position = toWorld(m.point);
+        landmarkTargets.push({ name: m.name, position: position });
+        landmarkMarkers.push(landmarkPool.add(position, LANDMARK_COLOR, currentZoom * 0.0012));
+    });
+    landmarkSet.extrema.forEach(p => landmarkTargets.push({ name: null, position: toWorld(p) }));
+    const positions = landmarkTargets.map(t => t.position);
+    landmarkTrees = {
+        named: treeFromVectors(positions.slice(0, landmarkSet.named.length)),
+        extrema: treeFromVectors(positions.slice(landmarkSet.named.length))
+    };
+}
+
+// Nearest candidate within radius (world units), named landmarks first
+function snapToLandmark(point, radius) {
+    if(!landmarkTrees || radius <= 0) return null;
+    const named = landmarkTrees.named.nearest(point.x, point.y, point.z, radius);
+    if(named >= 0) return landmarkTargets[named];
+    const extremum = landmarkTrees.extrema.nearest(point.x, point.y, point.z, radius);
+    return extremum >= 0 ? landmarkTargets[landmarkSet.named.length + extremum] : null;
+}
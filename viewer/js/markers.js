@@ -0,0 +1,105 @@
+// --- INSTANCED MARKERS ---
+// Measurement markers and annotation pins share one unit sphere and are drawn
+// as slots of an InstancedMesh, so each pool costs a single draw call no
+// matter how many points are placed. Per-slot color and radius live in the
+// instance attributes; removing a marker frees its slot for reuse.
+const MARKER_GEOMETRY = new THREE.SphereGeometry(1, 16, 16);
+const HIDDEN_MATRIX = new THREE.Matrix4().makeScale(0, 0, 0);
+const _markerMatrix = new THREE.Matrix4();
+const _markerQuat = new THREE.Quaternion();
+const _markerScale = new THREE.Vector3();
+const _markerColor = new THREE.Color();
+
+class MarkerPool {
+    constructor(renderOrder, capacity = 32) {
+        this.renderOrder = renderOrder;
+        this.material = gpu.track(new THREE.MeshBasicMaterial({ color: 0xffffff, depthTest: false }));
+        this.slots = [];     // handle per slot, null when free
+        this.freeSlots = [];
+        this.mesh = null;
+        this.capacity = 0;
+        this.allocate(capacity);
+    }
+
+    allocate(capacity) {
+        const mesh = new THREE.InstancedMesh(MARKER_GEOMETRY, this.material, capacity);
+        mesh.instanceMatrix.setUsage(THREE.DynamicDrawUsage);
+        mesh.instanceColor = new THREE.InstancedBufferAttribute(new Float32Array(capacity * 3).fill(1), 3);
+        mesh.instanceColor.setUsage(THREE.DynamicDrawUsage);
+        mesh.renderOrder = this.renderOrder;
+        mesh.frustumCulled = false; // Bounds only cover the unit sphere, not the instances
+        mesh.count = 0;
+
+        if(this.mesh) {
+            // Grow: carry existing slots over and drop the old instance buffers
+            mesh.instanceMatrix.array.set(this.mesh.instanceMatrix.array);
+            mesh.instanceColor.array.set(this.mesh.instanceColor.array);
+            mesh.count = this.mesh.count;
+            scene.remove(this.mesh);
+            this.mesh.dispose();
+        }
+
+        this.mesh = mesh;
+        this.capacity = capacity;
+        scene.add(mesh);
+    }
+
+    add(position, color, radius) {
+        const slot = this.freeSlots.length > 0 ? this.freeSlots.pop() : this.mesh.count;
+        if(slot >= this.capacity) this.allocate(this.capacity * 2);
+        if(slot >= this.mesh.count) this.mesh.count = slot + 1;
+
+        const handle = {
+            isMarker: true,
+            pool: this,
+            slot: slot,
+            position: position.clone(),
+            color: color,
+            radius: radius
+        };
+        this.slots[slot] = handle;
+        this.write(handle);
+        return handle;
+    }
+
+    write(handle) {
+        _markerMatrix.compose(handle.position, _markerQuat, _markerScale.setScalar(handle.radius));
+        this.mesh.setMatrixAt(handle.slot, _markerMatrix);
+        this.mesh.setColorAt(handle.slot, _markerColor.setHex(handle.color));
+        this.mesh.instanceMatrix.needsUpdate = true;
+        this.mesh.instanceColor.needsUpdate = true;
+    }
+
+    remove(handle) {
+        if(this.slots[handle.slot] !== handle) return;
+        this.slots[handle.slot] = null;
+        this.mesh.setMatrixAt(handle.slot, HIDDEN_MATRIX);
+        this.mesh.instanceMatrix.needsUpdate = true;
+        this.freeSlots.push(handle.slot);
+
+        // Shrink the draw count while the tail is empty so freed slots cost nothing
+        let count = this.mesh.count;
+        while(count > 0 && !this.slots[count - 1]) count--;
+        if(count !== this.mesh.count) {
+            this.mesh.count = count;
+            this.freeSlots = this.freeSlots.filter(s => s < count);
+        }
+    }
+}
+
+let measureMarkerPool = null;
+let pinPool = null;
+
+function initMarkerPools() {
+    gpu.track(MARKER_GEOMETRY);
+    measureMarkerPool = new MarkerPool(1000);
+    pinPool = new MarkerPool(1001);
+}
+
+function addPin(point, color) {
+    return pinPool.add(point, color, currentZoom * 0.003);
+}
+
+function releaseMarker(handle) {
+    handle.pool.remove(handle);
+}
@@ -0,0 +1,175 @@
+// --- AREA CALCULATION (SKIN FLAP) ---
+function calculateArea(points3D) {
+    if (points3D.length < 3) return { value: 0, center: new THREE.Vector3() };
+
+    // 1. Tính vector pháp tuyến và tâm (Newell's method)
+    let normal = new THREE.Vector3();
+    let center = new THREE.Vector3();
+
+    for (let i = 0; i < points3D.length; i++) {
+        let j = (i + 1) % points3D.length;
+        normal.x += (points3D[i].y - points3D[j].y) * (points3D[i].z + points3D[j].z);
+        normal.y += (points3D[i].z - points3D[j].z) * (points3D[i].x + points3D[j].x);
+        normal.z += (points3D[i].x - points3D[j].x) * (points3D[i].y + points3D[j].y);
+        center.add(points3D[i]);
+    }
+    normal.normalize();
+    center.divideScalar(points3D.length);
+
+    // 2. Tạo Quaternion để xoay về mặt phẳng XY
+    const alignVector = new THREE.Vector3(0, 0, 1);
+    const quaternion = new THREE.Quaternion().setFromUnitVectors(normal, alignVector);
+
+    // 3. Chiếu điểm sang 2D
+    const points2D = points3D.map(p => {
+        const vec = p.clone().sub(center).applyQuaternion(quaternion);
+        return new THREE.Vector2(vec.x, vec.y);
+    });
+
+    // 4. Tính diện tích 2D (Shoelace formula)
+    const areaVirtual = THREE.ShapeUtils.area(points2D);
+
+    // 5. Đổi sang mm² thật
+    const areaRaw = Math.abs(areaVirtual);
+    const areaReal = toCalibrated('area', areaRaw);
+
+    return {
+        value: areaReal,
+        rawValue: areaRaw,
+        points2D: points2D,
+        center: center,
+        quaternion: quaternion
+    };
+}
+
+// Tô màu vùng đã chọn (Tạo Flap Mesh)
+function fillClosedLoop(points3D, areaData) {
+    const shape = new THREE.Shape(areaData.points2D);
+    const geometry = new THREE.ShapeGeometry(shape);
+    const mesh = new THREE.Mesh(gpu.track(geometry), markingMaterial(settings.color, 0.4, true));
+
+    // Xoay về vị trí 3D ban đầu
+    const invertQuat = areaData.quaternion.clone().invert();
+    mesh.quaternion.copy(invertQuat);
+    mesh.position.copy(areaData.center);
+
+    // Đẩy nhẹ lên bề mặt
+    const offsetVec = new THREE.Vector3(0, 0, currentZoom * 0.001);
+    offsetVec.applyQuaternion(invertQuat);
+    mesh.position.add(offsetVec);
+
+    mesh.renderOrder = 998;
+    scene.add(mesh);
+    drawnObjects.push(mesh);
+
+    return mesh;
+}
+
+function measureDistance(p1, p2) {
+    // Lưu vào measurements
+    const measurement = recordMeasurement('distance', p1.distanceTo(p2), [p1, p2]);
+    const distText = formatMeasurement(measurement);
+    document.getElementById('measure-value').innerText = distText;
+
+    const line = drawSurfaceLine(p1, p2);
+
+    // Tạo floating label
+    const midPoint = new THREE.Vector3().lerpVectors(p1, p2, 0.5);
+    const labelData = createFloatingLabel(midPoint, distText, 'distance');
+    labelData.relatedObjects = [line]; // Link line to label
+    measurement.labelData = labelData;
+
+    setTimeout(() => {
+        measureMarkers.forEach(releaseMarker);
+        measureMarkers = [];
+    }, 3000);
+}
+
+// --- ANGLE MEASUREMENT (CORRECTED: A-B-C LOGIC) ---
+// --- ANGLE MEASUREMENT (FIXED FOR PYTHON F-STRING) ---
+function handleAngleMeasurement(point) {
+    // 1. Tự động Reset: Nếu đã đo xong 3 điểm, chạm tiếp sẽ bắt đầu góc mới
+    if (measurePoints.length === 3) {
+        measureMarkers.forEach(releaseMarker);
+        measureMarkers = [];
+        measurePoints = [];
+        // Xóa đường line tạm cũ
+         if(window.tempAngleLines) {
+            window.tempAngleLines.forEach(l => {
+                gpu.disposeObject(l);
+                const index = drawnObjects.indexOf(l);
+                if(index > -1) drawnObjects.splice(index, 1);
+            });
+            window.tempAngleLines = [];
+        }
+        document.getElementById('measure-value').innerText = "0.0°";
+        document.getElementById('info-hud').innerText = "Starting new angle...";
+    }
+
+    // 2. CHỐNG TRÙNG ĐIỂM (QUAN TRỌNG CHO iPAD)
+    if (measurePoints.length > 0) {
+        const lastPoint = measurePoints[measurePoints.length - 1];
+        const dist = point.distanceTo(lastPoint);
+        // Ngưỡng lọc: khoảng 1% độ zoom hiện tại
+        if (dist < currentZoom * 0.01) { 
+            console.log("Ignored double tap");
+            return; 
+        }
+    }
+
+    measurePoints.push(point);
+
+    // --- Logic hiển thị màu và tính toán ---
+    let markerColor;
+    let isVertex = false;
+
+    if(measurePoints.length === 1) {
+        markerColor = 0x4CAF50; // A - Xanh lá
+        document.getElementById('info-hud').innerText = "Point A set. Click Vertex B (Đỉnh góc)";
+    }
+    else if(measurePoints.length === 2) {
+        markerColor = 0xFF0000; // B - Đỏ
+        isVertex = true;
+        document.getElementById('info-hud').innerText = "Vertex B set. Click Point C";
+
+        // Vẽ cạnh BA
+        const line1 = drawSurfaceLine(measurePoints[1], measurePoints[0]);
+        if(!window.tempAngleLines) window.tempAngleLines = [];
+        window.tempAngleLines.push(line1);
+    }
+    else if(measurePoints.length === 3) {
+        markerColor = 0x2196F3; // C - Xanh dương
+
+        const pointA = measurePoints[0];
+        const pointB = measurePoints[1];
+        const pointC = measurePoints[2];
+
+        const vectorBA = pointA.clone().sub(pointB).normalize();
+        const vectorBC = pointC.clone().sub(pointB).normalize();
+
+        const angleRad = vectorBA.angleTo(vectorBC);
+        const angleDeg = THREE.MathUtils.radToDeg(angleRad);
+        const angleText = angleDeg.toFixed(1) + '°';
+
+        document.getElementById('measure-value').innerText = angleText;
+        // Chú ý: Dùng ${ } cho biến JS trong chuỗi
+        document.getElementById('info-hud').innerText = `∠ABC = ${angleText} (Click to start new)`;
+
+        // Vẽ cạnh BC
+        const line2 = drawSurfaceLine(measurePoints[1], measurePoints[2]);
+        if(!window.tempAngleLines) window.tempAngleLines = [];
+        window.tempAngleLines.push(line2);
+
+        // Lưu vào báo cáo
+        const measurement = recordMeasurement('angle', angleDeg, [pointA, pointB, pointC]);
+
+        // Tạo nhãn kết quả
+        const labelData = createFloatingLabel(pointB, formatMeasurement(measurement), 'angle');
+        labelData.relatedObjects = [...window.tempAngleLines];
+        measurement.labelData = labelData;
+
+        window.tempAngleLines = [];
+    }
+
+    addMarker(point, markerColor, isVertex);
+}
@@ -0,0 +1,300 @@
+// --- TEXTURE-SPACE MARKING LAYER ---
+// Alternative marking engine: brush strokes, flap fills and the eraser paint
+// into a UV-space overlay canvas that the scan's own material blends over its
+// colour map. Marked area no longer adds meshes or draw calls, fills follow
+// the skin exactly, and after each change only the dirty rectangle of the
+// canvas is uploaded to the GPU.
+const PAINT_TEXTURE_SIZE = 2048;
+const PAINT_SEAM_FACTOR = 4; // UV jump longer than this × the expected length = UV seam, lift the pen
+
+const _paintA = new THREE.Vector3();
+const _paintB = new THREE.Vector3();
+const _paintC = new THREE.Vector3();
+const _paintUA = new THREE.Vector2();
+const _paintUB = new THREE.Vector2();
+const _paintUC = new THREE.Vector2();
+
+class PaintLayer {
+    constructor(size) {
+        this.size = size;
+        this.canvas = document.createElement('canvas');
+        this.canvas.width = this.canvas.height = size;
+        this.ctx = this.canvas.getContext('2d');
+        this.texture = new THREE.CanvasTexture(this.canvas);
+        this.texture.flipY = false;           // canvas row = v × size, so dirty rects map 1:1 to texels
+        this.texture.generateMipmaps = false; // partial uploads cannot refresh mip levels
+        this.texture.minFilter = THREE.LinearFilter;
+        this.uniform = { value: gpu.track(this.texture) };
+        this.records = [];    // strokes, fills and erase strokes in paint order
+        this.dirty = null;    // { x0, y0, x1, y1 } in texels
+        this.needsRedraw = false;
+        this.attached = false;
+    }
+
+    // Blend the layer into the scan material if the scan has UVs. Records belong
+    // to the previous scan's UV layout, so they are dropped unless the new
+    // tiles are the same scan re-meshed (focus region), which keeps its UVs.
+    attach(object, keepRecords = false) {
+        if(!keepRecords) {
+            // A record measured by a label (area fill) goes with its whole
+            // measurement, like the eraser does it
+            this.records.slice().forEach(r => {
+                const linkedLabel = findLinkedLabel(r);
+                if(linkedLabel) {
+                    deleteFloatingLabel(linkedLabel);
+                    return;
+                }
+                const index = drawnObjects.indexOf(r);
+                if(index > -1) drawnObjects.splice(index, 1);
+            });
+            this.records = [];
+        }
+        this.needsRedraw = true;
+
+        // All tiles of a scan share one material
+        const scan = object.userData.tileSet;
+        this.attached = !!(scan && scan.hasUV);
+        if(this.attached) this.patchMaterial(scan.material);
+        blendHeatmapPaint();
+        return this.attached;
+    }
+
+    patchMaterial(material) {
+        const uniform = this.uniform;
+        material.defines = Object.assign({}, material.defines, { USE_UV: '' });
+        material.onBeforeCompile = shader => {
+            shader.uniforms.paintMap = uniform;
+            // Canvas colours are used as-is, like the hex colours of the tube markings
+            shader.fragmentShader = shader.fragmentShader
+                .replace('void main() {', 'uniform sampler2D paintMap;\nvoid main() {')
+                .replace('#include <map_fragment>', [
+                    '#include <map_fragment>',
+                    'vec4 paintTexel = texture2D( paintMap, vUv );',
+                    'diffuseColor.rgb = mix( diffuseColor.rgb, paintTexel.rgb, paintTexel.a );'
+                ].join('\n'));
+        };
+        material.needsUpdate = true;
+    }
+
+    // Texels per world unit around a hit, from the UV/world area ratio of its
+    // triangle; null when the triangle is degenerate in either space
+    texelsPerUnit(hit) {
+        const geometry = hit.object.geometry;
+        const position = geometry.attributes.position;
+        const uv = geometry.attributes.uv;
+        const { a, b, c } = hit.face;
+        _paintA.fromBufferAttribute(position, a).applyMatrix4(hit.object.matrixWorld);
+        _paintB.fromBufferAttribute(position, b).applyMatrix4(hit.object.matrixWorld);
+        _paintC.fromBufferAttribute(position, c).applyMatrix4(hit.object.matrixWorld);
+        const worldArea = _paintB.sub(_paintA).cross(_paintC.sub(_paintA)).length() / 2;
+        _paintUA.fromBufferAttribute(uv, a);
+        _paintUB.fromBufferAttribute(uv, b).sub(_paintUA);
+        _paintUC.fromBufferAttribute(uv, c).sub(_paintUA);
+        const uvArea = Math.abs(_paintUB.cross(_paintUC)) / 2;
+        if(worldArea <= 0 || uvArea <= 0) return null;
+        return this.uvScale(hit) * Math.sqrt(uvArea / worldArea);
+    }
+
+    // Texels per raw UV unit: raycasts return normalized 16-bit UVs undecoded
+    uvScale(hit) {
+        const uv = hit.object.geometry.attributes.uv;
+        return uv.normalized ? this.size / 65535 : this.size;
+    }
+
+    // widthWorld is the full line width in model units
+    beginStroke(hit, color, opacity, widthWorld, erase = false) {
+        if(!hit.uv) return null;
+        const record = {
+            isPaint: true,
+            erase: erase,
+            fill: false,
+            color: color,
+            opacity: opacity,
+            width: 0,       // texels, set from the first hit with a usable density
+            widthWorld: widthWorld,
+            points: [],     // u, v in texels; null, null lifts the pen
+            density: null,  // texels per world unit at the last usable hit
+            last: null
+        };
+        this.records.push(record);
+        this.extendStroke(record, hit);
+        return record;
+    }
+
+    // Hits on degenerate triangles reuse the record's last density; until the
+    // stroke has reached a usable triangle they are skipped
+    extendStroke(record, hit) {
+        if(!hit.uv) return;
+        const density = this.texelsPerUnit(hit);
+        if(density !== null) {
+            if(record.density === null) record.width = Math.max(1, record.widthWorld * density);
+            record.density = density;
+        }
+        if(record.density === null) return;
+        const uvScale = this.uvScale(hit);
+        const u = hit.uv.x * uvScale;
+        const v = hit.uv.y * uvScale;
+        const last = record.last;
+        if(last) {
+            const expected = last.point.distanceTo(hit.point) * record.density;
+            if(Math.hypot(u - last.u, v - last.v) > expected * PAINT_SEAM_FACTOR + record.width) {
+                record.points.push(null, null);
+            }
+        }
+        record.points.push(u, v);
+        record.last = { u: u, v: v, point: hit.point.clone() };
+        this.drawRecord(record, record.points.length - 2);
+    }
+
+    // Fill the inside of a closed stroke; loops that cross a UV seam cannot be filled
+    fillStroke(record, opacity) {
+        if(record.points.includes(null) || record.points.length < 6) return null;
+        const fill = {
+            isPaint: true,
+            erase: false,
+            fill: true,
+            color: record.color,
+            opacity: opacity,
+            width: 0,
+            points: record.points.slice()
+        };
+        this.records.push(fill);
+        this.drawRecord(fill);
+        return fill;
+    }
+
+    // Draw a whole record, or only its newest segment when `from` is given
+    drawRecord(record, from = 0) {
+        const ctx = this.ctx;
+        const pts = record.points;
+        const pad = record.width / 2 + 2;
+        let x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+
+        ctx.save();
+        ctx.globalCompositeOperation = record.erase ? 'destination-out' : 'source-over';
+        ctx.globalAlpha = record.erase ? 1 : record.opacity;
+        ctx.strokeStyle = ctx.fillStyle = record.color;
+        ctx.lineWidth = record.width;
+        ctx.lineCap = ctx.lineJoin = 'round';
+        ctx.beginPath();
+        for(let i = from; i < pts.length; i += 2) {
+            if(pts[i] === null) continue;
+            const connected = i >= 2 && pts[i - 2] !== null;
+            if(record.fill) {
+                if(i === 0) ctx.moveTo(pts[i], pts[i + 1]);
+                else ctx.lineTo(pts[i], pts[i + 1]);
+            } else {
+                // One sub-path per segment; a single stroke() keeps overlaps from stacking alpha
+                if(connected) ctx.moveTo(pts[i - 2], pts[i - 1]);
+                else ctx.moveTo(pts[i], pts[i + 1]);
+                ctx.lineTo(pts[i], pts[i + 1]);
+                if(connected) {
+                    x0 = Math.min(x0, pts[i - 2]); x1 = Math.max(x1, pts[i - 2]);
+                    y0 = Math.min(y0, pts[i - 1]); y1 = Math.max(y1, pts[i - 1]);
+                }
+            }
+            x0 = Math.min(x0, pts[i]); x1 = Math.max(x1, pts[i]);
+            y0 = Math.min(y0, pts[i + 1]); y1 = Math.max(y1, pts[i + 1]);
+        }
+        if(record.fill) {
+            ctx.closePath();
+            ctx.fill();
+        } else {
+            ctx.stroke();
+        }
+        ctx.restore();
+
+        if(x0 <= x1) this.markDirty(x0 - pad, y0 - pad, x1 + pad, y1 + pad);
+    }
+
+    markDirty(x0, y0, x1, y1) {
+        x0 = Math.max(0, Math.floor(x0));
+        y0 = Math.max(0, Math.floor(y0));
+        x1 = Math.min(this.size, Math.ceil(x1));
+        y1 = Math.min(this.size, Math.ceil(y1));
+        if(x0 >= x1 || y0 >= y1) return;
+        const d = this.dirty;
+        this.dirty = d ? {
+            x0: Math.min(d.x0, x0), y0: Math.min(d.y0, y0),
+            x1: Math.max(d.x1, x1), y1: Math.max(d.y1, y1)
+        } : { x0: x0, y0: y0, x1: x1, y1: y1 };
+    }
+
+    remove(record) {
+        const index = this.records.indexOf(record);
+        if(index === -1) return;
+        this.records.splice(index, 1);
+        this.needsRedraw = true; // replayed once per frame, so clearing many records stays cheap
+    }
+
+    // Called once per frame before rendering
+    flush() {
+        if(this.needsRedraw) {
+            this.needsRedraw = false;
+            this.ctx.clearRect(0, 0, this.size, this.size);
+            this.dirty = null;
+            this.records.forEach(r => this.drawRecord(r));
+            this.markDirty(0, 0, this.size, this.size);
+        }
+        if(!this.dirty) return;
+
+        const { x0, y0, x1, y1 } = this.dirty;
+        this.dirty = null;
+        const textureProps = renderer.properties.get(this.texture);
+        if(!textureProps.__webglTexture || (x1 - x0) * (y1 - y0) === this.size * this.size) {
+            this.texture.needsUpdate = true; // first upload (or everything changed): let three.js do it
+            return;
+        }
+        const gl = renderer.getContext();
+        renderer.state.bindTexture(gl.TEXTURE_2D, textureProps.__webglTexture);
+        gl.pixelStorei(gl.UNPACK_FLIP_Y_WEBGL, false);
+        gl.pixelStorei(gl.UNPACK_PREMULTIPLY_ALPHA_WEBGL, false);
+        gl.pixelStorei(gl.UNPACK_ALIGNMENT, 4);
+        gl.texSubImage2D(gl.TEXTURE_2D, 0, x0, y0, gl.RGBA, gl.UNSIGNED_BYTE,
+            this.ctx.getImageData(x0, y0, x1 - x0, y1 - y0));
+    }
+
+    serialize(record) {
+        return {
+            type: 'paint',
+            erase: record.erase,
+            fill: record.fill,
+            color: record.color,
+            opacity: record.opacity,
+            width: record.width,
+            points: record.points
+        };
+    }
+
+    restore(data) {
+        const record = {
+            isPaint: true,
+            erase: data.erase,
+            fill: data.fill,
+            color: data.color,
+            opacity: data.opacity,
+            width: data.width,
+            points: data.points,
+            last: null
+        };
+        this.records.push(record);
+        this.drawRecord(record);
+        return record;
+    }
+}
+
+let paintLayer = null;
+
+// The layer is created on first use and only works on scans with UVs
+function getPaintLayer() {
+    if(!targetObject) return null;
+    if(!paintLayer) {
+        paintLayer = new PaintLayer(PAINT_TEXTURE_SIZE);
+        paintLayer.attach(targetObject);
+    }
+    return paintLayer.attached ? paintLayer : null;
+}
+
+function texturePaintActive() {
+    return settings.texturePaint && getPaintLayer() !== null;
+}
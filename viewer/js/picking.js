@@ -0,0 +1,249 @@
+// --- GPU PICKING ---
+// "What marking is under this pixel?" is answered by rendering the markings
+// with their ID encoded as a flat colour into a small offscreen target around
+// the pointer and reading the pixels back. The scan is hidden during the pass
+// (markings draw on top of it anyway), so the cost does not depend on the
+// mesh size. Markers are picked per instance by writing their IDs into the
+// pool's instanceColor buffer for the duration of the pass.
+const PICK_MAX_RADIUS = 128; // device px, per pick circle
+const PICK_MAX_REGION = 512; // device px, side of the region one pass reads at most
+
+class GpuPicker {
+    constructor() {
+        this.target = new THREE.WebGLRenderTarget(1, 1);
+        this.pixels = new Uint8Array(4);
+        this.materials = [];                 // pick material per mesh ID, reused between picks
+        this.markerMaterial = gpu.track(new THREE.MeshBasicMaterial({ color: 0xffffff, depthTest: false }));
+    }
+
+    materialFor(id) {
+        if(!this.materials[id]) {
+            this.materials[id] = gpu.track(new THREE.MeshBasicMaterial({ side: THREE.DoubleSide, depthTest: false }));
+        }
+        const material = this.materials[id];
+        material.color.setRGB((id & 255) / 255, ((id >> 8) & 255) / 255, ((id >> 16) & 255) / 255);
+        return material;
+    }
+
+    // Whether a circle of radiusPx client px fits one pick pass
+    covers(radiusPx) {
+        return !!renderer && Math.round(radiusPx * renderer.getPixelRatio()) <= PICK_MAX_RADIUS;
+    }
+
+    // Marking meshes and marker handles drawn within radiusPx of a screen position
+    pickRegion(clientX, clientY, radiusPx = 0) {
+        return this.pickCircles([{ x: clientX, y: clientY, r: radiusPx }]);
+    }
+
+    // Everything under any of the circles ({ x, y, r } in client px), from one
+    // pass over their bounding box. Circles too far from the last one to share
+    // a PICK_MAX_REGION box are skipped.
+    pickCircles(circles) {
+        if(!renderer || circles.length === 0) return [];
+        const rect = renderer.domElement.getBoundingClientRect();
+        const dpr = renderer.getPixelRatio();
+        const half = PICK_MAX_REGION / 2;
+        const device = circles.map(c => ({
+            x: Math.round((c.x - rect.left) * dpr),
+            y: Math.round((c.y - rect.top) * dpr),
+            r: Math.min(Math.round(c.r * dpr), PICK_MAX_RADIUS)
+        }));
+        const last = device[device.length - 1];
+        const kept = device.filter(c => Math.abs(c.x - last.x) + c.r <= half && Math.abs(c.y - last.y) + c.r <= half);
+        const left = Math.min(...kept.map(c => c.x - c.r));
+        const top = Math.min(...kept.map(c => c.y - c.r));
+        const w = Math.max(...kept.map(c => c.x + c.r)) - left + 1;
+        const h = Math.max(...kept.map(c => c.y + c.r)) - top + 1;
+
+        // 1. ID every pickable: meshes get one ID each, marker slots follow
+        const byId = [null];
+        const meshes = drawnObjects.filter(o => o.isMesh && o.parent);
+        const restore = [];
+        meshes.forEach(mesh => {
+            restore.push([mesh, 'material', mesh.material]);
+            mesh.material = this.materialFor(byId.length);
+            byId.push(mesh);
+        });
+        const pools = [measureMarkerPool, pinPool];
+        const savedColors = pools.map(pool => pool.mesh.instanceColor.array.slice());
+        pools.forEach(pool => {
+            const colors = pool.mesh.instanceColor.array;
+            pool.slots.forEach((handle, slot) => {
+                if(!handle) return;
+                const id = byId.length;
+                colors[slot * 3] = (id & 255) / 255;
+                colors[slot * 3 + 1] = ((id >> 8) & 255) / 255;
+                colors[slot * 3 + 2] = ((id >> 16) & 255) / 255;
+                byId.push(handle);
+            });
+            pool.mesh.instanceColor.needsUpdate = true;
+            restore.push([pool.mesh, 'material', pool.mesh.material]);
+            pool.mesh.material = this.markerMaterial;
+        });
+        const restoreAll = () => {
+            restore.forEach(([obj, key, value]) => obj[key] = value);
+            pools.forEach((pool, i) => {
+                pool.mesh.instanceColor.array.set(savedColors[i]);
+                pool.mesh.instanceColor.needsUpdate = true;
+            });
+        };
+        if(byId.length === 1) {
+            restoreAll();
+            return [];
+        }
+
+        // 2. Everything else stays out of the pass
+        const hidden = [];
+        scene.children.forEach(child => {
+            const pickable = meshes.includes(child) || child === measureMarkerPool.mesh || child === pinPool.mesh;
+            if(!pickable && child.visible) {
+                child.visible = false;
+                hidden.push(child);
+            }
+        });
+
+        // 3. Render only the pixels around the pointer
+        const width = renderer.domElement.width;
+        const height = renderer.domElement.height;
+        if(this.target.width !== w || this.target.height !== h) {
+            this.target.setSize(w, h);
+            this.pixels = new Uint8Array(w * h * 4);
+        }
+        const background = scene.background;
+        const clearColor = renderer.getClearColor(new THREE.Color());
+        const clearAlpha = renderer.getClearAlpha();
+        scene.background = null;
+        camera.setViewOffset(width, height, left, top, w, h);
+        renderer.setRenderTarget(this.target);
+        renderer.setClearColor(0x000000, 0);
+        renderer.clear();
+        renderer.render(scene, camera);
+        renderer.readRenderTargetPixels(this.target, 0, 0, w, h, this.pixels);
+        renderer.setRenderTarget(null);
+        camera.clearViewOffset();
+        scene.background = background;
+        renderer.setClearColor(clearColor, clearAlpha);
+
+        hidden.forEach(child => child.visible = true);
+        restoreAll();
+
+        // 4. Decode IDs inside the circles (pixel rows are read bottom-up)
+        const found = [];
+        for(let py = 0; py < h; py++) {
+            const y = top + h - 1 - py;
+            for(let px = 0; px < w; px++) {
+                const x = left + px;
+                if(!kept.some(c => (x - c.x) * (x - c.x) + (y - c.y) * (y - c.y) <= c.r * c.r)) continue;
+                const i = (py * w + px) * 4;
+                const id = this.pixels[i] | (this.pixels[i + 1] << 8) | (this.pixels[i + 2] << 16);
+                const obj = byId[id];
+                if(obj && !found.includes(obj)) found.push(obj);
+            }
+        }
+        return found;
+    }
+
+    pick(clientX, clientY) {
+        return this.pickRegion(clientX, clientY, 0)[0] || null;
+    }
+}
+
+let picker = null;
+
+function getPicker() {
+    if(!picker) picker = new GpuPicker();
+    return picker;
+}
+
+// Screen radius in px of a world-space radius at a point
+function worldToScreenRadius(point, radiusWorld) {
+    const distance = camera.position.distanceTo(point);
+    const viewHeight = 2 * distance * Math.tan(THREE.MathUtils.degToRad(camera.fov / 2));
+    return radiusWorld / viewHeight * renderer.domElement.clientHeight;
+}
+
+// Label whose measurement owns a marking, if any
+function findLinkedLabel(obj) {
+    return floatingLabels.find(l => l.relatedObjects.includes(obj)) || null;
+}
+
+// --- SELECTION TOOL ---
+let selection = null; // { objects, label, saved: [[obj, material] | [handle, color]] }
+
+function selectAt(clientX, clientY) {
+    clearSelection();
+    const hit = getPicker().pick(clientX, clientY);
+    if(!hit) {
+        document.getElementById('info-hud').innerText = "Nothing here - click a marking, line or marker";
+        return;
+    }
+
+    // A marking that belongs to a measurement selects the whole measurement
+    const label = findLinkedLabel(hit);
+    const objects = label ? label.relatedObjects.filter(o => !o.isPaint) : [hit];
+    selection = { objects: objects, label: label, saved: [] };
+
+    const highlight = 0xFFEB3B;
+    objects.forEach(obj => {
+        if(obj.isMarker) {
+            selection.saved.push([obj, obj.color]);
+            obj.color = highlight;
+            obj.pool.write(obj);
+        } else {
+            selection.saved.push([obj, obj.material]);
+            obj.material = markingMaterial(highlight, 1);
+        }
+    });
+    if(label) label.element.classList.add('selected');
+    document.getElementById('info-hud').innerText = label
+        ? "Measurement selected - press Delete to remove it"
+        : "Marking selected - press Delete to remove it";
+}
+
+function clearSelection() {
+    if(!selection) return;
+    selection.saved.forEach(([obj, value]) => {
+        if(obj.isMarker) {
+            obj.color = value;
+            if(obj.pool.slots[obj.slot] === obj) obj.pool.write(obj);
+        } else if(obj.userData.disposed) {
+            gpu.release(value); // removed while selected (undo): its own material is still held here
+        } else {
+            gpu.release(obj.material);
+            obj.material = value;
+        }
+    });
+    if(selection.label && selection.label.element) selection.label.element.classList.remove('selected');
+    selection = null;
+}
+
+function deleteSelection() {
+    if(!selection) return;
+    const { objects, label } = selection;
+    clearSelection();
+    if(label) {
+        deleteFloatingLabel(label);
+        return;
+    }
+    objects.forEach(obj => {
+        disposeDrawnObject(obj);
+        const index = drawnObjects.indexOf(obj);
+        if(index > -1) drawnObjects.splice(index, 1);
+
+        const annotation = annotations.find(a => a.marker === obj);
+        if(annotation) {
+            annotation.label.remove();
+            annotations = annotations.filter(a => a !== annotation);
+        }
+    });
+}
+
+document.addEventListener('keydown', (event) => {
+    if(currentTool !== 'select' || !selection) return;
+    if(event.key === 'Delete' || event.key === 'Backspace') {
+        event.preventDefault();
+        deleteSelection();
+    } else if(event.key === 'Escape') {
+        clearSelection();
+    }
+});
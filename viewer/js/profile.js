@@ -0,0 +1,85 @@
+// --- CROSS-SECTION PROFILE ---
+// Two clicks give the ends of a profile; the cutting plane holds both and the
+// viewing direction, so the profile is the skin seen edge-on between them.
+// Python slices the scan through a per-scan edge index (only the edges near
+// the plane are tested) and answers with the polyline as args.profile. The
+// offset slider slides the plane along its normal; each move is one small
+// request, so the profile follows the slider.
+const PROFILE_COLOR = 0x00bcd4;
+
+let profileRequest = null;  // { a, b, direction, offset } in tile space, sent with the component value
+let profileResult = null;   // { request, points, arc, chord, depth, depth_at, start_angle, end_angle } from args.profile
+let profileLine = null;
+
+function pickProfilePoint(point) {
+    if(!tileSet) return;
+    measurePoints.push(point);
+    addMarker(point, PROFILE_COLOR, false);
+    if(measurePoints.length < 2) return;
+
+    const toLocal = p => tileSet.group.worldToLocal(p.clone()).toArray();
+    profileRequest = {
+        a: toLocal(measurePoints[0]),
+        b: toLocal(measurePoints[1]),
+        direction: camera.getWorldDirection(new THREE.Vector3()).toArray(),
+        offset: 0
+    };
+    measurePoints = [];
+    setTimeout(() => {
+        measureMarkers.forEach(releaseMarker);
+        measureMarkers = [];
+    }, 3000);
+    document.getElementById('p-profile-offset').value = 0;
+    updateProfileOffset();
+}
+
+window.updateProfileOffset = function() {
+    const offsetMm = parseFloat(document.getElementById('p-profile-offset').value);
+    document.getElementById('profile-offset-val').innerText = offsetMm.toFixed(1);
+    if(!profileRequest) return;
+    profileRequest = Object.assign({}, profileRequest, { offset: offsetMm / scaleFactor });
+    document.getElementById('info-hud').innerText = "Slicing...";
+    pushState();
+}
+
+function setProfile(profile) {
+    profileResult = profile || null;
+    gpu.disposeObject(profileLine);
+    profileLine = null;
+    if(!profileResult || !tileSet || profileResult.points.length < 2) return;
+
+    const points = profileWorldPoints();
+    profileLine = new THREE.Line(
+        gpu.track(new THREE.BufferGeometry().setFromPoints(points)),
+        gpu.track(new THREE.LineBasicMaterial({ color: PROFILE_COLOR, depthTest: false }))
+    );
+    profileLine.renderOrder = 999;
+    profileLine.raycast = () => {};
+    scene.add(profileLine);
+
+    document.getElementById('measure-value').innerText = (profileResult.arc * scaleFactor).toFixed(2) + ' mm';
+    document.getElementById('info-hud').innerText = describeProfile(profileResult);
+}
+
+function profileWorldPoints() {
+    return profileResult.points.map(p => tileSet.group.localToWorld(new THREE.Vector3().fromArray(p)));
+}
+
+function describeProfile(p) {
+    return 'Arc ' + (p.arc * scaleFactor).toFixed(1) + ' mm · chord ' + (p.chord * scaleFactor).toFixed(1) +
+        ' mm · depth ' + (p.depth * scaleFactor).toFixed(1) + ' mm · ends ' +
+        p.start_angle.toFixed(0) + '° / ' + p.end_angle.toFixed(0) + '°';
+}
+
+// Records the shown profile as a measurement with its polyline as points
+window.saveProfile = function() {
+    if(!profileResult || profileResult.points.length < 2) return;
+    const points = profileWorldPoints();
+    const tube = buildStrokeTube(points);
+    scene.add(tube);
+    drawnObjects.push(tube);
+
+    const measurement = recordMeasurement('profile', profileResult.arc, points);
+    measurement.labelData = createFloatingLabel(points[Math.floor(points.length / 2)], formatMeasurement(measurement), 'profile');
+    measurement.labelData.relatedObjects = [tube];
+}
@@ -0,0 +1,354 @@
+// --- EXPORT PDF REPORT ---
+// html2canvas and jsPDF are only needed here, so they are fetched on the
+// first export instead of blocking the viewer start-up.
+const EXPORT_LIBS = [
+    { ready: () => window.html2canvas, local: 'vendor/html2canvas.min.js?v=1.4.1',
+      cdn: 'https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js' },
+    { ready: () => window.jspdf, local: 'vendor/jspdf.umd.min.js?v=2.5.1',
+      cdn: 'https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js' }
+];
+
+function loadScript(url) {
+    return new Promise((resolve, reject) => {
+        const script = document.createElement('script');
+        script.src = url;
+        script.onload = resolve;
+        script.onerror = () => {
+            script.remove();
+            reject(new Error('Could not load ' + url));
+        };
+        document.head.appendChild(script);
+    });
+}
+
+async function loadExportLibs() {
+    for (const lib of EXPORT_LIBS) {
+        if(lib.ready()) continue;
+        try {
+            await loadScript(lib.local);
+        } catch(e) {
+            await loadScript(lib.cdn);
+        }
+    }
+}
+
+window.exportPDFReport = async function() {
+    try {
+        await loadExportLibs();
+    } catch(error) {
+        alert('PDF export is unavailable: ' + error.message);
+        return;
+    }
+
+    const { jsPDF } = window.jspdf;
+    const pdf = new jsPDF('p', 'mm', 'a4');
+
+    // Hide UI elements temporarily
+    document.querySelector('.toolbar').style.display = 'none';
+    document.querySelector('.settings-panel').style.display = 'none';
+    document.querySelector('.nav-panel').style.display = 'none';
+    document.querySelector('.export-panel').style.display = 'none';
+    document.querySelector('.info-hud').style.display = 'none';
+
+    const captureView = async (viewName) => {
+        return new Promise((resolve) => {
+            setView(viewName);
+            setTimeout(async () => {
+                const canvas = await html2canvas(document.body, {
+                    backgroundColor: '#1a1a1a',
+                    scale: 1
+                });
+                resolve(canvas.toDataURL('image/jpeg', 0.8));
+            }, 1000);
+        });
+    };
+
+    // Capture 3 views
+    const frontImg = await captureView('front');
+    const leftImg = await captureView('left');
+    const rightImg = await captureView('right');
+
+    // Restore UI
+    document.querySelector('.toolbar').style.display = 'flex';
+    document.querySelector('.nav-panel').style.display = 'block';
+    document.querySelector('.export-panel').style.display = 'flex';
+
+    // Build PDF
+    const pageWidth = 210;
+    const pageHeight = 297;
+    const margin = 15;
+    const imgWidth = (pageWidth - 3 * margin) / 2;
+    const imgHeight = imgWidth * 0.75;
+
+    // Header
+    pdf.setFontSize(20);
+    pdf.setTextColor(33, 150, 243);
+    pdf.text('HIDU Surgical Planning Report', margin, margin + 10);
+
+    pdf.setFontSize(10);
+    pdf.setTextColor(100);
+    const date = new Date().toLocaleDateString();
+    pdf.text(`Date: ${date}`, margin, margin + 18);
+
+    // Images
+    let y = margin + 30;
+    pdf.setFontSize(12);
+    pdf.setTextColor(0);
+
+    pdf.text('Front View', margin, y);
+    pdf.addImage(frontImg, 'JPEG', margin, y + 5, imgWidth, imgHeight);
+
+    pdf.text('Left Profile', pageWidth - margin - imgWidth, y);
+    pdf.addImage(leftImg, 'JPEG', pageWidth - margin - imgWidth, y + 5, imgWidth, imgHeight);
+
+    y += imgHeight + 15;
+    pdf.text('Right Profile', margin, y);
+    pdf.addImage(rightImg, 'JPEG', margin, y + 5, imgWidth, imgHeight);
+
+    // Measurements Table
+    y += imgHeight + 20;
+    if(measurements.length > 0) {
+        pdf.setFontSize(14);
+        pdf.setTextColor(33, 150, 243);
+        pdf.text('Measurements', margin, y);
+        y += 8;
+
+        pdf.setFontSize(10);
+        pdf.setTextColor(0);
+
+        // Group by type
+        const distances = measurements.filter(m => m.type === 'distance');
+        const angles = measurements.filter(m => m.type === 'angle');
+        const areas = measurements.filter(m => m.type === 'area');
+
+        if(distances.length > 0) {
+            pdf.setTextColor(33, 150, 243);
+            pdf.text('Distances:', margin + 2, y);
+            y += 5;
+            pdf.setTextColor(0);
+            distances.forEach((m, i) => {
+                const text = `  • ${m.value.toFixed(2)} mm`;
+                pdf.text(text, margin + 5, y);
+                y += 5;
+            });
+            y += 2;
+        }
+
+        if(angles.length > 0) {
+            pdf.setTextColor(255, 152, 0);
+            pdf.text('Angles:', margin + 2, y);
+            y += 5;
+            pdf.setTextColor(0);
+            angles.forEach((m, i) => {
+                const text = `  • ${m.value.toFixed(1)}°`;
+                pdf.text(text, margin + 5, y);
+                y += 5;
+            });
+            y += 2;
+        }
+
+        if(areas.length > 0) {
+            pdf.setTextColor(156, 39, 176);
+            pdf.text('Skin Flap Areas:', margin + 2, y);
+            y += 5;
+            pdf.setTextColor(0);
+            areas.forEach((m, i) => {
+                const text = `  • ${m.value.toFixed(1)} mm² (Flap ${i + 1})`;
+                pdf.text(text, margin + 5, y);
+                y += 5;
+            });
+        }
+    }
+
+    // Annotations
+    if(annotations.length > 0) {
+        y += 5;
+        pdf.setFontSize(14);
+        pdf.setTextColor(33, 150, 243);
+        pdf.text('Annotations', margin, y);
+        y += 8;
+
+        pdf.setFontSize(10);
+        pdf.setTextColor(0);
+
+        annotations.forEach((a, i) => {
+            const input = a.label.querySelector('.annotation-input');
+            const note = input ? input.value || '(No note)' : '(No note)';
+            pdf.text(`${i + 1}. ${note}`, margin + 5, y);
+            y += 6;
+        });
+    }
+
+    // Footer
+    pdf.setFontSize(8);
+    pdf.setTextColor(150);
+    pdf.text('Generated by HIDU Surgical Planning Studio', margin, pageHeight - 10);
+
+    // Save
+    pdf.save(`surgical-plan-${date.replace(/\//g, '-')}.pdf`);
+
+    alert('PDF exported successfully!');
+};
+
+// --- SAVE PROJECT ---
+window.saveProject = function() {
+    const projectData = {
+        version: '1.0',
+        date: new Date().toISOString(),
+        scaleFactor: scaleFactor,
+        drawnObjects: [],
+        annotations: [],
+        measurements: serializeMeasurements()
+    };
+
+    // Serialize drawn objects
+    drawnObjects.forEach(obj => {
+        if(obj.isPaint) {
+            projectData.drawnObjects.push(paintLayer.serialize(obj));
+        }
+        else if(obj.geometry && obj.geometry.attributes && obj.geometry.attributes.position) {
+            const positions = Array.from(obj.geometry.attributes.position.array);
+            projectData.drawnObjects.push({
+                type: obj.geometry.type,
+                positions: positions,
+                color: obj.material.color.getHex(),
+                opacity: obj.material.opacity
+            });
+        }
+    });
+
+    // Serialize annotations
+    annotations.forEach(a => {
+        const input = a.label.querySelector('.annotation-input');
+        projectData.annotations.push({
+            id: a.id,
+            point3D: {x: a.point3D.x, y: a.point3D.y, z: a.point3D.z},
+            offsetX: a.offsetX,
+            offsetY: a.offsetY,
+            text: input ? input.value : '',
+            color: a.marker.color
+        });
+    });
+
+    // Download JSON
+    const blob = new Blob([JSON.stringify(projectData, null, 2)], { type: 'application/json' });
+    const url = URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = `surgical-plan-${new Date().toISOString().split('T')[0]}.json`;
+    a.click();
+    URL.revokeObjectURL(url);
+
+    alert('Project saved successfully!');
+};
+
+// --- LOAD PROJECT ---
+window.loadProject = function(event) {
+    const file = event.target.files[0];
+    if(!file) return;
+
+    const reader = new FileReader();
+    reader.onload = function(e) {
+        try {
+            const projectData = JSON.parse(e.target.result);
+
+            // Clear current scene
+            clearAll();
+
+            // Restore drawn objects
+            projectData.drawnObjects.forEach(objData => {
+                if(objData.type === 'paint') {
+                    const layer = getPaintLayer();
+                    if(layer) drawnObjects.push(layer.restore(objData));
+                    return;
+                }
+
+                const positions = new Float32Array(objData.positions);
+                const geometry = gpu.track(new THREE.BufferGeometry());
+                geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+                gpu.refresh(geometry);
+
+                const material = markingMaterial(objData.color, objData.opacity);
+
+                let mesh;
+                if(objData.type === 'TubeGeometry') {
+                    mesh = new THREE.Mesh(geometry, material);
+                } else {
+                    mesh = new THREE.Line(geometry, material);
+                }
+
+                mesh.renderOrder = 999;
+                scene.add(mesh);
+                drawnObjects.push(mesh);
+            });
+
+            // Restore annotations
+            projectData.annotations.forEach(aData => {
+                const point3D = new THREE.Vector3(aData.point3D.x, aData.point3D.y, aData.point3D.z);
+
+                // Create marker
+                const marker = addPin(point3D, aData.color);
+
+                // Create label
+                const label = document.createElement('div');
+                label.className = 'annotation-label';
+                label.style.background = '#' + aData.color.toString(16).padStart(6, '0');
+
+                label.innerHTML = `
+                    <div class="annotation-header" onmousedown="startDragAnnotation(event, ${aData.id})">
+                        <div style="display:flex; align-items:center;">
+                            <span class="annotation-number" style="background:#${aData.color.toString(16).padStart(6, '0')}; color:#fff;">${aData.id}</span>
+                            <span style="font-size:11px;">Note #${aData.id}</span>
+                        </div>
+                        <i class="material-icons" style="font-size:14px; opacity:0.7;">open_with</i>
+                    </div>
+                    <div class="annotation-body">
+                        <input type="text" 
+                               class="annotation-input" 
+                               placeholder="Enter note..."
+                               value="${aData.text}"
+                               onkeydown="event.stopPropagation()"
+                               onmousedown="event.stopPropagation()">
+                    </div>
+                `;
+
+                document.body.appendChild(label);
+
+                const annotation = {
+                    id: aData.id,
+                    point3D: point3D,
+                    marker: marker,
+                    label: label,
+                    offsetX: aData.offsetX,
+                    offsetY: aData.offsetY
+                };
+
+                annotations.push(annotation);
+                drawnObjects.push(marker);
+
+                if(aData.id >= annotationCounter) {
+                    annotationCounter = aData.id + 1;
+                }
+
+                function updatePos() {
+                    if(!label.parentElement) return;
+                    const pos = toScreenPosition(point3D);
+                    label.style.left = (pos.x + annotation.offsetX) + 'px';
+                    label.style.top = (pos.y + annotation.offsetY) + 'px';
+                    requestAnimationFrame(updatePos);
+                }
+                updatePos();
+            });
+
+            // Restore measurements
+            if(projectData.measurements) {
+                restoreMeasurements(projectData.measurements, projectData.scaleFactor || 1.0);
+            }
+
+            alert('Project loaded successfully!');
+        } catch(error) {
+            alert('Error loading project: ' + error.message);
+        }
+    };
+    reader.readAsText(file);
+};
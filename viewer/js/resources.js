@@ -0,0 +1,177 @@
+// --- GPU RESOURCE MANAGER ---
+// Every geometry, material and texture the viewer creates goes through here.
+// Resources are reference counted and disposed as soon as the last owner
+// releases them, the tracked size is checked against a memory budget, and
+// the live counts can be shown in a debug overlay.
+class GpuResources {
+    constructor(budgetMB) {
+        this.entries = new Map(); // resource -> { kind, refs, bytes }
+        this.bytes = 0;
+        this.budgetBytes = budgetMB * 1024 * 1024;
+        this.evictors = [];       // callbacks that can free cached (non-essential) memory
+        this.shared = new Map();  // key -> shared material
+        this.overBudgetWarned = false;
+    }
+
+    setBudget(budgetMB) {
+        this.budgetBytes = budgetMB * 1024 * 1024;
+        this.overBudgetWarned = false;
+        this.enforceBudget();
+    }
+
+    track(resource) {
+        if(!resource) return resource;
+        const entry = this.entries.get(resource);
+        if(entry) {
+            entry.refs++;
+            return resource;
+        }
+        const kind = resource.isTexture ? 'texture' : resource.isMaterial ? 'material' : 'geometry';
+        const bytes = this.estimateBytes(resource);
+        this.entries.set(resource, { kind: kind, refs: 1, bytes: bytes });
+        this.bytes += bytes;
+        if(kind === 'material') this.materialTextures(resource).forEach(t => this.track(t));
+        this.enforceBudget();
+        return resource;
+    }
+
+    release(resource) {
+        const entry = resource && this.entries.get(resource);
+        if(!entry) return;
+        if(--entry.refs > 0) return;
+        this.entries.delete(resource);
+        this.bytes -= entry.bytes;
+        if(entry.kind === 'material') this.materialTextures(resource).forEach(t => this.release(t));
+        resource.dispose();
+    }
+
+    // Track the geometry and material(s) of an object and its children
+    retainObject(object) {
+        object.traverse(child => {
+            if(child.geometry) this.track(child.geometry);
+            this.objectMaterials(child).forEach(m => this.track(m));
+        });
+        return object;
+    }
+
+    // Markings with the same look share one material
+    sharedMaterial(key, create) {
+        let material = this.shared.get(key);
+        if(!material || !this.entries.has(material)) {
+            material = create();
+            this.shared.set(key, material);
+        }
+        return this.track(material);
+    }
+
+    // Remove from the scene and release everything the object holds
+    disposeObject(object) {
+        if(!object || object.userData.disposed) return;
+        object.userData.disposed = true; // shared materials must only be released once per owner
+        if(object.parent) object.parent.remove(object);
+        object.traverse(child => {
+            if(child.geometry) this.release(child.geometry);
+            this.objectMaterials(child).forEach(m => this.release(m));
+            if(child.isInstancedMesh) child.dispose();
+        });
+    }
+
+    objectMaterials(object) {
+        if(!object.material) return [];
+        return Array.isArray(object.material) ? object.material : [object.material];
+    }
+
+    materialTextures(material) {
+        return ['map', 'alphaMap', 'aoMap', 'lightMap'].map(k => material[k]).filter(Boolean);
+    }
+
+    estimateBytes(resource) {
+        if(resource.isTexture) {
+            const image = resource.image;
+            if(!image || !image.width) return 0;
+            // RGBA8 plus roughly a third for mipmaps
+            return Math.round(image.width * image.height * 4 * (resource.generateMipmaps ? 4 / 3 : 1));
+        }
+        if(resource.isBufferGeometry) {
+            let bytes = resource.index ? resource.index.array.byteLength : 0;
+            for (const name in resource.attributes) bytes += resource.attributes[name].array.byteLength;
+            return bytes;
+        }
+        return 0;
+    }
+
+    // Geometry can grow after it was tracked (e.g. buffers filled in later)
+    refresh(resource) {
+        const entry = this.entries.get(resource);
+        if(!entry) return;
+        const bytes = this.estimateBytes(resource);
+        this.bytes += bytes - entry.bytes;
+        entry.bytes = bytes;
+        this.enforceBudget();
+    }
+
+    addEvictor(callback) {
+        this.evictors.push(callback);
+    }
+
+    enforceBudget() {
+        for (const evict of this.evictors) {
+            if(this.bytes <= this.budgetBytes) break;
+            evict(this.bytes - this.budgetBytes);
+        }
+        if(this.bytes > this.budgetBytes && !this.overBudgetWarned) {
+            this.overBudgetWarned = true;
+            const hud = document.getElementById('info-hud');
+            hud.innerText = `⚠ GPU memory ${(this.bytes / 1048576).toFixed(0)} MB exceeds budget - clear unused markings`;
+            hud.classList.add('visible');
+        } else if(this.bytes <= this.budgetBytes) {
+            this.overBudgetWarned = false;
+        }
+    }
+
+    counts() {
+        const counts = { geometry: 0, material: 0, texture: 0 };
+        this.entries.forEach(entry => counts[entry.kind]++);
+        return counts;
+    }
+}
+
+const gpu = new GpuResources(512);
+
+function markingMaterial(color, opacity, doubleSided = false) {
+    return gpu.sharedMaterial(`marking:${color}:${opacity}:${doubleSided}`, () => new THREE.MeshBasicMaterial({
+        color: color,
+        transparent: true,
+        opacity: opacity,
+        side: doubleSided ? THREE.DoubleSide : THREE.FrontSide,
+        depthTest: false
+    }));
+}
+
+// --- DEBUG OVERLAY ---
+let debugOverlayTimer = null;
+
+function setDebugOverlay(enabled) {
+    if(enabled === (debugOverlayTimer !== null)) return;
+    const overlay = document.getElementById('gpu-debug');
+    clearInterval(debugOverlayTimer);
+    debugOverlayTimer = null;
+    overlay.style.display = enabled ? 'block' : 'none';
+    if(!enabled) return;
+
+    const refresh = () => {
+        const counts = gpu.counts();
+        const info = renderer.info;
+        const mb = (gpu.bytes / 1048576).toFixed(1);
+        const budget = (gpu.budgetBytes / 1048576).toFixed(0);
+        overlay.classList.toggle('over-budget', gpu.bytes > gpu.budgetBytes);
+        overlay.innerText =
+            `GPU ${mb} / ${budget} MB\n` +
+            `tracked  geo ${counts.geometry}  mat ${counts.material}  tex ${counts.texture}\n` +
+            `renderer geo ${info.memory.geometries}  tex ${info.memory.textures}\n` +
+            `frame    calls ${info.render.calls}  tris ${info.render.triangles}\n` +
+            `objects  drawn ${drawnObjects.length}  labels ${floatingLabels.length}`;
+    };
+    refresh();
+    debugOverlayTimer = setInterval(refresh, 500);
+}
@@ -0,0 +1,111 @@
+// --- MEASUREMENT SNAPPING ---
+// Distance, line and angle points snap to the nearest landmark candidate
+// within settings.snapLandmarkMm, otherwise to the nearest scan vertex within
+// settings.snapVertexMm, so repeated taps on the same feature give the same
+// point. Both queries go through static KD-trees: one over the landmark
+// candidates, and one per tile over its quantized vertices, built the first
+// time a measurement lands on that tile and dropped with the tile.
+class PointTree {
+    // points: flat x, y, z array; the tree is an index permutation split at medians
+    constructor(points) {
+        this.points = points;
+        const count = Math.floor(points.length / 3);
+        this.index = new Uint32Array(count);
+        for(let i = 0; i < count; i++) this.index[i] = i;
+        this.build(0, count, 0);
+    }
+
+    build(lo, hi, axis) {
+        if(hi - lo <= 1) return;
+        const mid = (lo + hi) >> 1;
+        this.select(lo, hi - 1, mid, axis);
+        const next = (axis + 1) % 3;
+        this.build(lo, mid, next);
+        this.build(mid + 1, hi, next);
+    }
+
+    // Quickselect: index[k] gets the median along `axis`, smaller ones before it
+    select(lo, hi, k, axis) {
+        const index = this.index;
+        const points = this.points;
+        while(hi > lo) {
+            const pivot = points[index[(lo + hi) >> 1] * 3 + axis];
+            let i = lo, j = hi;
+            while(i <= j) {
+                while(points[index[i] * 3 + axis] < pivot) i++;
+                while(points[index[j] * 3 + axis] > pivot) j--;
+                if(i <= j) {
+                    const swap = index[i];
+                    index[i++] = index[j];
+                    index[j--] = swap;
+                }
+            }
+            if(k <= j) hi = j;
+            else if(k >= i) lo = i;
+            else return;
+        }
+    }
+
+    // Nearest point within radius as its index, or -1
+    nearest(x, y, z, radius) {
+        const query = [x, y, z];
+        const best = { index: -1, distance2: radius * radius };
+        this.search(query, 0, this.index.length, 0, best);
+        return best.index;
+    }
+
+    search(query, lo, hi, axis, best) {
+        if(lo >= hi) return;
+        const mid = (lo + hi) >> 1;
+        const p = this.index[mid] * 3;
+        const points = this.points;
+        const dx = query[0] - points[p], dy = query[1] - points[p + 1], dz = query[2] - points[p + 2];
+        const distance2 = dx * dx + dy * dy + dz * dz;
+        if(distance2 < best.distance2) {
+            best.index = this.index[mid];
+            best.distance2 = distance2;
+        }
+        const diff = query[axis] - points[p + axis];
+        const next = (axis + 1) % 3;
+        if(diff < 0) {
+            this.search(query, lo, mid, next, best);
+            if(diff * diff < best.distance2) this.search(query, mid + 1, hi, next, best);
+        } else {
+            this.search(query, mid + 1, hi, next, best);
+            if(diff * diff < best.distance2) this.search(query, lo, mid, next, best);
+        }
+    }
+}
+
+const _snapLocal = new THREE.Vector3();
+
+function treeFromVectors(vectors) {
+    const points = new Float32Array(vectors.length * 3);
+    vectors.forEach((v, i) => v.toArray(points, i * 3));
+    return new PointTree(points);
+}
+
+// Nearest vertex of the hit tile in world space, or null
+function snapToVertex(hit, radius) {
+    const mesh = hit.object;
+    const position = mesh.geometry.attributes.position;
+    if(!position) return null;
+    if(!mesh.userData.snapTree) mesh.userData.snapTree = new PointTree(position.array);
+    // Tile positions are quantized: local = (world - offset) / step, same step on every axis
+    mesh.worldToLocal(_snapLocal.copy(hit.point));
+    const index = mesh.userData.snapTree.nearest(_snapLocal.x, _snapLocal.y, _snapLocal.z, radius / mesh.scale.x);
+    if(index < 0) return null;
+    return mesh.localToWorld(new THREE.Vector3().fromBufferAttribute(position, index));
+}
+
+// Measurement point for a hit; keeps the raw point's lift off the skin
+function snapMeasurePoint(hit, point) {
+    const lift = point.clone().sub(hit.point);
+    const landmark = snapToLandmark(hit.point, settings.snapLandmarkMm / scaleFactor);
+    if(landmark) {
+        if(landmark.name) document.getElementById('info-hud').innerText = "Snapped to " + landmark.name;
+        return landmark.position.clone().add(lift);
+    }
+    const vertex = settings.snapVertexMm > 0 ? snapToVertex(hit, settings.snapVertexMm / scaleFactor) : null;
+    return vertex ? vertex.add(lift) : point;
+}
@@ -0,0 +1,91 @@
+// --- STROKE SIMPLIFICATION & TESSELLATION ---
+// Brush strokes collect a point every few pixels of pointer movement. The
+// points are reduced on the fly with Douglas-Peucker (in 3D, tolerance scaled
+// by currentZoom) and the tube is tessellated by length and curvature under a
+// fixed vertex budget, so long strokes stay cheap to rebuild and to draw.
+const STROKE_TOLERANCE = 0.0004;     // × currentZoom, max deviation from the raw stroke
+const STROKE_VERTEX_BUDGET = 4000;   // per stroke tube
+const STROKE_RADIAL_SEGMENTS = 6;
+const STROKE_SIMPLIFY_BATCH = 24;    // raw points collected before the tail is simplified
+
+let strokeAnchor = 0;   // drawPoints before this index are already simplified
+let strokeSamples = 0;  // raw points received for the current stroke
+
+function beginStroke(point) {
+    drawPoints = [point];
+    strokeAnchor = 0;
+    strokeSamples = 1;
+}
+
+function extendStroke(points) {
+    drawPoints.push(...points);
+    strokeSamples += points.length;
+    if(drawPoints.length - strokeAnchor > STROKE_SIMPLIFY_BATCH) {
+        // Keep the last point open: the next samples may still bend the stroke there
+        const tail = simplifyStroke(drawPoints.slice(strokeAnchor), currentZoom * STROKE_TOLERANCE);
+        drawPoints.splice(strokeAnchor, drawPoints.length - strokeAnchor, ...tail);
+        strokeAnchor = drawPoints.length - 2;
+    }
+}
+
+// Douglas-Peucker on a 3D polyline (iterative, keeps both end points)
+function simplifyStroke(points, tolerance) {
+    if(points.length < 3) return points.slice();
+    const keep = new Uint8Array(points.length);
+    keep[0] = keep[points.length - 1] = 1;
+    const stack = [[0, points.length - 1]];
+    const segment = new THREE.Line3();
+    const closest = new THREE.Vector3();
+    const tolSq = tolerance * tolerance;
+
+    while(stack.length > 0) {
+        const [first, last] = stack.pop();
+        segment.set(points[first], points[last]);
+        let maxDistSq = 0;
+        let index = -1;
+        for(let i = first + 1; i < last; i++) {
+            segment.closestPointToPoint(points[i], true, closest);
+            const distSq = closest.distanceToSquared(points[i]);
+            if(distSq > maxDistSq) {
+                maxDistSq = distSq;
+                index = i;
+            }
+        }
+        if(index !== -1 && maxDistSq > tolSq) {
+            keep[index] = 1;
+            stack.push([first, index], [index, last]);
+        }
+    }
+    return points.filter((p, i) => keep[i]);
+}
+
+// Tubular segments: one per ~2 radii of length plus extra where the stroke
+// turns, capped so (segments + 1) × (radial + 1) stays within the budget
+function strokeSegments(points, radius) {
+    let length = 0;
+    let turning = 0;
+    const prevDir = new THREE.Vector3();
+    const dir = new THREE.Vector3();
+    for(let i = 1; i < points.length; i++) {
+        dir.subVectors(points[i], points[i - 1]);
+        const segLength = dir.length();
+        if(segLength === 0) continue;
+        length += segLength;
+        dir.divideScalar(segLength);
+        if(i > 1) turning += prevDir.angleTo(dir);
+        prevDir.copy(dir);
+    }
+    const byLength = length / (radius * 2);
+    const byCurvature = turning / (Math.PI / 18); // a segment per 10° of turn
+    const maxSegments = Math.floor(STROKE_VERTEX_BUDGET / (STROKE_RADIAL_SEGMENTS + 1)) - 1;
+    return Math.min(maxSegments, Math.max(points.length - 1, Math.ceil(byLength + byCurvature)));
+}
+
+function buildStrokeTube(points) {
+    const radius = settings.lineWidth * currentZoom;
+    const path = new THREE.CatmullRomCurve3(points);
+    const tubeGeo = new THREE.TubeGeometry(path, strokeSegments(points, radius), radius, STROKE_RADIAL_SEGMENTS, false);
+    const tube = new THREE.Mesh(gpu.track(tubeGeo), markingMaterial(settings.color, settings.opacity));
+    tube.renderOrder = 999;
+    return tube;
+}
@@ -0,0 +1,269 @@
+// --- TILED SCAN (OCTREE LOD) ---
+// The processed scan is an octree of tiles (see mesh_pipeline.py). Every
+// frame the tree is walked from the root: tiles outside the frustum are
+// skipped, and a tile is refined into its children only while its geometric
+// error projects to more than TILE_SSE_THRESHOLD pixels. A parent keeps
+// drawing until all of its visible children have arrived, so there are never
+// holes. Only the selected tiles are children of the scan group, which also
+// keeps raycasts to what is on screen.
+//
+// The coarse levels arrive as one stream (stream.bin) that is decoded record
+// by record while it downloads: the root is drawn as soon as its bytes are
+// in, and finer streamed tiles replace it as they follow.
+const TILE_SSE_THRESHOLD = 1.5;  // px
+const TILE_MAX_LOADS = 4;        // concurrent tile requests
+
+const _tileFrustum = new THREE.Frustum();
+const _tileMatrix = new THREE.Matrix4();
+const _tileCamera = new THREE.Vector3();   // camera position in the tile set's scan space
+
+class TileSet {
+    constructor(baseUrl, manifest, material) {
+        this.baseUrl = baseUrl;
+        this.manifest = manifest;
+        this.material = gpu.track(material);
+        this.hasUV = manifest.has_uv;
+        this.group = new THREE.Group();
+        this.group.userData.tileSet = this;
+        this.nodes = new Map();
+        this.loading = 0;
+        this.frame = 0;
+        this.disposed = false;
+        this.scalars = null;          // per-vertex scalar layer (Int8Array, manifest tile order)
+        this.scalarMaterial = null;
+
+        manifest.tiles.forEach(info => {
+            this.nodes.set(info.id, {
+                info: info,
+                box: new THREE.Box3(new THREE.Vector3(...info.bounds[0]), new THREE.Vector3(...info.bounds[1])),
+                children: [],
+                mesh: null,
+                loading: false,
+                streaming: false,
+                lastUsed: 0
+            });
+        });
+        this.nodes.forEach(node => {
+            node.children = node.info.children.map(id => this.nodes.get(id));
+        });
+        this.root = this.nodes.get(manifest.root);
+        this.stream();
+    }
+
+    // Decode a tile's binary buffer into a mesh. Positions stay 16-bit grid
+    // coordinates; the mesh matrix (offset + uniform step) maps them to scan space.
+    createMesh(node, buffer) {
+        const info = node.info;
+        const geometry = new THREE.BufferGeometry();
+        let offset = 0;
+        const positions = new Uint16Array(buffer, offset, info.vertices * 3);
+        offset += Math.ceil(positions.byteLength / 4) * 4;
+        geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+        if(this.hasUV) {
+            const uvs = new Uint16Array(buffer, offset, info.vertices * 2);
+            offset += uvs.byteLength;
+            geometry.setAttribute('uv', new THREE.BufferAttribute(uvs, 2, true));
+        }
+        const IndexArray = info.index16 ? Uint16Array : Uint32Array;
+        geometry.setIndex(new THREE.BufferAttribute(new IndexArray(buffer, offset, info.faces * 3), 1));
+
+        const mesh = new THREE.Mesh(gpu.track(geometry), this.material);
+        mesh.position.fromArray(info.offset);
+        mesh.scale.setScalar(info.step);
+        // Bounds in grid units, so three.js never has to scan the buffers
+        geometry.boundingBox = node.box.clone().translate(mesh.position.clone().negate());
+        geometry.boundingBox.min.divideScalar(info.step);
+        geometry.boundingBox.max.divideScalar(info.step);
+        geometry.boundingSphere = geometry.boundingBox.getBoundingSphere(new THREE.Sphere());
+        mesh.userData.tileId = info.id;
+        if(this.scalars) this.applyScalars(node, mesh);
+        return mesh;
+    }
+
+    // Show a scalar layer (see mesh_pipeline.write_scalar_layer) with its own
+    // material, or go back to the scan material with null
+    setScalars(values, material) {
+        this.scalars = values;
+        this.scalarMaterial = material;
+        let offset = 0;
+        this.manifest.tiles.forEach(info => {
+            this.nodes.get(info.id).scalarOffset = offset;
+            offset += info.vertices;
+        });
+        this.nodes.forEach(node => {
+            if(node.mesh) this.applyScalars(node, node.mesh);
+        });
+    }
+
+    applyScalars(node, mesh) {
+        const geometry = mesh.geometry;
+        if(this.scalars) {
+            const values = this.scalars.subarray(node.scalarOffset, node.scalarOffset + node.info.vertices);
+            geometry.setAttribute('scalar', new THREE.BufferAttribute(values, 1, true));
+            mesh.material = this.scalarMaterial;
+        } else {
+            geometry.deleteAttribute('scalar');
+            mesh.material = this.material;
+        }
+        gpu.refresh(geometry);
+    }
+
+    load(node) {
+        if(node.mesh || node.loading || node.streaming || this.loading >= TILE_MAX_LOADS) return;
+        node.loading = true;
+        this.loading++;
+        fetch(this.baseUrl + node.info.url)
+            .then(response => {
+                if(!response.ok) throw new Error(response.status);
+                return response.arrayBuffer();
+            })
+            .then(buffer => {
+                if(this.disposed) return;
+                node.mesh = this.createMesh(node, buffer);
+            })
+            .catch(err => console.warn('Tile ' + node.info.id + ' failed to load', err))
+            .finally(() => {
+                node.loading = false;
+                this.loading--;
+            });
+    }
+
+    // Read stream.bin incrementally; each complete record becomes a tile right away
+    stream() {
+        const info = this.manifest.stream;
+        if(!info) return;
+        const streamed = info.tiles.map(id => this.nodes.get(id));
+        streamed.forEach(node => node.streaming = true);
+
+        let pending = new Uint8Array(0);
+        const consume = (chunk) => {
+            const joined = new Uint8Array(pending.length + chunk.length);
+            joined.set(pending);
+            joined.set(chunk, pending.length);
+            let offset = 0;
+            while(joined.length - offset >= 8) {
+                const header = new DataView(joined.buffer, offset, 8);
+                const index = header.getUint32(0, true);
+                const length = header.getUint32(4, true);
+                if(joined.length - offset - 8 < length) break;
+                if(this.disposed) return;
+                const node = this.nodes.get(this.manifest.tiles[index].id);
+                // slice() copies into an aligned buffer of its own
+                node.mesh = this.createMesh(node, joined.slice(offset + 8, offset + 8 + length).buffer);
+                node.streaming = false;
+                offset += 8 + length;
+            }
+            pending = joined.slice(offset);
+        };
+
+        fetch(this.baseUrl + info.url)
+            .then(response => {
+                if(!response.ok) throw new Error(response.status);
+                if(!response.body || !response.body.getReader) {
+                    return response.arrayBuffer().then(buffer => consume(new Uint8Array(buffer)));
+                }
+                const reader = response.body.getReader();
+                const pump = () => reader.read().then(({ done, value }) => {
+                    if(done || this.disposed) return;
+                    consume(value);
+                    return pump();
+                });
+                return pump();
+            })
+            .catch(err => console.warn('Tile stream failed, loading tiles one by one', err))
+            .finally(() => {
+                // Anything the stream did not deliver falls back to per-tile requests
+                streamed.forEach(node => node.streaming = false);
+            });
+    }
+
+    // Projected error in px of a tile seen from the camera
+    screenError(node) {
+        const distance = Math.max(node.box.distanceToPoint(_tileCamera), camera.near);
+        const viewHeight = 2 * distance * Math.tan(THREE.MathUtils.degToRad(camera.fov / 2));
+        return node.info.error / viewHeight * renderer.domElement.clientHeight;
+    }
+
+    select(node, selected) {
+        if(!_tileFrustum.intersectsBox(node.box)) return;
+        node.lastUsed = this.frame;
+        if(!node.mesh) {
+            this.load(node);
+            return;
+        }
+        if(node.children.length === 0 || this.screenError(node) <= TILE_SSE_THRESHOLD) {
+            selected.push(node);
+            return;
+        }
+        // Refine only once every visible child can be drawn
+        const visible = node.children.filter(c => _tileFrustum.intersectsBox(c.box));
+        visible.forEach(c => this.load(c));
+        if(visible.every(c => c.mesh)) {
+            visible.forEach(c => this.select(c, selected));
+        } else {
+            selected.push(node);
+        }
+    }
+
+    // Called once per frame before rendering
+    update() {
+        this.frame++;
+        camera.updateMatrixWorld();
+        this.group.updateMatrixWorld();
+        _tileMatrix.multiplyMatrices(camera.projectionMatrix, camera.matrixWorldInverse);
+        // Tiles are in scan space; the group carries the centring offset (and,
+        // for a follow-up scan, its registration), which is rigid
+        _tileMatrix.multiply(this.group.matrixWorld);
+        _tileFrustum.setFromProjectionMatrix(_tileMatrix);
+        this.group.worldToLocal(_tileCamera.copy(camera.position));
+
+        const selected = [];
+        this.select(this.root, selected);
+        const meshes = new Set(selected.map(n => n.mesh));
+        this.group.children.slice().forEach(mesh => {
+            if(!meshes.has(mesh)) this.group.remove(mesh);
+        });
+        meshes.forEach(mesh => {
+            if(mesh.parent !== this.group) this.group.add(mesh);
+        });
+    }
+
+    // Drop tiles that were not needed recently, oldest first (GPU budget evictor)
+    evict(bytes) {
+        const candidates = [...this.nodes.values()]
+            .filter(n => n.mesh && !n.mesh.parent && n !== this.root)
+            .sort((a, b) => a.lastUsed - b.lastUsed);
+        let freed = 0;
+        for(const node of candidates) {
+            if(freed >= bytes) break;
+            freed += gpu.entries.get(node.mesh.geometry).bytes;
+            gpu.release(node.mesh.geometry);
+            node.mesh = null;
+        }
+    }
+
+    dispose() {
+        this.disposed = true;
+        if(this.group.parent) this.group.parent.remove(this.group);
+        this.nodes.forEach(node => {
+            if(node.mesh) gpu.release(node.mesh.geometry);
+            node.mesh = null;
+        });
+        gpu.release(this.material);
+    }
+}
+
+let tileSet = null;
+let compareSet = null; // follow-up scan overlaid on tileSet
+
+gpu.addEvictor(bytes => {
+    if(compareSet) compareSet.evict(bytes);
+    if(tileSet) tileSet.evict(bytes);
+});
+
+// Bounding box of the whole scan in its own (centred) coordinates. The frame
+// is taken before any focus-region re-meshing, so all variants line up.
+function tileSetBox(manifest) {
+    const bounds = (manifest.meta && manifest.meta.frame) || manifest.bounds;
+    return new THREE.Box3(new THREE.Vector3(...bounds[0]), new THREE.Vector3(...bounds[1]));
+}
@@ -0,0 +1,438 @@
+// --- TOOL SYSTEM ---
+window.selectTool = function(tool) {
+    if(currentTool === tool && tool !== 'view') {
+        toggleSettingsPanel();
+        return;
+    }
+
+    currentTool = tool;
+    resetTemp();
+
+    document.querySelectorAll('.tool-btn').forEach(b => b.classList.remove('active'));
+    const btn = document.getElementById('t-' + tool);
+    if(btn) btn.classList.add('active');
+
+    const sPanel = document.getElementById('settings');
+    const tName = document.getElementById('tool-name');
+    const hud = document.getElementById('info-hud');
+    const measureBox = document.getElementById('measure-box');
+
+    measureBox.style.display = 'none';
+
+    if (tool === 'view') {
+        document.body.style.cursor = 'default';
+        controls.enabled = true;
+        sPanel.style.display = 'none';
+        settingsPanelVisible = false;
+        hud.classList.remove('visible');
+    } else {
+        document.body.style.cursor = 'crosshair';
+        controls.enabled = false;
+        sPanel.style.display = 'flex';
+        settingsPanelVisible = true;
+        hud.classList.add('visible');
+
+        if(tool === 'brush') { 
+            tName.innerText = "SURFACE BRUSH"; 
+            hud.innerText = "Draw closed loop for area measurement"; 
+        }
+        else if(tool === 'eraser') {
+            tName.innerText = "ERASER TOOL";
+            hud.innerText = "Click and drag to erase";
+            createEraserCursor();
+        }
+        else if(tool === 'select') {
+            tName.innerText = "SELECT";
+            hud.innerText = "Click a marking or marker to select it";
+            sPanel.style.display = 'none';
+            settingsPanelVisible = false;
+        }
+        else if(tool === 'focus') {
+            tName.innerText = "FOCUS REGION";
+            hud.innerText = "Click the surgical site - full detail is kept around it";
+            sPanel.style.display = 'none';
+            settingsPanelVisible = false;
+        }
+        else if(tool === 'flap') {
+            tName.innerText = "FLAP TEMPLATES";
+            hud.innerText = "Click the flap site - click inside it again to move the template";
+            document.getElementById('flap-rows').style.display = 'block';
+            measureBox.style.display = 'block';
+            document.getElementById('measure-label').innerText = "SKIN AREA";
+            updateFlapOutline();
+        }
+        else if(tool === 'anthro') {
+            tName.innerText = "ANTHROPOMETRIC LANDMARKS";
+            hud.innerText = "Pick a landmark, then click it on the face - or accept the detected ones";
+            document.getElementById('anthro-rows').style.display = 'block';
+        }
+        else if(tool === 'profile') {
+            tName.innerText = "CROSS-SECTION PROFILE";
+            hud.innerText = "Click the two ends of the profile - the cut runs along your view";
+            document.getElementById('profile-rows').style.display = 'block';
+            measureBox.style.display = 'block';
+            document.getElementById('measure-label').innerText = "PROFILE ARC";
+        }
+        else if(tool === 'line') { 
+            tName.innerText = "SURGICAL MARKING LINE"; 
+            hud.innerText = "Click two points to draw line"; 
+        }
+        else if(tool === 'annotation') {
+            tName.innerText = "ANNOTATION TOOL";
+            hud.innerText = "Click to place numbered marker";
+        }
+        else if(tool === 'distance') { 
+            tName.innerText = "DISTANCE MEASUREMENT"; 
+            hud.innerText = "Click two points to measure";
+            measureBox.style.display = 'block';
+            document.getElementById('measure-label').innerText = "DISTANCE";
+        }
+        else if(tool === 'angle') { 
+            tName.innerText = "ANGLE MEASUREMENT"; 
+            hud.innerText = "Click: A (green) → B (red vertex) → C (blue)";
+            measureBox.style.display = 'block';
+            document.getElementById('measure-label').innerText = "ANGLE";
+        }
+    }
+}
+
+window.toggleSettingsPanel = function() {
+    const sPanel = document.getElementById('settings');
+    settingsPanelVisible = !settingsPanelVisible;
+    sPanel.style.display = settingsPanelVisible ? 'flex' : 'none';
+}
+
+window.toggleNavPanel = function() {
+    const panel = document.getElementById('nav-panel');
+    const content = document.getElementById('nav-content');
+    const icon = document.getElementById('nav-toggle-icon');
+
+    navPanelExpanded = !navPanelExpanded;
+
+    if(navPanelExpanded) {
+        panel.classList.remove('collapsed');
+        content.classList.remove('hidden');
+        icon.innerText = 'remove';
+    } else {
+        panel.classList.add('collapsed');
+        content.classList.add('hidden');
+        icon.innerText = 'add';
+    }
+}
+
+window.setColor = function(element) {
+    document.querySelectorAll('.color-preset').forEach(e => e.classList.remove('active'));
+    element.classList.add('active');
+    settings.colorHex = element.dataset.color;
+    settings.color = parseInt(element.dataset.color.replace('#', '0x'));
+    pushState();
+}
+
+window.updateSettings = function() {
+    settings.lineWidth = parseFloat(document.getElementById('p-width').value);
+    settings.opacity = parseFloat(document.getElementById('p-opacity').value);
+    settings.offsetFactor = parseFloat(document.getElementById('p-offset').value);
+    if(document.getElementById('p-auto-area')) {
+        settings.autoArea = document.getElementById('p-auto-area').checked;
+    }
+    settings.texturePaint = document.getElementById('p-texture-paint').checked;
+    settings.snapLandmarkMm = parseFloat(document.getElementById('p-snap-landmark').value);
+    settings.snapVertexMm = parseFloat(document.getElementById('p-snap-vertex').value);
+    if(settings.texturePaint && targetObject && !getPaintLayer()) {
+        document.getElementById('info-hud').innerText = 'This scan has no UV map - markings stay as meshes';
+        document.getElementById('info-hud').classList.add('visible');
+    }
+
+    document.getElementById('width-val').innerText = (settings.lineWidth * 1000).toFixed(1);
+    document.getElementById('opacity-val').innerText = settings.opacity.toFixed(2);
+    document.getElementById('offset-val').innerText = settings.offsetFactor.toFixed(5);
+    document.getElementById('snap-landmark-val').innerText = settings.snapLandmarkMm.toFixed(1);
+    document.getElementById('snap-vertex-val').innerText = settings.snapVertexMm.toFixed(1);
+
+    if(document.getElementById('p-eraser')) {
+        eraserRadius = parseFloat(document.getElementById('p-eraser').value);
+        document.getElementById('eraser-val').innerText = (eraserRadius * 100).toFixed(0);
+        if(eraserCursor) {
+            eraserCursor.scale.setScalar(eraserRadius * currentZoom);
+        }
+    }
+    pushState();
+}
+
+// Restore tool settings kept by Python across page reloads
+function applySettings(saved) {
+    const preset = document.querySelector(`.color-preset[data-color="${saved.color_hex}"]`);
+    if(preset) {
+        document.querySelectorAll('.color-preset').forEach(e => e.classList.remove('active'));
+        preset.classList.add('active');
+        settings.colorHex = saved.color_hex;
+        settings.color = parseInt(saved.color_hex.replace('#', '0x'));
+    }
+    const inputs = {
+        'p-width': saved.line_width,
+        'p-opacity': saved.opacity,
+        'p-offset': saved.offset_factor,
+        'p-eraser': saved.eraser_radius,
+        'p-snap-landmark': saved.snap_landmark_mm,
+        'p-snap-vertex': saved.snap_vertex_mm
+    };
+    for (const id in inputs) {
+        if(inputs[id] !== undefined && inputs[id] !== null) {
+            document.getElementById(id).value = inputs[id];
+        }
+    }
+    if(saved.auto_area !== undefined) {
+        document.getElementById('p-auto-area').checked = saved.auto_area;
+    }
+    if(saved.texture_paint !== undefined) {
+        document.getElementById('p-texture-paint').checked = saved.texture_paint;
+    }
+    updateSettings();
+}
+
+function serializeSettings() {
+    return {
+        color_hex: settings.colorHex,
+        line_width: settings.lineWidth,
+        opacity: settings.opacity,
+        offset_factor: settings.offsetFactor,
+        eraser_radius: eraserRadius,
+        auto_area: settings.autoArea,
+        texture_paint: settings.texturePaint,
+        snap_landmark_mm: settings.snapLandmarkMm,
+        snap_vertex_mm: settings.snapVertexMm
+    };
+}
+
+// --- RAYCASTING ---
+function getIntersects(event) {
+    const rect = renderer.domElement.getBoundingClientRect();
+    mouse.x = ((event.clientX - rect.left) / rect.width) * 2 - 1;
+    mouse.y = -((event.clientY - rect.top) / rect.height) * 2 + 1;
+    raycaster.setFromCamera(mouse, camera);
+    if(!targetObject) return [];
+    return raycaster.intersectObject(targetObject, true);
+}
+
+function getOffsetPoint(hit) {
+    const offset = currentZoom * settings.offsetFactor;
+    return hit.point.clone().add(hit.face.normal.clone().multiplyScalar(offset));
+}
+
+// --- SURFACE PROJECTION ---
+function projectPointsOnSurface(p1, p2, steps = 20) {
+    const points = [];
+    for(let i = 0; i <= steps; i++) {
+        const t = i / steps;
+        const interpPoint = new THREE.Vector3().lerpVectors(p1, p2, t);
+
+        const dir = interpPoint.clone().sub(camera.position).normalize();
+        raycaster.set(camera.position, dir);
+        const hits = raycaster.intersectObject(targetObject, true);
+
+        if(hits.length > 0) {
+            points.push(getOffsetPoint(hits[0]));
+        } else {
+            points.push(interpPoint);
+        }
+    }
+    return points;
+}
+
+// --- INTERACTION ---
+function onDown(event) {
+    // Prevent double-tap
+    const now = Date.now();
+    if (now - lastClickTime < 300) return;
+    lastClickTime = now;
+
+    if (currentTool === 'view' || event.button !== 0) return;
+
+    // Markings draw on top of the scan, so selection does not need a scan hit
+    if (currentTool === 'select') {
+        selectAt(event.clientX, event.clientY);
+        return;
+    }
+
+    const hits = getIntersects(event);
+    if (hits.length > 0) {
+        let point = getOffsetPoint(hits[0]);
+
+        if (currentTool === 'brush') {
+            isDrawing = true;
+            beginStroke(point);
+            startPointerStroke(event);
+            if(texturePaintActive()) {
+                paintStroke = paintLayer.beginStroke(hits[0], settings.colorHex, settings.opacity, settings.lineWidth * currentZoom * 2);
+            }
+        }
+        else if (currentTool === 'eraser') {
+            isErasing = true;
+            startPointerStroke(event);
+            if(texturePaintActive()) {
+                paintStroke = paintLayer.beginStroke(hits[0], settings.colorHex, 1, eraserRadius * currentZoom * 2, true);
+            }
+            eraseAtPoint(point, lastStrokeSample);
+        }
+        else if (currentTool === 'annotation') {
+            createAnnotation(point, event);
+        }
+        else if (currentTool === 'focus') {
+            pickFocusCenter(hits[0]);
+        }
+        else if (currentTool === 'flap') {
+            pickFlapSite(hits[0]);
+        }
+        else if (currentTool === 'line' || currentTool === 'distance') {
+            point = snapMeasurePoint(hits[0], point);
+            if(measurePoints.length === 0) {
+                measurePoints.push(point);
+                addMarker(point, 0xff0000, false);
+            } else {
+                measurePoints.push(point);
+                addMarker(point, 0xff0000, false);
+
+                if(currentTool === 'line') {
+                    drawSurfaceLine(measurePoints[0], measurePoints[1]);
+                } else {
+                    measureDistance(measurePoints[0], measurePoints[1]);
+                }
+
+                measurePoints = [];
+            }
+        }
+        else if (currentTool === 'angle') {
+            handleAngleMeasurement(snapMeasurePoint(hits[0], point));
+        }
+        else if (currentTool === 'anthro') {
+            placeLandmark(snapMeasurePoint(hits[0], point));
+        }
+        else if (currentTool === 'profile') {
+            pickProfilePoint(snapMeasurePoint(hits[0], point));
+        }
+    }
+}
+
+// Moves are resolved once per frame by processPointerQueue (input.js)
+function onMove(event) {
+    queuePointer(event);
+}
+
+// One resolved sample of a brush or eraser stroke; returns true when the brush stroke grew
+function handleStrokeSample(hit, sample) {
+    const point = getOffsetPoint(hit);
+    const gap = lastStrokeSample ? Math.hypot(sample.x - lastStrokeSample.x, sample.y - lastStrokeSample.y) : 0;
+
+    if (currentTool === 'brush' && isDrawing) {
+        const lastPoint = drawPoints[drawPoints.length - 1];
+        if(point.distanceTo(lastPoint) <= currentZoom * 0.001) return false;
+        lastStrokeSample = sample;
+
+        if(paintStroke) {
+            // Texture mode: paint the segment, keep the 3D points only for the area
+            paintLayer.extendStroke(paintStroke, hit);
+            extendStroke([point]);
+        } else if(gap > INPUT_GAP_PROJECT) {
+            // Fast move or thinned samples: follow the surface between them
+            const steps = Math.ceil(gap / INPUT_GAP_PROJECT);
+            extendStroke(projectPointsOnSurface(lastPoint, point, steps).slice(1));
+        } else {
+            extendStroke([point]);
+        }
+        return true;
+    }
+    if (currentTool === 'eraser' && isErasing) {
+        lastStrokeSample = sample;
+        if(paintStroke) paintLayer.extendStroke(paintStroke, hit);
+        queueErase(point, sample);
+    }
+    return false;
+}
+
+function onUp(event) {
+    // Samples queued since the last frame still belong to the stroke
+    if(isDrawing || isErasing) processPointerQueue();
+    if (isDrawing && currentTool === 'brush') {
+        isDrawing = false;
+        if (strokeSamples > 10) { 
+            const firstPoint = drawPoints[0];
+            const lastPoint = drawPoints[drawPoints.length - 1];
+            const distance = firstPoint.distanceTo(lastPoint);
+
+            // Ngưỡng khép kín (5% zoom)
+            const closeThreshold = currentZoom * 0.05;
+
+            if (distance < closeThreshold && settings.autoArea) {
+                // 1. Nối kín vòng dây
+                drawPoints = simplifyStroke(drawPoints, currentZoom * STROKE_TOLERANCE);
+                drawPoints.push(firstPoint);
+                if(!paintStroke) updateBrushStroke();
+
+                // 2. Tính toán diện tích
+                const areaResult = calculateArea(drawPoints);
+
+                // 3. Tô màu vùng kín (on the texture when painting there)
+                let fill;
+                if(paintStroke) {
+                    fill = paintLayer.fillStroke(paintStroke, 0.4);
+                    tempMeshes.push(paintStroke);
+                    paintStroke = null;
+                    if(!fill) document.getElementById('info-hud').innerText = 'Loop crosses a texture seam - area measured without fill';
+                } else {
+                    fill = fillClosedLoop(drawPoints, areaResult);
+                }
+
+                // 4. Lưu vào danh sách (giá trị gốc theo đơn vị mô hình)
+                const measurement = recordMeasurement('area', areaResult.rawValue, [areaResult.center]);
+                // Python measures the volume enclosed by the loop (and the follow-up deviation inside it)
+                // and sends it back as args.enclosed, which adds it to the label
+                measurement.loop = drawPoints.map(p => p.clone());
+
+                // 5. Hiển thị số đo (mm2) - deleting the label removes the loop and its fill
+                const areaText = formatMeasurement(measurement);
+                measurement.labelData = createFloatingLabel(areaResult.center, areaText, 'area');
+                measurement.labelData.relatedObjects = fill ? [...tempMeshes, fill] : [...tempMeshes];
+            }
+        }
+        if(paintStroke) tempMeshes.push(paintStroke);
+        if (tempMeshes.length > 0) {
+            tempMeshes.forEach(m => drawnObjects.push(m));
+            tempMeshes = [];
+        }
+        drawPoints = [];
+    }
+
+    if (isErasing) {
+        isErasing = false;
+        // Texture erasing is undoable like any other marking
+        if(paintStroke) drawnObjects.push(paintStroke);
+    }
+    paintStroke = null;
+}
+
+// --- DRAWING TOOLS ---
+function updateBrushStroke() {
+    tempMeshes.forEach(m => gpu.disposeObject(m));
+    tempMeshes = [];
+
+    if(drawPoints.length < 2) return;
+
+    const tube = buildStrokeTube(drawPoints);
+    scene.add(tube);
+    tempMeshes.push(tube);
+}
+
+function drawSurfaceLine(p1, p2) {
+    const projected = projectPointsOnSurface(p1, p2, 30);
+
+    const tube = buildStrokeTube(simplifyStroke(projected, currentZoom * STROKE_TOLERANCE));
+    scene.add(tube);
+    drawnObjects.push(tube);
+    return tube; // Return for linking to label
+}
+
+function addMarker(point, color, isVertex = false) {
+    // Vertex marker lớn hơn để nổi bật
+    const size = isVertex ? currentZoom * 0.0010 : currentZoom * 0.0008;
+    measureMarkers.push(measureMarkerPool.add(point, color, size));
+}